@@ -0,0 +1,243 @@
+"""Headless HTTP API for Boeing India Career Chatbot.
+
+Exposes the same managers the Streamlit app uses, so chat can be scaled
+across processes and load-tested without a browser:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Clients authenticate with ``Authorization: Bearer <session token>``, using
+the same signed session tokens the Streamlit app issues.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from slowapi.util import get_remote_address
+
+from config.settings import settings
+from utils.analytics import analytics_manager
+from utils.auth import auth_manager
+from utils.bootstrap import bootstrap
+from utils.chat import chat_service
+from utils.conversation import conversation_manager
+from utils.rate_limit import rate_limiter
+from utils.sessions import session_manager
+from utils.session_state import UserRecord
+from utils.tracing import tracer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run process startup once per worker before serving requests."""
+    session_manager.check_secret_key()
+    bootstrap.run()
+    yield
+
+
+# Per-IP limits on unauthenticated endpoints; chat uses the per-user limiter
+limiter = Limiter(key_func=get_remote_address)
+
+app = FastAPI(title=settings.APP_NAME, version=settings.APP_VERSION, lifespan=lifespan)
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+class GoogleLoginRequest(BaseModel):
+    id_token: str
+
+
+class MessageRequest(BaseModel):
+    content: str
+
+
+class ConversationRequest(BaseModel):
+    title: str = "New Conversation"
+
+
+class DemoLoginRequest(BaseModel):
+    account: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,40}$")
+
+
+def current_user(authorization: Optional[str] = Header(None)) -> UserRecord:
+    """Resolve the bearer session token to a user."""
+    token = authorization[len("Bearer "):] if authorization and authorization.startswith("Bearer ") else None
+    user = session_manager.restore(token) if token else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    return user
+
+
+def admin_user(user: UserRecord = Depends(current_user)) -> UserRecord:
+    """Require an admin user."""
+    if not auth_manager.is_admin(user.email):
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return user
+
+
+def owned_conversation(conversation_id: int, user: UserRecord = Depends(current_user)) -> int:
+    """Require that the conversation belongs to the current user."""
+    conversation = conversation_manager.get_conversation(conversation_id)
+    if conversation is None or conversation.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation_id
+
+
+def owned_message(message_id: int, user: UserRecord = Depends(current_user)) -> int:
+    """Require that the message is in one of the current user's conversations."""
+    if not conversation_manager.user_owns_message(user, message_id):
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message_id
+
+
+def _session_response(user: UserRecord, token: str) -> Dict:
+    return {
+        'token': token,
+        'user': {'id': user.id, 'email': user.email, 'name': user.name}
+    }
+
+
+@app.get("/health")
+def health():
+    """Liveness and startup readiness."""
+    return {'status': 'ok', 'ready': bootstrap.ready, 'startup': bootstrap.report}
+
+
+@app.post("/auth/google")
+@limiter.limit(settings.AUTH_RATE_LIMIT)
+def login_google(request: Request, body: GoogleLoginRequest):
+    """Exchange a Google ID token for a session token."""
+    user_info = auth_manager.verify_google_token(body.id_token)
+    if not user_info:
+        raise HTTPException(status_code=401, detail="Invalid Google token")
+    return _session_response(*auth_manager.authenticate(user_info))
+
+
+@app.post("/auth/demo")
+@limiter.limit(settings.AUTH_RATE_LIMIT)
+def login_demo(request: Request, body: Optional[DemoLoginRequest] = None):
+    """Log in as the demo user; only available when OAuth is not configured.
+    
+    An ``account`` name logs in as a separate demo user instead, so load
+    tests can simulate distinct students.
+    """
+    if settings.GOOGLE_CLIENT_ID and settings.GOOGLE_CLIENT_SECRET:
+        raise HTTPException(status_code=404, detail="Demo mode disabled")
+    if body is None or body.account is None:
+        user_info = {'email': 'demo@example.com', 'name': 'Demo User', 'google_id': 'demo123'}
+    else:
+        user_info = {
+            'email': f"demo+{body.account}@example.com",
+            'name': f"Demo User {body.account}",
+            'google_id': f"demo123-{body.account}"
+        }
+    return _session_response(*auth_manager.authenticate(user_info))
+
+
+@app.post("/auth/logout", status_code=204)
+def logout(authorization: Optional[str] = Header(None), user: UserRecord = Depends(current_user)):
+    """Revoke the current session token."""
+    session_manager.revoke(authorization[len("Bearer "):])
+
+
+@app.get("/conversations")
+def list_conversations(
+    limit: int = Query(10, ge=1, le=settings.PANEL_CONVERSATIONS),
+    user: UserRecord = Depends(current_user)
+) -> List[Dict]:
+    """List the user's most recent conversations."""
+    return [
+        {'id': c.id, 'title': c.title, 'created_at': c.created_at, 'updated_at': c.updated_at}
+        for c in conversation_manager.get_user_conversations(user, limit=limit)
+    ]
+
+
+@app.post("/conversations", status_code=201)
+def create_conversation(body: ConversationRequest, user: UserRecord = Depends(current_user)) -> Dict:
+    """Start a new conversation."""
+    conversation = conversation_manager.create_conversation(user, body.title)
+    return {'id': conversation.id, 'title': conversation.title, 'created_at': conversation.created_at}
+
+
+@app.get("/conversations/{conversation_id}/messages")
+def get_messages(conversation_id: int = Depends(owned_conversation)) -> List[Dict]:
+    """Full message history of a conversation."""
+    return [
+        {'id': m.id, 'role': m.role, 'content': m.content, 'created_at': m.created_at}
+        for m in conversation_manager.get_conversation_messages(conversation_id)
+    ]
+
+
+@app.post("/conversations/{conversation_id}/messages")
+def send_message(
+    body: MessageRequest,
+    conversation_id: int = Depends(owned_conversation),
+    user: UserRecord = Depends(current_user)
+):
+    """Send a message and stream the assistant's reply as plain text."""
+    if not rate_limiter.check_rate_limit(user.id):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    
+    history = conversation_manager.get_conversation_history(conversation_id, limit=settings.MAX_HISTORY_MESSAGES)
+    return StreamingResponse(
+        chat_service.stream_message(user, conversation_id, body.content, history),
+        media_type="text/plain; charset=utf-8"
+    )
+
+
+@app.get("/search")
+def search_messages(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    user: UserRecord = Depends(current_user)
+) -> Dict:
+    """Full-text search over the user's messages, best match first."""
+    return conversation_manager.search_messages(user, q, limit=limit, offset=offset)
+
+
+@app.get("/rate-limit")
+def remaining_queries(user: UserRecord = Depends(current_user)) -> Dict[str, int]:
+    """Queries left in the current windows."""
+    return rate_limiter.get_remaining_queries(user.id)
+
+
+@app.get("/bookmarks")
+def list_bookmarks(user: UserRecord = Depends(current_user)) -> List[Dict]:
+    """The user's bookmarked messages, newest first."""
+    return [
+        {'id': b.id, 'message_id': b.message_id, 'note': b.note, 'created_at': b.created_at}
+        for b in conversation_manager.get_user_bookmarks(user)
+    ]
+
+
+@app.put("/messages/{message_id}/bookmark", status_code=204)
+def bookmark(message_id: int = Depends(owned_message), user: UserRecord = Depends(current_user)):
+    """Bookmark a message."""
+    conversation_manager.bookmark_message(user, message_id)
+
+
+@app.delete("/messages/{message_id}/bookmark", status_code=204)
+def unbookmark(message_id: int = Depends(owned_message), user: UserRecord = Depends(current_user)):
+    """Remove a bookmark."""
+    conversation_manager.unbookmark_message(user, message_id)
+
+
+@app.get("/analytics")
+def analytics(days: int = Query(7, ge=1, le=365), user: UserRecord = Depends(admin_user)) -> Dict:
+    """Admin dashboard data."""
+    return {
+        'total_users': analytics_manager.get_total_users(),
+        'total_conversations': analytics_manager.get_total_conversations(),
+        'total_messages': analytics_manager.get_total_messages(),
+        'user_stats': analytics_manager.get_user_stats(),
+        'popular_queries': analytics_manager.get_popular_queries(limit=20, days=days),
+        'daily_queries': analytics_manager.get_daily_queries(days=days),
+        'recent_activity': analytics_manager.get_recent_activity(days=days)[:20],
+        'latency': tracer.latency_summary(),
+        'slowest_turns': [turn.to_dict() for turn in tracer.slowest(10, name="chat.turn")],
+    }
@@ -1,20 +1,25 @@
 """Main Streamlit application for Boeing India Career Chatbot."""
 
 import streamlit as st
-from streamlit_oauth import OAuth2Component
+import html
 import os
 import time
 
 # Import utilities
 from config.settings import settings
-from utils.database import init_db
+from utils.bootstrap import bootstrap
 from utils.auth import auth_manager
-from utils.llm import chatbot
-from utils.knowledge import retriever
+from utils.chat import chat_service
 from utils.conversation import conversation_manager
 from utils.rate_limit import rate_limiter
 from utils.analytics import analytics_manager
-from google_auth_oauthlib.flow import Flow
+from utils.sessions import session_manager
+from utils.session_state import MessageRecord, all_sessions_footprint, state_footprint
+from utils.tracing import tracer
+
+
+# Partial reruns need Streamlit >= 1.33; older versions rerun the whole page
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
 
 # Page configuration
@@ -75,6 +80,9 @@ def create_oauth_flow():
     if not settings.GOOGLE_CLIENT_ID or not settings.GOOGLE_CLIENT_SECRET:
         return None
     
+    # Imported here so demo-mode and restored sessions never load it
+    from google_auth_oauthlib.flow import Flow
+    
     return Flow.from_client_config(
         {
             "web": {
@@ -91,20 +99,28 @@ def create_oauth_flow():
 
 
 def initialize_app():
-    """Initialize the application."""
-    # Initialize database
-    init_db()
+    """Initialize the application.
+    
+    Process-wide startup (schema, seeding, model warm-up) runs once via
+    ``bootstrap``; every rerun after that only sets up session state.
+    """
+    try:
+        session_manager.check_secret_key()
+    except RuntimeError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+    report = bootstrap.run()
     
     # Initialize session state
     auth_manager.init_session_state()
     
-    # Initialize knowledge base (first time only)
-    if 'kb_initialized' not in st.session_state:
-        try:
-            retriever.initialize_knowledge_base()
-            st.session_state.kb_initialized = True
-        except Exception as e:
-            st.warning(f"Knowledge base initialization: {str(e)}")
+    # Surface startup failures once per session (background steps may
+    # still be running, in which case their errors show on the dashboard)
+    if 'startup_checked' not in st.session_state:
+        for step in report:
+            if step['error']:
+                st.warning(f"{step['step']}: {step['error']}")
+        st.session_state.startup_checked = True
 
 
 
@@ -178,15 +194,15 @@ def render_sidebar():
         
         for conv in conversations:
             if st.button(f"📄 {conv.title[:30]}...", key=f"conv_{conv.id}"):
-                st.session_state.conversation_id = conv.id
-                st.session_state.messages = conversation_manager.get_conversation_history(conv.id)
+                open_conversation(conv.id)
                 st.rerun()
         
         if st.button("➕ New Conversation"):
-            st.session_state.conversation_id = None
-            st.session_state.messages = []
+            open_conversation(None)
             st.rerun()
         
+        render_search(user)
+        
         st.markdown("---")
         
         # Rate limit info
@@ -204,6 +220,61 @@ def render_sidebar():
         return page
 
 
+def render_search(user):
+    """Sidebar search over the user's past messages."""
+    query = st.text_input("🔍 Search your chats", key="search_query", placeholder="e.g. CGPA cutoff")
+    if not query.strip():
+        return
+    
+    if st.session_state.get('search_for') != query:
+        st.session_state.search_for = query
+        st.session_state.search_page = 0
+    page = st.session_state.search_page
+    
+    found = conversation_manager.search_messages(user, query, limit=settings.SEARCH_PAGE_SIZE, offset=page * settings.SEARCH_PAGE_SIZE)
+    if not found['results'] and page == 0:
+        st.caption("No matching messages.")
+        return
+    
+    for hit in found['results']:
+        st.markdown(f"**{(hit['conversation_title'] or 'Conversation')[:30]}** · {hit['created_at'].strftime('%Y-%m-%d')}")
+        st.caption(hit['snippet'])
+        if st.button("Open", key=f"search_hit_{hit['message_id']}"):
+            open_conversation(hit['conversation_id'])
+            if hit['message_id'] not in {m.id for m in st.session_state.messages}:
+                st.session_state.show_full_transcript = True
+            st.rerun()
+    
+    previous, following = st.columns(2)
+    if page > 0 and previous.button("← Prev", key="search_prev"):
+        st.session_state.search_page = page - 1
+        st.rerun()
+    if found['has_more'] and following.button("Next →", key="search_next"):
+        st.session_state.search_page = page + 1
+        st.rerun()
+
+
+def open_conversation(conversation_id):
+    """Load the most recent window of a conversation into session state."""
+    window = settings.SESSION_MESSAGE_WINDOW
+    messages = conversation_manager.get_conversation_history(conversation_id, limit=window + 1) if conversation_id else []
+    
+    st.session_state.conversation_id = conversation_id
+    st.session_state.messages = messages[-window:]
+    st.session_state.has_earlier_messages = len(messages) > window
+    st.session_state.show_full_transcript = False
+
+
+def append_messages(*records: MessageRecord):
+    """Add records to the session window, spilling the oldest ones (they stay in the DB)."""
+    messages = st.session_state.messages
+    messages.extend(records)
+    overflow = len(messages) - settings.SESSION_MESSAGE_WINDOW
+    if overflow > 0:
+        del messages[:overflow]
+        st.session_state.has_earlier_messages = True
+
+
 def render_chat_page():
     """Render the main chat interface."""
     st.markdown('<div class="main-header">💬 Boeing India Career Chat</div>', unsafe_allow_html=True)
@@ -215,48 +286,26 @@ def render_chat_page():
         st.info("👋 Welcome to Boeing India Career Chatbot! I'm here to help you with placements, internships, job roles, and career guidance. Feel free to ask me anything!")
         
         # Update first-time status
-        from utils.database import get_db
-        with get_db() as db:
-            db_user = db.query(type(user)).filter_by(id=user.id).first()
-            if db_user:
-                db_user.is_first_time = False
-                db.commit()
-                user.is_first_time = False
+        st.session_state.user = auth_manager.mark_returning_user(user)
     
     # Create conversation if needed
     if st.session_state.conversation_id is None:
         conversation = conversation_manager.create_conversation(user)
         st.session_state.conversation_id = conversation.id
     
-    # Display chat messages
-    for idx, message in enumerate(st.session_state.messages):
-        role = message['role']
-        content = message['content']
-        
-        message_class = "user-message" if role == "user" else "assistant-message"
-        icon = "👤" if role == "user" else "🤖"
+    # Display chat messages, keeping long transcripts collapsed
+    messages = st.session_state.messages[-settings.TRANSCRIPT_VISIBLE_MESSAGES:]
+    has_hidden = len(messages) < len(st.session_state.messages) or st.session_state.get('has_earlier_messages')
+    if st.session_state.get('show_full_transcript'):
+        # Read the full transcript from the DB without keeping it in session state
+        messages = conversation_manager.get_conversation_history(st.session_state.conversation_id)
+    elif has_hidden:
+        if st.button("⬆️ Show earlier messages"):
+            st.session_state.show_full_transcript = True
+            st.rerun()
         
-        with st.container():
-            col1, col2 = st.columns([0.95, 0.05])
-            
-            with col1:
-                st.markdown(f'<div class="chat-message {message_class}">{icon} {content}</div>', unsafe_allow_html=True)
-            
-            with col2:
-                # Bookmark button for assistant messages
-                if role == "assistant":
-                    # Get message from DB to bookmark
-                    messages = conversation_manager.get_conversation_messages(st.session_state.conversation_id)
-                    if idx < len(messages):
-                        msg_id = messages[idx].id
-                        is_bookmarked = conversation_manager.is_message_bookmarked(user, msg_id)
-                        
-                        if st.button("⭐" if is_bookmarked else "☆", key=f"bookmark_{idx}"):
-                            if is_bookmarked:
-                                conversation_manager.unbookmark_message(user, msg_id)
-                            else:
-                                conversation_manager.bookmark_message(user, msg_id)
-                            st.rerun()
+    for message in messages:
+        render_message(message)
     
     # Chat input
     if prompt := st.chat_input("Ask me about Boeing India careers..."):
@@ -265,47 +314,80 @@ def render_chat_page():
             st.error("⚠️ Rate limit exceeded. Please wait a moment before sending another message.")
             return
         
-        # Add user message to session
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
-        # Save user message to DB
-        conversation_manager.add_message(
-            st.session_state.conversation_id,
-            "user",
-            prompt
-        )
-        
-        # Update conversation title if this is the first message
-        if len(st.session_state.messages) == 1:
-            title = chatbot.generate_conversation_title(prompt)
-            conversation_manager.update_conversation_title(st.session_state.conversation_id, title)
+        history = list(st.session_state.messages)
+        render_message(MessageRecord(id=None, role="user", content=prompt))
         
-        # Get relevant context from knowledge base
-        context = retriever.retrieve_context(prompt)
-        
-        # Generate response
+        # Save the turn, retrieve context and generate the response
         with st.spinner("Thinking..."):
-            response = chatbot.generate_response(
+            user_message, assistant_message = chat_service.send_message(
+                user,
+                st.session_state.conversation_id,
                 prompt,
-                st.session_state.messages[:-1],  # Exclude current message
-                context
+                history
             )
         
-        # Add assistant message to session
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        # Add both messages to session and draw only the new reply
+        reply = MessageRecord(id=assistant_message.id, role="assistant", content=assistant_message.content)
+        append_messages(MessageRecord(id=user_message.id, role="user", content=prompt), reply)
+        render_message(reply)
         
-        # Save assistant message to DB
-        conversation_manager.add_message(
-            st.session_state.conversation_id,
-            "assistant",
-            response,
-            msg_metadata={"context_used": bool(context)}
-        )
+        # The first message renames the conversation in the sidebar
+        if not history:
+            st.rerun()
+
+
+def render_message(message: MessageRecord):
+    """Render one transcript entry with its bookmark toggle."""
+    role = message.role
+    content = message.content
+    
+    message_class = "user-message" if role == "user" else "assistant-message"
+    icon = "👤" if role == "user" else "🤖"
+    
+    with st.container():
+        col1, col2 = st.columns([0.95, 0.05])
         
-        # Log query
-        conversation_manager.log_query(user, prompt, response)
+        with col1:
+            # Messages are user and model text: escape them before adding our markup
+            st.markdown(f'<div class="chat-message {message_class}">{icon} {html.escape(content)}</div>', unsafe_allow_html=True)
         
-        st.rerun()
+        with col2:
+            # Bookmark button for assistant messages
+            if role == "assistant" and message.id:
+                render_bookmark_toggle(message.id)
+
+
+def _bookmarked_ids() -> set:
+    """Bookmarked message ids in the current conversation, loaded once per conversation."""
+    if st.session_state.get('bookmarks_for') != st.session_state.conversation_id:
+        st.session_state.bookmarked_ids = conversation_manager.get_bookmarked_message_ids(
+            st.session_state.user,
+            st.session_state.conversation_id
+        )
+        st.session_state.bookmarks_for = st.session_state.conversation_id
+    return st.session_state.bookmarked_ids
+
+
+def _toggle_bookmark(message_id: int):
+    bookmarked = _bookmarked_ids()
+    if message_id in bookmarked:
+        conversation_manager.unbookmark_message(st.session_state.user, message_id)
+        bookmarked.discard(message_id)
+    else:
+        conversation_manager.bookmark_message(st.session_state.user, message_id)
+        bookmarked.add(message_id)
+
+
+@fragment
+def render_bookmark_toggle(message_id: int):
+    """Star button that reruns on its own instead of redrawing the page."""
+    is_bookmarked = message_id in _bookmarked_ids()
+    st.button(
+        "⭐" if is_bookmarked else "☆",
+        key=f"bookmark_{message_id}",
+        on_click=_toggle_bookmark,
+        args=(message_id,)
+    )
 
 
 def render_bookmarks_page():
@@ -321,10 +403,11 @@ def render_bookmarks_page():
         for bookmark in bookmarks:
             with st.container():
                 st.markdown(f"**Message** (saved on {bookmark.created_at.strftime('%Y-%m-%d %H:%M')})")
-                st.markdown(f'<div class="chat-message assistant-message">🤖 {bookmark.message.content}</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="chat-message assistant-message">🤖 {html.escape(bookmark.message.content)}</div>', unsafe_allow_html=True)
                 
                 if st.button("Remove Bookmark", key=f"remove_{bookmark.id}"):
                     conversation_manager.unbookmark_message(user, bookmark.message_id)
+                    st.session_state.bookmarks_for = None  # reload chat page stars
                     st.rerun()
                 
                 st.markdown("---")
@@ -365,18 +448,65 @@ def render_admin_dashboard():
     
     st.markdown("---")
     
-    # Recent queries
-    st.subheader("🔍 Recent Queries")
-    queries = analytics_manager.get_popular_queries(limit=20)
+    # Popular queries
+    st.subheader("🔍 Popular Queries (7 days)")
+    queries = analytics_manager.get_popular_queries(limit=20, days=7)
     
     if queries:
         for q in queries:
-            st.text(f"[{q['timestamp'].strftime('%Y-%m-%d %H:%M')}] {q['query'][:100]}")
+            st.text(f"[{q['count']:>5}] {q['query'][:100]}")
     else:
         st.info("No queries yet.")
     
     st.markdown("---")
     
+    # Startup timings
+    st.subheader("⚙️ Startup")
+    status = "Starting" if not bootstrap.finished else ("Ready" if bootstrap.ready else "Degraded")
+    st.write(f"**Status:** {status} ({bootstrap.total_seconds or 0:.2f}s)")
+    for step in bootstrap.report:
+        outcome = f"failed: {step['error']}" if step['error'] else "ok"
+        st.text(f"{step['step']:<28} {step['seconds']:>7.2f}s  {outcome}")
+    
+    st.markdown("---")
+    
+    # Latency
+    st.subheader("⏱️ Latency")
+    latency = tracer.latency_summary()
+    if latency:
+        st.text(f"{'span':<20} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for row in latency:
+            st.text(
+                f"{row['name']:<20} {row['count']:>7} {row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms "
+                f"{row['p99_ms']:>7.1f}ms {row['max_ms']:>7.1f}ms"
+            )
+        
+        st.write("**Slowest recent turns**")
+        for turn in tracer.slowest(10, name="chat.turn"):
+            started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(turn.start_ns / 1e9))
+            with st.expander(f"{turn.duration * 1000:.0f} ms — {started}"):
+                st.code("\n".join(turn.render()), language=None)
+    else:
+        st.info("No traced requests yet.")
+    
+    st.markdown("---")
+    
+    # Session memory
+    st.subheader("🧠 Session Memory")
+    current = state_footprint(st.session_state)
+    sessions = all_sessions_footprint()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("This Session", f"{sum(current.values()) / 1024:.1f} KiB")
+    with col2:
+        st.metric("Active Sessions", len(sessions) or "n/a")
+    with col3:
+        st.metric("All Sessions", f"{sum(s['bytes'] for s in sessions) / 1024:.1f} KiB" if sessions else "n/a")
+    for key, size in sorted(current.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+        st.text(f"{key:<28} {size / 1024:>8.1f} KiB")
+    
+    st.markdown("---")
+    
     # Recent activity
     st.subheader("📈 Recent Activity")
     activity = analytics_manager.get_recent_activity(days=7)
@@ -429,12 +559,9 @@ def main():
                     user_info = auth_manager.verify_google_token(credentials.id_token)
                     
                     if user_info:
-                        # Log the user in
+                        # Log the user in (clears the OAuth query parameters)
                         auth_manager.login(user_info)
                         
-                        # Clear query parameters
-                        st.experimental_set_query_params()
-                        
                         # Rerun the app to show authenticated state
                         st.rerun()
                     else:
@@ -453,23 +580,28 @@ def main():
             return
     
     # Check authentication
-    if not st.session_state.authenticated:
+    if not st.session_state.authenticated and not auth_manager.restore_session():
+        auth_manager.clear_session_cookie()
         render_login_page()
         return
-    
-    # Render sidebar and get selected page
-    page = render_sidebar()
-    
-    # Render selected page
-    if "Chat" in page:
-        render_chat_page()
-    elif "Bookmarks" in page:
-        render_bookmarks_page()
-    elif "Admin" in page:
-        if auth_manager.is_admin(st.session_state.user.email):
-            render_admin_dashboard()
-        else:
-            st.error("Access denied. Admin privileges required.")
+    auth_manager.render_session_cookie()
+    
+    with tracer.span("page.render", root=True) as span:
+        # Render sidebar and get selected page
+        page = render_sidebar()
+        if span is not None:
+            span.attributes['page'] = page
+    
+        # Render selected page
+        if "Chat" in page:
+            render_chat_page()
+        elif "Bookmarks" in page:
+            render_bookmarks_page()
+        elif "Admin" in page:
+            if auth_manager.is_admin(st.session_state.user.email):
+                render_admin_dashboard()
+            else:
+                st.error("Access denied. Admin privileges required.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Answer a file of student questions offline, for quality reviews.
+
+Reads questions from JSONL (one ``{"id": ..., "question": ...}`` object per
+line; ``id`` defaults to the line number), embeds them all in one batch,
+then retrieves context and calls Gemini concurrently under a requests-per-
+minute cap. Each answer is appended to the output JSONL as soon as it
+arrives, with latencies and token counts.
+
+The output file doubles as the checkpoint: rerunning the same command
+skips questions that already have a successful answer and retries the
+rest, so an interrupted or partly failed run can simply be resumed.
+
+Usage:
+    python batch_qa.py questions.jsonl                     # -> answers.jsonl
+    python batch_qa.py questions.jsonl --output kb-v2.jsonl --concurrency 8 --rpm 120
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Set
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class RateCap:
+    """Space calls evenly so at most ``per_minute`` start in any minute."""
+    
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def read_questions(path: str) -> List[Dict]:
+    """Questions from a JSONL file, with ``id`` filled in from the line number."""
+    questions = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question"):
+                raise ValueError(f"{path}:{line_number}: missing 'question'")
+            item.setdefault("id", line_number)
+            questions.append(item)
+    return questions
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids with a successful answer in an earlier run's output."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+def answer(item: Dict, query_embedding, rate_cap: RateCap, retries: int, top_k: int) -> Dict:
+    """Retrieve context and generate one answer, retrying failed LLM calls.
+    
+    Retrieval errors propagate, so the question is recorded as failed and
+    retried on the next run instead of being answered without context.
+    """
+    from utils.knowledge import retriever
+    from utils.llm import chatbot
+    
+    started = time.perf_counter()
+    # Not retrieve_context, which reports errors in the UI and returns no context
+    context = retriever.format_context(retriever.retrieve(item["question"], top_k, query_embedding))
+    retrieval_ms = (time.perf_counter() - started) * 1000
+    
+    usage: Dict = {}
+    response = chatbot.FALLBACK_RESPONSE
+    attempts = 0
+    while attempts <= retries:
+        if attempts:
+            time.sleep(min(2 ** attempts, 30))
+        attempts += 1
+        rate_cap.acquire()
+        llm_started = time.perf_counter()
+        response = chatbot.generate_response(item["question"], [], context, usage=usage)
+        if response != chatbot.FALLBACK_RESPONSE:
+            break
+    llm_ms = (time.perf_counter() - llm_started) * 1000
+    
+    return {
+        **item,
+        'status': "ok" if response != chatbot.FALLBACK_RESPONSE else "failed",
+        'answer': response,
+        'context': context,
+        'attempts': attempts,
+        'retrieval_ms': round(retrieval_ms, 1),
+        'llm_ms': round(llm_ms, 1),
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'response_tokens': usage.get('response_tokens'),
+        'tokens_estimated': usage.get('estimated'),
+        'answered_at': datetime.utcnow().isoformat()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="input JSONL file")
+    parser.add_argument("--output", default="answers.jsonl", help="results JSONL, appended to and used to resume")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel LLM calls")
+    parser.add_argument("--rpm", type=float, default=60, help="maximum Gemini requests per minute (0 = no cap)")
+    parser.add_argument("--retries", type=int, default=2, help="extra attempts for a failed LLM call")
+    parser.add_argument("--top-k", type=int, default=3, help="knowledge chunks per question")
+    args = parser.parse_args()
+    
+    questions = read_questions(args.questions)
+    done = completed_ids(args.output)
+    pending = [item for item in questions if str(item["id"]) not in done]
+    
+    print("=" * 60)
+    print(f"Batch QA: {len(questions)} questions, {len(done)} already answered, {len(pending)} to run")
+    print("=" * 60)
+    if not pending:
+        return 0
+    
+    from utils.bootstrap import bootstrap
+    from utils.embeddings import embedding_service
+    
+    bootstrap.run()
+    while not bootstrap.finished:
+        time.sleep(0.1)
+    if not bootstrap.ready:
+        failed = [r['step'] for r in bootstrap.report if r['error']]
+        print(f"✗ Startup failed: {', '.join(failed)}")
+        return 1
+    
+    started = time.perf_counter()
+    embeddings = embedding_service.encode([item["question"] for item in pending])
+    print(f"  ✓ Embedded {len(pending)} questions in {time.perf_counter() - started:.1f}s")
+    
+    rate_cap = RateCap(args.rpm)
+    counts = {'ok': 0, 'failed': 0}
+    with open(args.output, "a") as out, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {
+            pool.submit(answer, item, embedding, rate_cap, args.retries, args.top_k): item
+            for item, embedding in zip(pending, embeddings)
+        }
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {**item, 'status': "failed", 'error': f"{type(e).__name__}: {e}"}
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            counts[record['status']] += 1
+            mark = "✓" if record['status'] == "ok" else "✗"
+            print(f"  {mark} [{sum(counts.values())}/{len(pending)}] {item['id']}: {record.get('total_ms', 0):.0f}ms")
+    
+    elapsed = time.perf_counter() - started
+    print(f"Done in {elapsed:.1f}s: {counts['ok']} answered, {counts['failed']} failed; results in {args.output}")
+    if counts['failed']:
+        print("Rerun the same command to retry the failed questions.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
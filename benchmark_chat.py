@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""End-to-end chat-turn benchmark with a per-stage breakdown.
+
+Runs the same sequence of calls as the chat input in ``render_chat_page``
+(rate-limit check, then ``chat_service.send_message``) against a fresh
+SQLite database and Chroma store and a deterministic fake Gemini model.
+Reports p50/p95/p99 latency and throughput for each stage:
+
+    rate_limit, persistence, embedding, vector_query, prompt, llm, analytics
+
+Results are written as JSON so runs can be compared between commits.
+
+Usage:
+    python benchmark_chat.py                              # 5 x 10 turns
+    python benchmark_chat.py --conversations 20 --turns 20 --llm-latency-ms 400
+    python benchmark_chat.py --output after.json --compare before.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+STAGES = ["rate_limit", "persistence", "embedding", "vector_query", "prompt", "llm", "analytics", "turn"]
+
+QUERIES = [
+    "What is the recruitment process for Boeing India?",
+    "Tell me about internship opportunities",
+    "What skills do I need for a software engineer role?",
+    "How should I prepare for Boeing interviews?",
+    "What projects should I work on?",
+    "Where are Boeing offices in India?",
+    "What is the minimum CGPA for campus placement?",
+    "How does career growth work after joining?",
+    "What should my resume highlight?",
+    "Does Boeing give pre-placement offers to interns?",
+]
+
+
+def configure_environment(workdir: str):
+    """Point settings at a scratch database and vector store.
+    
+    Must run before any project module is imported.
+    """
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["CHROMA_PERSIST_DIR"] = os.path.join(workdir, "chroma")
+    os.environ["RATE_LIMIT_BACKEND"] = "database"
+    os.environ["RATE_LIMIT_PER_MINUTE"] = str(10 ** 9)
+    os.environ["RATE_LIMIT_PER_HOUR"] = str(10 ** 9)
+
+
+class FakeGeminiModel:
+    """Stand-in for ``genai.GenerativeModel`` with deterministic output.
+    
+    The response is derived from a hash of the prompt, so identical runs
+    produce identical transcripts; ``latency_ms`` simulates network time.
+    """
+    
+    WORDS = ["Boeing", "India", "engineering", "students", "placement", "interview", "skills", "projects", "career", "roles"]
+    
+    def __init__(self, latency_ms: float = 0, words: int = 120):
+        self.latency = latency_ms / 1000
+        self.words = words
+    
+    def _text(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode()).digest()
+        return " ".join(self.WORDS[digest[i % len(digest)] % len(self.WORDS)] for i in range(self.words))
+    
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._text(prompt)
+        if stream:
+            return [SimpleNamespace(text=chunk + " ") for chunk in text.split(" ")]
+        return SimpleNamespace(text=text)
+
+
+class StageTimer:
+    """Attribute wrappers that add each call's duration to the current turn."""
+    
+    def __init__(self):
+        self.turns: List[Dict[str, float]] = []
+        self.calls: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self._current: Optional[Dict[str, float]] = None
+    
+    def wrap(self, obj, attr: str, stage: str):
+        original = getattr(obj, attr)
+        
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        
+        setattr(obj, attr, timed)
+    
+    def record(self, stage: str, seconds: float):
+        if self._current is not None:
+            self._current[stage] = self._current.get(stage, 0.0) + seconds
+            self.calls[stage] += 1
+    
+    def start_turn(self):
+        self._current = {}
+    
+    def end_turn(self, keep: bool):
+        if keep:
+            self.turns.append(self._current)
+        self._current = None
+
+
+class _TimedCollection:
+    """Proxy for the Chroma collection that times ``query``."""
+    
+    def __init__(self, collection, timer: StageTimer):
+        self._collection = collection
+        self._timer = timer
+    
+    def query(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._collection.query(*args, **kwargs)
+        finally:
+            self._timer.record("vector_query", time.perf_counter() - started)
+    
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(timer: StageTimer) -> Dict[str, Dict]:
+    """Per-stage latency percentiles (ms) and throughput (calls/s of stage time)."""
+    summary = {}
+    for stage in STAGES:
+        values = [turn[stage] for turn in timer.turns if stage in turn]
+        if not values:
+            continue
+        total = sum(values)
+        calls = timer.calls[stage] if stage != "turn" else len(values)
+        summary[stage] = {
+            'turns': len(values),
+            'calls': calls,
+            'mean_ms': total / len(values) * 1000,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'per_second': calls / total if total else 0.0
+        }
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(conversations: int, turns: int, warmup: int, llm_latency_ms: float) -> Dict:
+    """Seed a scratch deployment and drive chat turns through it."""
+    from config.settings import settings
+    from utils.bootstrap import bootstrap
+    from utils.chat import chat_service
+    from utils.conversation import conversation_manager
+    from utils.embeddings import embedding_service
+    from utils.knowledge import retriever
+    from utils.llm import chatbot
+    from utils.rate_limit import rate_limiter
+    from utils.auth import auth_manager
+    from utils.session_state import MessageRecord
+    
+    bootstrap.run()
+    while not bootstrap.finished:
+        time.sleep(0.1)
+    if not bootstrap.ready:
+        failed = [r for r in bootstrap.report if r['error']]
+        raise RuntimeError(f"Startup failed: {failed}")
+    
+    # Deterministic fake Gemini in place of the SDK
+    chatbot._genai = SimpleNamespace(types=SimpleNamespace(GenerationConfig=lambda **kwargs: kwargs))
+    chatbot._model = FakeGeminiModel(latency_ms=llm_latency_ms)
+    
+    timer = StageTimer()
+    timer.wrap(rate_limiter, "check_rate_limit", "rate_limit")
+    timer.wrap(conversation_manager, "add_message", "persistence")
+    timer.wrap(embedding_service, "encode", "embedding")
+    timer.wrap(chatbot, "build_prompt", "prompt")
+    timer.wrap(chatbot._model, "generate_content", "llm")
+    timer.wrap(conversation_manager, "log_query", "analytics")
+    if retriever.collection is not None:
+        retriever._collection = _TimedCollection(retriever.collection, timer)
+    
+    user, _ = auth_manager.authenticate({'email': 'bench@example.com', 'name': 'Benchmark', 'google_id': 'bench'})
+    
+    started = time.perf_counter()
+    turn_number = 0
+    for c in range(conversations):
+        conversation_id = conversation_manager.create_conversation(user).id
+        history = []
+        for t in range(turns):
+            prompt = QUERIES[(c + t) % len(QUERIES)]
+            timer.start_turn()
+            turn_started = time.perf_counter()
+            
+            # Same calls as the chat input in render_chat_page
+            if not rate_limiter.check_rate_limit(user.id):
+                raise RuntimeError("Rate limited during benchmark")
+            user_message, assistant_message = chat_service.send_message(user, conversation_id, prompt, list(history))
+            history.extend([
+                MessageRecord(id=user_message.id, role="user", content=prompt),
+                MessageRecord(id=assistant_message.id, role="assistant", content=assistant_message.content)
+            ])
+            history = history[-settings.SESSION_MESSAGE_WINDOW:]
+            
+            timer.record("turn", time.perf_counter() - turn_started)
+            timer.end_turn(keep=turn_number >= warmup)
+            turn_number += 1
+    elapsed = time.perf_counter() - started
+    
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'config': {
+            'conversations': conversations,
+            'turns_per_conversation': turns,
+            'warmup_turns': warmup,
+            'llm_latency_ms': llm_latency_ms,
+            'embedding_runtime': settings.EMBEDDING_RUNTIME,
+            'rerank_enabled': settings.RERANK_ENABLED
+        },
+        'turns': len(timer.turns),
+        'turns_per_second': turn_number / elapsed,
+        'stages': summarize(timer)
+    }
+
+
+def compare(current: Dict, baseline: Dict, max_regression: float) -> bool:
+    """Print p50/p95 deltas against a baseline; False if any p95 regressed too far."""
+    print("-" * 78)
+    print(f"Compared with {baseline.get('commit', '?')} ({baseline.get('timestamp', '?')})")
+    ok = True
+    for stage, stats in current['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before:
+            continue
+        deltas = {p: (stats[p] - before[p]) / before[p] if before[p] else 0.0 for p in ('p50_ms', 'p95_ms')}
+        regressed = deltas['p95_ms'] > max_regression
+        ok = ok and not regressed
+        mark = "✗" if regressed else "✓"
+        print(f"  {mark} {stage:<13} p50 {deltas['p50_ms']:+7.1%}   p95 {deltas['p95_ms']:+7.1%}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=10, help="turns per conversation")
+    parser.add_argument("--warmup", type=int, default=3, help="initial turns left out of the statistics")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="simulated Gemini latency")
+    parser.add_argument("--output", default="benchmark_chat.json", help="where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="earlier results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase when comparing")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory(prefix="chat-bench-") as workdir:
+        configure_environment(workdir)
+        results = run(args.conversations, args.turns, args.warmup, args.llm_latency_ms)
+    
+    print("=" * 78)
+    print(f"Chat turn benchmark @ {results['commit']}: {results['turns']} turns, {results['turns_per_second']:.1f} turns/s")
+    print("=" * 78)
+    print(f"{'stage':<13} {'calls':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'per sec':>10}")
+    for stage, stats in results['stages'].items():
+        print(
+            f"{stage:<13} {stats['calls']:>6} {stats['mean_ms']:>7.2f}ms {stats['p50_ms']:>7.2f}ms "
+            f"{stats['p95_ms']:>7.2f}ms {stats['p99_ms']:>7.2f}ms {stats['per_second']:>10.1f}"
+        )
+    
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
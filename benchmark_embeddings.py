@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Embedding runtime benchmark and retrieval parity check.
+
+Loads each runtime in a fresh process and reports load time, resident
+memory and encode throughput over the knowledge-base corpus. It then ranks
+the corpus for a set of sample queries with each runtime and compares the
+rankings against the reference ``torch`` runtime.
+
+Usage:
+    python benchmark_embeddings.py                       # all runtimes
+    python benchmark_embeddings.py --runtimes torch onnx-int8
+    python benchmark_embeddings.py --min-overlap 0.9     # exit 1 below this
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import settings
+from utils.embedding_runtimes import RUNTIMES
+
+REFERENCE_RUNTIME = "torch"
+
+SAMPLE_QUERIES = [
+    "What is the recruitment process for Boeing India?",
+    "Tell me about internship opportunities",
+    "What skills do I need for a software engineer role?",
+    "How should I prepare for Boeing interviews?",
+    "What projects should I work on?",
+    "Where are Boeing offices in India?",
+    "What is the minimum CGPA for campus placement?",
+    "How does career growth work after joining?",
+    "What should my resume highlight?",
+    "Does Boeing give pre-placement offers to interns?",
+]
+
+
+def _rss_mb() -> float:
+    """Resident set size of this process in MiB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(runtime: str, corpus: List[str], queries: List[str], repeat: int, results):
+    """Child process: load ``runtime`` and time encoding."""
+    from utils.embedding_runtimes import load_runtime
+    
+    try:
+        before = _rss_mb()
+        started = time.perf_counter()
+        model = load_runtime(runtime, settings.EMBEDDING_MODEL)
+        model.encode(["warm-up"])
+        load_seconds = time.perf_counter() - started
+        
+        texts = corpus * repeat
+        started = time.perf_counter()
+        model.encode(texts)
+        encode_seconds = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        for query in queries:
+            model.encode([query])
+        query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        
+        results.put({
+            'runtime': runtime,
+            'load_seconds': load_seconds,
+            'memory_mb': _rss_mb() - before,
+            'texts_per_second': len(texts) / encode_seconds,
+            'query_ms': query_ms,
+            'corpus_vectors': model.encode(corpus),
+            'query_vectors': model.encode(queries),
+            'error': None
+        })
+    except Exception as e:
+        results.put({'runtime': runtime, 'error': f"{type(e).__name__}: {e}"})
+
+
+def run_runtime(runtime: str, corpus: List[str], queries: List[str], repeat: int) -> Dict:
+    """Measure one runtime in a fresh interpreter so memory is not shared."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(runtime, corpus, queries, repeat, results))
+    process.start()
+    
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                result = {'runtime': runtime, 'error': f"process exited with code {process.exitcode}"}
+                break
+    
+    process.join()
+    return result
+
+
+def rankings(corpus_vectors, query_vectors, k: int) -> List[List[int]]:
+    """Top-``k`` corpus indices per query by cosine similarity."""
+    import numpy as np
+    
+    corpus_vectors = corpus_vectors / np.linalg.norm(corpus_vectors, axis=1, keepdims=True)
+    query_vectors = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    scores = query_vectors @ corpus_vectors.T
+    return [list(row[:k]) for row in np.argsort(-scores, axis=1)]
+
+
+def parity(reference: Dict, candidate: Dict, k: int) -> Dict[str, float]:
+    """Compare a runtime's rankings and vectors against the reference.
+    
+    Returns:
+        ``top1`` (share of queries with the same best match), ``overlap``
+        (mean share of the reference top-k that the candidate also returns)
+        and ``cosine`` (mean cosine between reference and candidate corpus
+        vectors)
+    """
+    import numpy as np
+    
+    expected = rankings(reference['corpus_vectors'], reference['query_vectors'], k)
+    actual = rankings(candidate['corpus_vectors'], candidate['query_vectors'], k)
+    
+    a, b = reference['corpus_vectors'], candidate['corpus_vectors']
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    
+    return {
+        'top1': sum(e[0] == c[0] for e, c in zip(expected, actual)) / len(expected),
+        'overlap': sum(len(set(e) & set(c)) / len(e) for e, c in zip(expected, actual)) / len(expected),
+        'cosine': float(cosine.mean())
+    }
+
+
+def load_corpus() -> List[str]:
+    """Knowledge-base contents from the database."""
+    from models.database import KnowledgeBase
+    from utils.database import get_db
+    
+    with get_db() as db:
+        return [content for (content,) in db.query(KnowledgeBase.content).order_by(KnowledgeBase.id).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runtimes", nargs="+", choices=RUNTIMES, default=list(RUNTIMES), help="runtimes to compare")
+    parser.add_argument("--repeat", type=int, default=20, help="times the corpus is repeated for throughput")
+    parser.add_argument("--top-k", type=int, default=3, help="ranking depth compared for parity")
+    parser.add_argument("--min-overlap", type=float, default=None, help="fail if any runtime's top-k overlap is lower")
+    args = parser.parse_args()
+    
+    corpus = load_corpus()
+    if not corpus:
+        print("✗ Knowledge base is empty; start the app once to seed it")
+        return 1
+    
+    runtimes = [REFERENCE_RUNTIME] + [r for r in args.runtimes if r != REFERENCE_RUNTIME]
+    results = []
+    for runtime in runtimes:
+        print(f"Measuring {runtime}...")
+        results.append(run_runtime(runtime, corpus, SAMPLE_QUERIES, args.repeat))
+    
+    reference = results[0]
+    if reference['error']:
+        print(f"✗ Reference runtime failed: {reference['error']}")
+        return 1
+    
+    print("=" * 78)
+    print(f"Embedding runtimes ({settings.EMBEDDING_MODEL}, {len(corpus)} documents, top-{args.top_k} parity)")
+    print("=" * 78)
+    print(f"{'runtime':<11} {'load':>7} {'memory':>9} {'texts/s':>9} {'query':>8} {'top1':>6} {'overlap':>8} {'cosine':>7}")
+    
+    failed = False
+    for result in results:
+        if result['error']:
+            print(f"{result['runtime']:<11} ✗ {result['error']}")
+            failed = True
+            continue
+        
+        scores = parity(reference, result, args.top_k)
+        print(
+            f"{result['runtime']:<11} {result['load_seconds']:>6.2f}s {result['memory_mb']:>7.0f}MB "
+            f"{result['texts_per_second']:>9.1f} {result['query_ms']:>6.1f}ms "
+            f"{scores['top1']:>6.0%} {scores['overlap']:>8.0%} {scores['cosine']:>7.4f}"
+        )
+        if args.min_overlap is not None and scores['overlap'] < args.min_overlap:
+            print(f"  ✗ Top-{args.top_k} overlap below {args.min_overlap:.0%}")
+            failed = True
+    
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
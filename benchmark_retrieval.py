@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Retrieval quality and latency benchmark over a labeled query set.
+
+Each query in the labeled JSONL file lists the knowledge-base entries that
+answer it, by id (``"relevant": [3, 7]``) or by title
+(``"relevant_titles": [...]``). For every combination of backend, corpus
+size and ``top_k`` the benchmark reports recall@k, MRR and nDCG@k for
+``KnowledgeRetriever.retrieve``, along with query latency percentiles,
+indexing time and memory growth.
+
+Backends are embedding runtimes (see ``utils/embedding_runtimes.py``),
+optionally with ``+rerank`` for the cross-encoder stage and ``+ivfpq`` to
+search the approximate index in ``utils/ann.py`` (trained after indexing)
+instead of Chroma. Larger corpora
+are the seed knowledge base plus deterministic synthetic distractor
+documents. Each backend and corpus size runs in a fresh process against a
+scratch database and Chroma store, with Hugging Face downloads disabled,
+so models must already be in the local cache.
+
+Usage:
+    python benchmark_retrieval.py                                  # torch, seed corpus
+    python benchmark_retrieval.py --backends torch onnx-int8 torch+rerank --corpus-sizes 0 1000 10000
+    python benchmark_retrieval.py --backends torch torch+ivfpq --corpus-sizes 100000
+    python benchmark_retrieval.py --output after.json --compare before.json --max-drop 0.02
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmark_chat import git_commit, percentile
+
+DEFAULT_QUERIES = os.path.join(PROJECT_ROOT, "benchmark_retrieval_queries.jsonl")
+
+QUALITY_METRICS = ("recall", "mrr", "ndcg")
+
+DISTRACTOR_TOPICS = [
+    "cafeteria menus", "parking permits", "travel reimbursement", "office furniture", "printer maintenance",
+    "quarterly town halls", "building access cards", "visitor badges", "holiday calendars", "IT helpdesk tickets",
+    "conference room booking", "shuttle timings", "fire drill schedules", "stationery requests", "gym membership",
+]
+
+DISTRACTOR_WORDS = (
+    "policy process request team schedule update employees facility approval form portal manager deadline "
+    "location week month quarter support contact office building floor desk system access guideline review"
+).split()
+
+
+def load_labels(path: str) -> List[Dict]:
+    """Labeled queries from JSONL."""
+    labels = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("query") or not (item.get("relevant") or item.get("relevant_titles")):
+                raise ValueError(f"{path}:{line_number}: needs 'query' and 'relevant' or 'relevant_titles'")
+            labels.append(item)
+    return labels
+
+
+def distractors(count: int, seed: int = 0) -> List[Dict]:
+    """Deterministic filler documents unrelated to any labeled query."""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        topic = rng.choice(DISTRACTOR_TOPICS)
+        body = " ".join(rng.choice(DISTRACTOR_WORDS) for _ in range(rng.randint(40, 120)))
+        documents.append({
+            "title": f"Synthetic {topic} note {i}",
+            "content": f"Internal note about {topic}. {body}.",
+            "source": "synthetic",
+            "category": "synthetic"
+        })
+    return documents
+
+
+def score(ranked: List[str], relevant: set, k: int) -> Dict[str, float]:
+    """recall@k, reciprocal rank and binary-gain nDCG@k of one ranking."""
+    top = ranked[:k]
+    hits = [doc_id in relevant for doc_id in top]
+    first = next((i for i, hit in enumerate(hits) if hit), None)
+    dcg = sum(1 / math.log2(i + 2) for i, hit in enumerate(hits) if hit)
+    ideal = sum(1 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return {
+        'recall': sum(hits) / len(relevant),
+        'mrr': 1 / (first + 1) if first is not None else 0.0,
+        'ndcg': dcg / ideal if ideal else 0.0
+    }
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(backend: str, corpus_size: int, top_ks: List[int], labels: List[Dict], repeat: int, results):
+    """Child process: build a scratch index for one backend and corpus size, then query it."""
+    runtime, *options = backend.split("+")
+    with tempfile.TemporaryDirectory(prefix="retrieval-bench-") as workdir:
+        os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ["CHROMA_PERSIST_DIR"] = os.path.join(workdir, "chroma")
+        os.environ["EMBEDDING_RUNTIME"] = runtime
+        os.environ["EMBEDDING_SERVICE"] = "inline"
+        os.environ["RERANK_ENABLED"] = "true" if "rerank" in options else "false"
+        os.environ["VECTOR_INDEX"] = "ivfpq" if "ivfpq" in options else "chroma"
+        os.environ["ANN_INDEX_DIR"] = os.path.join(workdir, "ann")
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+        
+        try:
+            from models.database import KnowledgeBase
+            from utils.database import get_db, init_db
+            from utils.embeddings import embedding_service
+            from utils.knowledge import retriever
+            from utils.rerank import reranker
+            
+            before = _rss_mb()
+            init_db()
+            embedding_service.encode(["warm-up"])
+            if "rerank" in options:
+                reranker.warm_up()
+            
+            started = time.perf_counter()
+            retriever.initialize_knowledge_base()
+            extra = distractors(corpus_size)
+            for i in range(0, len(extra), 1000):
+                retriever.add_knowledge_batch(extra[i:i + 1000])
+            if "ivfpq" in options:
+                retriever.collection.index.train()
+            index_seconds = time.perf_counter() - started
+            
+            with get_db() as db:
+                ids_by_title = {title: str(kb_id) for kb_id, title in db.query(KnowledgeBase.id, KnowledgeBase.title).all()}
+                documents = db.query(KnowledgeBase).count()
+            
+            relevant = []
+            for item in labels:
+                ids = {str(kb_id) for kb_id in item.get("relevant", [])}
+                for title in item.get("relevant_titles", []):
+                    if title not in ids_by_title:
+                        raise ValueError(f"Unknown knowledge-base title in labels: {title!r}")
+                    ids.add(ids_by_title[title])
+                relevant.append(ids)
+            
+            runs = {}
+            for k in top_ks:
+                retriever.retrieve(labels[0]["query"], k)  # warm the collection for this depth
+                latencies, totals = [], {metric: 0.0 for metric in QUALITY_METRICS}
+                for _ in range(repeat):
+                    for item, ids in zip(labels, relevant):
+                        query_started = time.perf_counter()
+                        ranked = [candidate['id'] for candidate in retriever.retrieve(item["query"], k)]
+                        latencies.append(time.perf_counter() - query_started)
+                        for metric, value in score(ranked, ids, k).items():
+                            totals[metric] += value / repeat
+                runs[str(k)] = {
+                    **{metric: total / len(labels) for metric, total in totals.items()},
+                    'p50_ms': percentile(latencies, 50) * 1000,
+                    'p95_ms': percentile(latencies, 95) * 1000,
+                    'p99_ms': percentile(latencies, 99) * 1000
+                }
+            
+            results.put({
+                'backend': backend,
+                'corpus_size': corpus_size,
+                'documents': documents,
+                'index_seconds': index_seconds,
+                'memory_mb': _rss_mb() - before,
+                'top_k': runs,
+                'error': None
+            })
+        except Exception as e:
+            results.put({'backend': backend, 'corpus_size': corpus_size, 'error': f"{type(e).__name__}: {e}"})
+
+
+def run_configuration(backend: str, corpus_size: int, top_ks: List[int], labels: List[Dict], repeat: int) -> Dict:
+    """Measure one backend and corpus size in a fresh interpreter."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(backend, corpus_size, top_ks, labels, repeat, results))
+    process.start()
+    
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                result = {'backend': backend, 'corpus_size': corpus_size, 'error': f"process exited with code {process.exitcode}"}
+                break
+    
+    process.join()
+    return result
+
+
+def _key(result: Dict) -> str:
+    return f"{result['backend']}@{result['corpus_size']}"
+
+
+def compare(current: Dict, baseline: Dict, max_drop: float, max_regression: float) -> bool:
+    """Print metric deltas against a baseline; False if quality or p95 regressed too far."""
+    print("-" * 78)
+    print(f"Compared with {baseline.get('commit', '?')} ({baseline.get('timestamp', '?')})")
+    before_runs = {_key(r): r for r in baseline.get('results', []) if not r.get('error')}
+    ok = True
+    for result in current['results']:
+        before = before_runs.get(_key(result))
+        if result['error'] or not before:
+            continue
+        for k, stats in result['top_k'].items():
+            old = before['top_k'].get(k)
+            if not old:
+                continue
+            drops = {metric: old[metric] - stats[metric] for metric in QUALITY_METRICS}
+            p95 = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+            regressed = max(drops.values()) > max_drop or p95 > max_regression
+            ok = ok and not regressed
+            mark = "✗" if regressed else "✓"
+            print(
+                f"  {mark} {_key(result):<24} k={k:<3} recall {-drops['recall']:+.3f}  "
+                f"mrr {-drops['mrr']:+.3f}  ndcg {-drops['ndcg']:+.3f}  p95 {p95:+7.1%}"
+            )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="labeled JSONL file")
+    parser.add_argument("--backends", nargs="+", default=["torch"], help="embedding runtimes, optionally with +rerank and/or +ivfpq")
+    parser.add_argument("--corpus-sizes", nargs="+", type=int, default=[0], help="synthetic documents added to the seed corpus")
+    parser.add_argument("--top-k", nargs="+", type=int, default=[1, 3, 5], help="retrieval depths to evaluate")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the query set for latency")
+    parser.add_argument("--output", default="benchmark_retrieval.json", help="where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="earlier results to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.02, help="allowed absolute drop in recall, MRR or nDCG")
+    parser.add_argument("--max-regression", type=float, default=0.5, help="allowed relative p95 increase")
+    parser.add_argument("--min-recall", type=float, default=None, help="fail if any recall@k is lower")
+    args = parser.parse_args()
+    
+    labels = load_labels(args.queries)
+    results = []
+    for backend in args.backends:
+        for corpus_size in args.corpus_sizes:
+            print(f"Measuring {backend} with {corpus_size} extra documents...")
+            results.append(run_configuration(backend, corpus_size, args.top_k, labels, args.repeat))
+    
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'config': {'queries': args.queries, 'labeled_queries': len(labels), 'repeat': args.repeat},
+        'results': results
+    }
+    
+    print("=" * 78)
+    print(f"Retrieval benchmark @ {report['commit']}: {len(labels)} labeled queries")
+    print("=" * 78)
+    print(f"{'backend':<16} {'docs':>7} {'k':>3} {'recall':>7} {'MRR':>6} {'nDCG':>6} {'p50':>8} {'p95':>8} {'index':>7} {'memory':>8}")
+    failed = False
+    for result in results:
+        if result['error']:
+            print(f"{result['backend']:<16} ✗ {result['error']}")
+            failed = True
+            continue
+        for k, stats in result['top_k'].items():
+            print(
+                f"{result['backend']:<16} {result['documents']:>7} {k:>3} {stats['recall']:>7.3f} {stats['mrr']:>6.3f} "
+                f"{stats['ndcg']:>6.3f} {stats['p50_ms']:>6.1f}ms {stats['p95_ms']:>6.1f}ms "
+                f"{result['index_seconds']:>6.1f}s {result['memory_mb']:>6.0f}MB"
+            )
+            if args.min_recall is not None and stats['recall'] < args.min_recall:
+                print(f"  ✗ recall@{k} below {args.min_recall:.2f}")
+                failed = True
+    
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_drop, args.max_regression):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
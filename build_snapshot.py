@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Build a prebuilt knowledge snapshot for fast, read-only startup.
+
+Embeds every knowledge base entry and writes a versioned bundle (model
+weights, document texts and metadata, a memory-mappable embedding matrix
+and a checksummed manifest) under the output directory, then points
+``<output>/current`` at it. Serve it by setting
+``KNOWLEDGE_SNAPSHOT_PATH=<output>/current``; see ``utils/snapshot.py``.
+
+Without ``--database-uri`` the built-in corpus is seeded into a scratch
+database, so the command needs no running services (e.g. during
+``docker build``). Point it at the live database to include ingested
+career pages. The version is a hash of the corpus and model, so
+rebuilding unchanged content reuses the existing bundle.
+
+Usage:
+    python build_snapshot.py --output ./snapshots
+    python build_snapshot.py --output ./snapshots --database-uri postgresql://...
+    python build_snapshot.py --verify ./snapshots/current
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure_environment(workdir: str, database_uri: str = None):
+    """Point settings at the source database and a scratch vector store.
+    
+    Must run before any project module is imported.
+    """
+    os.environ["DATABASE_URI"] = database_uri or f"sqlite:///{os.path.join(workdir, 'snapshot.db')}"
+    os.environ["CHROMA_PERSIST_DIR"] = os.path.join(workdir, "chroma")
+    os.environ["KNOWLEDGE_SNAPSHOT_PATH"] = ""
+
+
+def verify_snapshot(path: str) -> int:
+    from utils.snapshot import SnapshotError, verify
+    
+    try:
+        manifest = verify(path, checksums=True)
+    except SnapshotError as e:
+        print(f"✗ {path}: {e}")
+        return 1
+    print(f"✓ {os.path.realpath(path)}: version {manifest['version']}, {manifest['count']} documents, "
+          f"{len(manifest['files'])} files verified")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="./snapshots", help="directory for snapshot versions")
+    parser.add_argument("--database-uri", default=None, help="read the knowledge base from here (default: scratch database seeded with the built-in corpus)")
+    parser.add_argument("--verify", metavar="PATH", help="check an existing snapshot's checksums and exit")
+    args = parser.parse_args()
+    
+    if args.verify:
+        return verify_snapshot(args.verify)
+    
+    with tempfile.TemporaryDirectory(prefix="knowledge-snapshot-") as workdir:
+        configure_environment(workdir, args.database_uri)
+        
+        from models.database import KnowledgeBase
+        from utils.database import get_db, init_db
+        from utils.snapshot import build_snapshot
+        
+        if args.database_uri is None:
+            from utils.knowledge import retriever
+            init_db()
+            retriever.initialize_knowledge_base()
+        
+        with get_db() as db:
+            documents = [
+                {
+                    "id": entry.id,
+                    "title": entry.title,
+                    "content": entry.content,
+                    "source": entry.source,
+                    "category": entry.category
+                }
+                for entry in db.query(KnowledgeBase).order_by(KnowledgeBase.id).all()
+            ]
+        
+        if not documents:
+            print("✗ The knowledge base is empty")
+            return 1
+        
+        print(f"Embedding {len(documents)} documents...")
+        started = time.perf_counter()
+        path = build_snapshot(args.output, documents)
+    
+    print(f"✓ Snapshot written to {path} in {time.perf_counter() - started:.1f}s")
+    print(f"  Serve it with KNOWLEDGE_SNAPSHOT_PATH={os.path.join(args.output, 'current')}")
+    return verify_snapshot(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
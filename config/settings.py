@@ -11,12 +11,14 @@ class Settings(BaseSettings):
     # App Info
     APP_NAME: str = "Boeing India Career Chatbot"
     APP_VERSION: str = "1.0.0"
+    ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")  # 'development' or 'production'
     
     # Database
     DATABASE_URI: str = os.getenv("DATABASE_URI", "")
     
     # API Keys
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_API_ENDPOINT: str = os.getenv("GEMINI_API_ENDPOINT", "")  # override, e.g. http://127.0.0.1:8089
     LANGSEARCH_API_KEY: str = os.getenv("LANGSEARCH_API_KEY", "")
     
     # Google OAuth
@@ -30,16 +32,83 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 10
     RATE_LIMIT_PER_HOUR: int = 100
+    AUTH_RATE_LIMIT: str = "10/minute"  # per IP, on the API's login endpoints
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "database")  # 'memory', 'database' or 'redis'
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
     
     # LLM Settings
     MAX_TOKENS: int = 2048
     TEMPERATURE: float = 0.7
     
+    # Vector store
+    CHROMA_PERSIST_DIR: str = "./chroma_db"
+    KNOWLEDGE_SNAPSHOT_PATH: str = os.getenv("KNOWLEDGE_SNAPSHOT_PATH", "")  # prebuilt bundle; replaces ChromaDB when set
+    KNOWLEDGE_SNAPSHOT_VERIFY: bool = False  # rehash every file on open, not just compare sizes
+    VECTOR_INDEX: str = os.getenv("VECTOR_INDEX", "chroma")  # 'chroma' or 'ivfpq' (see utils/ann.py)
+    ANN_INDEX_DIR: str = "./ann_index"
+    ANN_NLIST: int = 0  # coarse lists; 0 = about 2 * sqrt(n) at training time
+    ANN_PQ_SUBVECTORS: int = 48  # code bytes per vector; must divide the embedding dimension
+    ANN_NPROBE: int = 16  # lists scanned per query
+    ANN_RESCORE_FACTOR: int = 10  # shortlist per returned result, rescored with full vectors
+    ANN_TRAIN_MIN: int = 20000  # search exactly until the index holds this many vectors
+    
+    # Embeddings
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_RUNTIME: str = os.getenv("EMBEDDING_RUNTIME", "torch")  # 'torch', 'torch-int8', 'onnx' or 'onnx-int8'
+    EMBEDDING_CACHE_DIR: str = "./models_cache"  # ONNX exports
+    EMBEDDING_SERVICE: str = os.getenv("EMBEDDING_SERVICE", "inline")  # 'inline', 'pool' or 'socket'
+    EMBEDDING_POOL_WORKERS: int = 0  # 0 = one worker per EMBEDDING_THREADS_PER_WORKER cores
+    EMBEDDING_THREADS_PER_WORKER: int = 2
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_MAX_BATCH: int = 64
+    EMBEDDING_SOCKET_PATH: str = os.getenv("EMBEDDING_SOCKET_PATH", "/tmp/boeing-embeddings.sock")
+    
+    # Live data
+    LANGSEARCH_URL: str = "https://api.langsearch.com/v1/web-search"
+    CAREER_PAGE_URLS: List[str] = ["https://www.boeing.co.in/careers"]
+    FETCH_CACHE_DIR: str = "./fetch_cache"
+    FETCH_MAX_WORKERS: int = 8
+    FETCH_PER_HOST_CONCURRENCY: int = 2
+    FETCH_PER_HOST_DELAY: float = 1.0  # seconds between requests to one host
+    FETCH_TIMEOUT_SECONDS: float = 15.0
+    FETCH_MIN_REFRESH_SECONDS: int = 3600  # serve the cached copy without revalidating
+    FETCH_CHUNK_CHARS: int = 1000
+    
+    # Reranking
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_OVERFETCH: int = 4  # candidates fetched per returned chunk
+    RERANK_BUDGET_MS: int = 150  # keep the bi-encoder order when scoring takes longer
+    RERANK_MIN_SCORE: float = 0.1  # drop chunks below this relevance (sigmoid of the cross-encoder logit)
+    RERANK_CACHE_SIZE: int = 4096
+    
+    # Tracing
+    TRACING_ENABLED: bool = True
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")  # 'none', 'file' or 'otlp'
+    TRACE_FILE: str = "./traces.jsonl"
+    OTLP_ENDPOINT: str = os.getenv("OTLP_ENDPOINT", "http://localhost:4318")
+    TRACE_RECENT_SIZE: int = 200  # root traces kept in memory for the dashboard
+    
+    # Analytics
+    POPULAR_QUERY_SKETCH_SIZE: int = 200
+    POPULAR_QUERY_FLUSH_SECONDS: int = 60
+    ANALYTICS_RETENTION_DAYS: int = 365  # raw events older than this are purged; 0 keeps them all
+    ANALYTICS_PURGE_BATCH_SIZE: int = 5000  # rows per delete transaction
+    ANALYTICS_PARTITIONS_AHEAD: int = 2  # future monthly partitions created in advance
+    
     # Conversation Settings
     MAX_HISTORY_MESSAGES: int = 20
+    TRANSCRIPT_VISIBLE_MESSAGES: int = 30  # older messages stay collapsed until requested
+    SESSION_MESSAGE_WINDOW: int = 50  # messages kept in session state; the rest stay in the DB
+    SEARCH_PAGE_SIZE: int = 5  # message search results per sidebar page
+    PANEL_CACHE_USERS: int = 1024  # users whose conversation list, bookmarks and limits are cached
+    PANEL_CACHE_TTL_SECONDS: int = 60  # bounds staleness from writes made by other processes
+    PANEL_CONVERSATIONS: int = 50  # recent conversations cached per user; larger limits are capped
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
+    SESSION_TTL_HOURS: int = 24 * 7
+    SESSION_CACHE_SIZE: int = 1024
     
     class Config:
         env_file = ".env"
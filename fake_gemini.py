@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Gemini REST API, for load tests.
+
+Serves ``generateContent`` and ``streamGenerateContent`` with configurable
+latency and error distributions. Point the app at it with:
+
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 GEMINI_API_KEY=fake uvicorn api:app
+
+Usage:
+    python fake_gemini.py                                   # ~800 ms median
+    python fake_gemini.py --latency-ms 1500 --latency-sigma 0.6
+    python fake_gemini.py --error-rate 0.05 --error-codes 429,503
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ERROR_STATUS = {
+    400: "INVALID_ARGUMENT",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+WORDS = (
+    "Boeing India hires engineering graduates through campus drives and off-campus applications. "
+    "Prepare fundamentals, practise coding problems, and highlight aerospace projects on your resume. "
+    "Internships last two to six months and strong interns may receive pre-placement offers."
+).split()
+
+ROUTE = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^:]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+class FakeGemini:
+    """Latency, error and response-size model shared by request handlers."""
+    
+    def __init__(self, latency_ms: float, latency_sigma: float, ttft_fraction: float,
+                 error_rate: float, error_codes, response_words: int, seed: int):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.ttft_fraction = ttft_fraction
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.response_words = response_words
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+    
+    def sample(self):
+        """Draw (latency seconds, error code or None, response text) for a request."""
+        with self._lock:
+            self.requests += 1
+            latency = self.latency_ms * self._random.lognormvariate(0, self.latency_sigma) / 1000 if self.latency_ms else 0.0
+            error = self._random.choice(self.error_codes) if self._random.random() < self.error_rate else None
+            if error:
+                self.errors += 1
+            start = self._random.randrange(len(WORDS))
+        text = " ".join(WORDS[(start + i) % len(WORDS)] for i in range(self.response_words))
+        return latency, error, text
+
+
+def _candidate(text: str, finished: bool) -> dict:
+    candidate = {'content': {'parts': [{'text': text}], 'role': "model"}, 'index': 0}
+    if finished:
+        candidate['finishReason'] = "STOP"
+    return {'candidates': [candidate]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeGemini/1.0"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_POST(self):
+        match = ROUTE.match(self.path)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not match:
+            self._send_json(404, {'error': {'code': 404, 'message': "Not found", 'status': "NOT_FOUND"}})
+            return
+        
+        fake = self.server.fake
+        latency, error, text = fake.sample()
+        
+        if error:
+            time.sleep(latency * fake.ttft_fraction)
+            self._send_json(error, {'error': {
+                'code': error,
+                'message': "Injected failure from fake_gemini.py",
+                'status': ERROR_STATUS.get(error, "UNKNOWN")
+            }})
+            return
+        
+        if match.group("method") == "generateContent":
+            time.sleep(latency)
+            self._send_json(200, _candidate(text, finished=True))
+            return
+        
+        # Streamed as a JSON array whose elements arrive over the latency
+        words = text.split(" ")
+        pieces = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+        first = latency * fake.ttft_fraction
+        gap = (latency - first) / max(len(pieces) - 1, 1)
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        time.sleep(first)
+        self.wfile.write(b"[")
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(gap)
+                self.wfile.write(b",\r\n")
+            self.wfile.write(json.dumps(_candidate(piece, finished=i == len(pieces) - 1)).encode())
+            self.wfile.flush()
+        self.wfile.write(b"]")
+
+
+def serve(fake: FakeGemini, host: str = "127.0.0.1", port: int = 8089) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread and return it."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=800, help="median response latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="log-normal spread of the latency")
+    parser.add_argument("--ttft-fraction", type=float, default=0.3, help="share of the latency before the first streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected error")
+    parser.add_argument("--error-codes", default="429,500,503", help="comma-separated HTTP codes to inject")
+    parser.add_argument("--response-words", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    fake = FakeGemini(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        ttft_fraction=args.ttft_fraction,
+        error_rate=args.error_rate,
+        error_codes=[int(code) for code in args.error_codes.split(",")],
+        response_words=args.response_words,
+        seed=args.seed
+    )
+    server = serve(fake, args.host, args.port)
+    print(f"Fake Gemini listening on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"  {fake.requests} requests, {fake.errors} injected errors")
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
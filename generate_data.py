@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Bulk synthetic data for scale-testing the schema.
+
+Loads users, conversations, messages, bookmarks and analytics events at
+production-like volumes with skewed (Zipf) per-user activity. PostgreSQL
+is loaded with COPY, other databases with batched Core inserts; the ORM
+is bypassed. Output is deterministic for a given ``--seed`` and ``--end``.
+
+Usage:
+    python generate_data.py                               # defaults below
+    python generate_data.py --scale 0.01                  # 1% for a quick run
+    python generate_data.py --database-uri postgresql://... --seed 7 --end 2024-06-30
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULTS = {
+    'users': 50_000,
+    'conversations': 300_000,
+    'messages': 3_000_000,
+    'bookmarks': 200_000,
+    'analytics': 1_000_000,
+}
+
+TOPICS = [
+    "campus recruitment", "internships", "the aptitude test", "technical interviews", "HR interviews",
+    "CATIA", "avionics software", "systems engineering", "supply chain roles", "quality engineering",
+    "the Bengaluru center", "pre-placement offers", "CGPA cutoffs", "resume formatting", "career growth",
+    "aerospace projects", "DO-178C", "Six Sigma", "UAV design", "CFD analysis",
+]
+
+QUESTIONS = [
+    "How do I prepare for {}?",
+    "What does Boeing India expect for {}?",
+    "Can you tell me about {}?",
+    "Is {} important for freshers?",
+    "What are common mistakes in {}?",
+    "How long does {} take?",
+    "Any tips on {} for mechanical students?",
+    "What should I know about {} before applying?",
+]
+
+WORDS = (
+    "Boeing India engineering students campus placement interview skills projects career roles aerospace "
+    "design analysis manufacturing software quality supply chain internship resume technical HR aptitude "
+    "preparation fundamentals practice experience team leadership safety integrity learning growth mentor "
+    "Bengaluru center application portal assessment offer stipend domain knowledge certification tools"
+).split()
+
+
+def zipf_cum_weights(n: int, skew: float, rng: random.Random) -> List[float]:
+    """Cumulative Zipf weights over ``n`` items in shuffled order."""
+    weights = [1 / (rank + 1) ** skew for rank in range(n)]
+    rng.shuffle(weights)
+    return list(itertools.accumulate(weights))
+
+
+def batched(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class SyntheticData:
+    """Deterministic row generators for each table.
+    
+    IDs are assigned here, starting after the existing maximum, so child
+    rows can reference parents without reading them back.
+    """
+    
+    def __init__(self, counts: Dict[str, int], days: int, end: datetime, skew: float, seed: int, id_offsets: Dict[str, int]):
+        self.counts = counts
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.end = end
+        self.start = end - timedelta(days=days)
+        self.span_seconds = days * 86400
+        self.offsets = id_offsets
+        
+        self.user_cum = zipf_cum_weights(counts['users'], skew, self.rng)
+        self.question_pool = [self.rng.choice(QUESTIONS).format(self.rng.choice(TOPICS)) for _ in range(2000)]
+        self.answer_pool = [
+            " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(40, 220))) + "."
+            for _ in range(5000)
+        ]
+        
+        # Conversation owners and lengths (even: user/assistant pairs), scaled to the message target
+        n = counts['conversations']
+        self.conversation_users = array("i", self.rng.choices(range(counts['users']), cum_weights=self.user_cum, k=n))
+        raw = [self.rng.lognormvariate(0, 0.9) for _ in range(n)]
+        scale = counts['messages'] / max(sum(raw), 1e-9)
+        self.conversation_lengths = array("i", (max(2, 2 * round(r * scale / 2)) for r in raw))
+        self.conversation_first_message = array("q", itertools.accumulate(
+            itertools.chain([0], self.conversation_lengths[:-1])
+        ))
+    
+    def _time(self) -> datetime:
+        return self.start + timedelta(seconds=self.rng.random() * self.span_seconds)
+    
+    def users(self) -> Iterator[Tuple]:
+        base = self.offsets['users']
+        for i in range(self.counts['users']):
+            uid = base + i + 1
+            created = self._time()
+            yield (uid, f"student{uid}@example.edu", f"Student {uid}", f"synthetic-{uid}",
+                   self.rng.random() < 0.2, created, created + timedelta(days=self.rng.random() * 30))
+    
+    def _conversation(self, c: int) -> Tuple[random.Random, datetime, List[datetime], str]:
+        """Conversation ``c``'s own RNG, creation time, message times and opening question.
+        
+        Each conversation draws from an RNG seeded by its index, so the
+        conversation and message passes regenerate the same values
+        independently and neither has to hold the other's rows.
+        """
+        rng = random.Random(f"{self.seed}:conversation:{c}")
+        created = self.start + timedelta(seconds=rng.random() * self.span_seconds)
+        gaps = itertools.accumulate(rng.uniform(5, 120) for _ in range(self.conversation_lengths[c]))
+        times = [created + timedelta(seconds=g) for g in gaps]
+        return rng, created, times, rng.choice(self.question_pool)
+        
+    def conversations(self) -> Iterator[Tuple]:
+        user_base, conv_base = self.offsets['users'], self.offsets['conversations']
+        for c in range(self.counts['conversations']):
+            _, created, times, question = self._conversation(c)
+            yield (conv_base + c + 1, user_base + self.conversation_users[c] + 1, question[:60],
+                   created, times[-1], True)
+        
+    def messages(self) -> Iterator[Tuple]:
+        """Message rows, timed after their conversation's creation."""
+        conv_base, msg_base = self.offsets['conversations'], self.offsets['messages']
+        for c in range(self.counts['conversations']):
+            rng, _, times, question = self._conversation(c)
+            first = msg_base + self.conversation_first_message[c] + 1
+            for k in range(self.conversation_lengths[c]):
+                if k % 2 == 0:
+                    content, metadata = (question if k == 0 else rng.choice(self.question_pool)), None
+                else:
+                    content, metadata = rng.choice(self.answer_pool), {"context_used": rng.random() < 0.7}
+                yield (first + k, conv_base + c + 1, "user" if k % 2 == 0 else "assistant",
+                       content, metadata, times[k])
+    
+    def bookmarks(self) -> Iterator[Tuple]:
+        base, msg_base, user_base = self.offsets['bookmarks'], self.offsets['messages'], self.offsets['users']
+        length_cum = list(itertools.accumulate(self.conversation_lengths))
+        seen = set()
+        picks = self.rng.choices(range(len(self.conversation_lengths)), cum_weights=length_cum, k=self.counts['bookmarks'])
+        for n, c in enumerate(picks):
+            index = 2 * self.rng.randrange(self.conversation_lengths[c] // 2) + 1  # an assistant message
+            message_id = msg_base + self.conversation_first_message[c] + index + 1
+            user_id = user_base + self.conversation_users[c] + 1
+            if (user_id, message_id) in seen:
+                continue
+            seen.add((user_id, message_id))
+            yield (base + n + 1, user_id, message_id, None, self._time())
+    
+    def analytics(self) -> Iterator[Tuple]:
+        base, user_base = self.offsets['analytics'], self.offsets['users']
+        users = self.rng.choices(range(self.counts['users']), cum_weights=self.user_cum, k=self.counts['analytics'])
+        for n, u in enumerate(users):
+            created = self._time()
+            roll = self.rng.random()
+            if roll < 0.8:
+                event_type = "query"
+                data = {
+                    'query': self.rng.choice(self.question_pool),
+                    'response_length': self.rng.randint(200, 1500),
+                    'timestamp': created.isoformat()
+                }
+            elif roll < 0.95:
+                event_type, data = "login", {'timestamp': created.isoformat()}
+            else:
+                event_type, data = "bookmark", {'timestamp': created.isoformat()}
+            yield (base + n + 1, user_base + u + 1, event_type, data, created, None, None)
+
+
+class Loader:
+    """Write row tuples to a table with COPY (PostgreSQL) or batched inserts."""
+    
+    def __init__(self, engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.postgres = engine.dialect.name == "postgresql"
+    
+    def load(self, table, columns: Sequence[str], rows: Iterable[Tuple], json_columns: Sequence[str] = (), route=None) -> int:
+        """Load ``rows``; ``route(row)`` may pick a per-row target table for non-COPY loads."""
+        json_positions = [columns.index(c) for c in json_columns]
+        total = 0
+        if self.postgres:
+            raw = self.engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+                for batch in batched(rows, self.batch_size):
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for row in batch:
+                        row = list(row)
+                        for p in json_positions:
+                            row[p] = json.dumps(row[p]) if row[p] is not None else None
+                        writer.writerow(row)
+                    buffer.seek(0)
+                    cursor.copy_expert(sql, buffer)
+                    total += len(batch)
+                raw.commit()
+            finally:
+                raw.close()
+        else:
+            with self.engine.begin() as conn:
+                if self.engine.dialect.name == "sqlite":
+                    conn.exec_driver_sql("PRAGMA synchronous = OFF")
+                for batch in batched(rows, self.batch_size):
+                    targets: Dict = {}
+                    for row in batch:
+                        targets.setdefault(route(row) if route else table, []).append(dict(zip(columns, row)))
+                    for target, values in targets.items():
+                        conn.execute(target.insert(), values)
+                    total += len(batch)
+        return total
+    
+    def reset_sequences(self, tables):
+        """Move PostgreSQL id sequences past the explicitly inserted ids."""
+        if not self.postgres:
+            return
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for table, default in DEFAULTS.items():
+        parser.add_argument(f"--{table}", type=int, default=default, help=f"{table} rows (default {default:,})")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every row count")
+    parser.add_argument("--days", type=int, default=180, help="history length")
+    parser.add_argument("--end", default=None, help="last day of history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of per-user activity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    parser.add_argument("--database-uri", default=None, help="target database (default: DATABASE_URI)")
+    parser.add_argument("--skip-rollups", action="store_true", help="do not rebuild counters and rollups afterwards")
+    args = parser.parse_args()
+    
+    if args.database_uri:
+        os.environ["DATABASE_URI"] = args.database_uri
+    
+    from sqlalchemy import func, select
+    from models.database import Analytics, Bookmark, Conversation, Message, User
+    from utils.database import engine, init_db
+    from utils.partitions import analytics_partitions
+    
+    init_db()
+    tables = {'users': User, 'conversations': Conversation, 'messages': Message, 'bookmarks': Bookmark}
+    with engine.connect() as conn:
+        offsets = {name: conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar() for name, model in tables.items()}
+    offsets['analytics'] = analytics_partitions.max_id()
+    
+    counts = {name: max(1, int(getattr(args, name) * args.scale)) for name in DEFAULTS}
+    end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    end += timedelta(days=1)
+    
+    print("=" * 60)
+    print(f"Generating synthetic data into {engine.url.render_as_string(hide_password=True)}")
+    print("=" * 60)
+    started = time.perf_counter()
+    data = SyntheticData(counts, args.days, end, args.skew, args.seed, offsets)
+    loader = Loader(engine, args.batch_size)
+    print(f"  Planned in {time.perf_counter() - started:.1f}s")
+    
+    def timed(name: str, load):
+        t = time.perf_counter()
+        rows = load()
+        seconds = time.perf_counter() - t
+        print(f"  ✓ {name:<14} {rows:>10,} rows  {seconds:>7.1f}s  {rows / max(seconds, 1e-9):>10,.0f} rows/s")
+    
+    timed("users", lambda: loader.load(
+        User.__table__,
+        ["id", "email", "name", "google_id", "is_first_time", "created_at", "last_login"],
+        data.users()
+    ))
+    
+    timed("conversations", lambda: loader.load(
+        Conversation.__table__,
+        ["id", "user_id", "title", "created_at", "updated_at", "is_active"],
+        data.conversations()
+    ))
+    timed("messages", lambda: loader.load(
+        Message.__table__,
+        ["id", "conversation_id", "role", "content", "msg_metadata", "created_at"],
+        data.messages(),
+        json_columns=["msg_metadata"]
+    ))
+    
+    timed("bookmarks", lambda: loader.load(
+        Bookmark.__table__,
+        ["id", "user_id", "message_id", "note", "created_at"],
+        data.bookmarks()
+    ))
+    analytics_partitions.ensure_range(data.start, data.end)
+    timed("analytics", lambda: loader.load(
+        Analytics.__table__,
+        ["id", "user_id", "event_type", "event_data", "created_at", "ip_address", "user_agent"],
+        data.analytics(),
+        json_columns=["event_data"],
+        route=lambda row: analytics_partitions.table_for(row[4])
+    ))
+    
+    loader.reset_sequences([model.__table__ for model in tables.values()] + [Analytics.__table__])
+    
+    if not args.skip_rollups:
+        from utils.analytics import analytics_manager
+        t = time.perf_counter()
+        analytics_manager.rebuild_rollups()
+        print(f"  ✓ {'rollups':<14} rebuilt in {time.perf_counter() - t:.1f}s")
+    
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""Concurrent-user load generator for the headless API.
+
+Simulates students who each log in as their own demo account, list and open
+conversations, chat (streaming), bookmark replies and visit the admin
+dashboard, with randomized think time between actions. The number of
+users is stepped up (e.g. 1, 5, 10, 25, 50), and each step reports
+latency and throughput. The first step where chat p95 or the error rate
+crosses its threshold is reported as the saturation point.
+
+With ``--start-server`` the tool launches ``fake_gemini.py`` in-process and
+``uvicorn api:app`` against it (on a scratch SQLite database unless
+DATABASE_URI is set), so one command measures one container:
+
+    python loadtest.py --start-server --workers 2 --users 1,5,10,25,50
+
+To test an already running API, start it with limits raised and Gemini
+pointed at a fake server, then pass ``--url``:
+
+    python fake_gemini.py --latency-ms 800 &
+    RATE_LIMIT_PER_MINUTE=1000000 RATE_LIMIT_PER_HOUR=1000000 \\
+    AUTH_RATE_LIMIT=1000000/minute ADMIN_EMAILS='["demo@example.com"]' \\
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 GEMINI_API_KEY=fake \\
+    uvicorn api:app --port 8000 --workers 2
+    python loadtest.py --url http://127.0.0.1:8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmark_chat import QUERIES, git_commit, percentile
+from utils.llm import GeminiChatbot
+
+
+class Metrics:
+    """Latencies and errors per action for one concurrency step."""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+    
+    def record(self, action: str, seconds: float, ok: bool):
+        self.latencies[action].append(seconds)
+        if not ok:
+            self.errors[action] += 1
+    
+    def summary(self, elapsed: float) -> Dict:
+        actions = {}
+        for action, values in self.latencies.items():
+            actions[action] = {
+                'count': len(values),
+                'errors': self.errors[action],
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            'requests': total,
+            'requests_per_second': total / elapsed,
+            'chat_turns_per_second': len(self.latencies.get("chat", [])) / elapsed,
+            'error_rate': sum(self.errors.values()) / total if total else 0.0,
+            'actions': actions
+        }
+
+
+class SimulatedUser:
+    """One student's session against the API."""
+    
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        metrics: Metrics,
+        think_seconds: float,
+        rng: random.Random,
+        account: str,
+        admin_headers: Dict[str, str]
+    ):
+        self.client = client
+        self.metrics = metrics
+        self.think_seconds = think_seconds
+        self.rng = rng
+        self.account = account
+        self.admin_headers = admin_headers
+        self.headers = {}
+        self.conversation_id: Optional[int] = None
+    
+    async def _request(self, action: str, method: str, url: str, headers: Optional[Dict] = None, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers or self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.metrics.record(action, time.perf_counter() - started, ok=False)
+            return None
+        self.metrics.record(action, time.perf_counter() - started, ok=response.status_code < 400)
+        return response if response.status_code < 400 else None
+    
+    async def think(self):
+        await asyncio.sleep(max(0.5, self.rng.expovariate(1 / self.think_seconds)))
+    
+    async def login(self) -> bool:
+        response = await self._request("login", "POST", "/auth/demo", json={'account': self.account})
+        if response is None:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        await self._request("list_conversations", "GET", "/conversations")
+        return True
+    
+    async def new_conversation(self):
+        response = await self._request("new_conversation", "POST", "/conversations", json={})
+        if response is not None:
+            self.conversation_id = response.json()['id']
+    
+    async def chat(self):
+        """Send a message; records time to first byte and to the full reply.
+        
+        The API streams the fallback apology with a 200 when the LLM call
+        fails, so a reply ending in it counts as an error.
+        """
+        started = time.perf_counter()
+        ok = False
+        body = bytearray()
+        try:
+            async with self.client.stream(
+                "POST",
+                f"/conversations/{self.conversation_id}/messages",
+                headers=self.headers,
+                json={'content': self.rng.choice(QUERIES)}
+            ) as response:
+                ok = response.status_code < 400
+                first_byte = True
+                async for chunk in response.aiter_raw():
+                    if first_byte:
+                        self.metrics.record("chat_first_byte", time.perf_counter() - started, ok=ok)
+                        first_byte = False
+                    body.extend(chunk)
+            if body.decode("utf-8", errors="replace").endswith(GeminiChatbot.FALLBACK_RESPONSE):
+                ok = False
+        except httpx.HTTPError:
+            ok = False
+        self.metrics.record("chat", time.perf_counter() - started, ok=ok)
+    
+    async def open_and_bookmark(self):
+        response = await self._request("open_conversation", "GET", f"/conversations/{self.conversation_id}/messages")
+        replies = [m for m in (response.json() if response is not None else []) if m['role'] == "assistant"]
+        if replies and self.rng.random() < 0.5:
+            await self._request("bookmark", "PUT", f"/messages/{replies[-1]['id']}/bookmark")
+            await self._request("list_bookmarks", "GET", "/bookmarks")
+    
+    async def run(self):
+        await asyncio.sleep(self.rng.uniform(0, self.think_seconds))
+        if not await self.login():
+            return
+        await self.new_conversation()
+        
+        while True:
+            await self.think()
+            roll = self.rng.random()
+            if self.conversation_id is None or roll < 0.1:
+                await self.new_conversation()
+            elif roll < 0.25:
+                await self.open_and_bookmark()
+                continue
+            elif roll < 0.3:
+                await self._request("dashboard", "GET", "/analytics", headers=self.admin_headers)
+                continue
+            if self.conversation_id is not None:
+                await self.chat()
+
+
+async def run_step(url: str, users: int, seconds: float, think_seconds: float, seed: int) -> Dict:
+    """Run ``users`` simulated users for ``seconds`` and summarize."""
+    metrics = Metrics()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        # Students log in as distinct accounts; dashboard visits use the
+        # shared demo account, which is the admin
+        response = await client.post("/auth/demo")
+        response.raise_for_status()
+        admin_headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        
+        tasks = [
+            asyncio.create_task(SimulatedUser(
+                client, metrics, think_seconds, random.Random(seed + i),
+                account=f"loadtest-{seed}-{i}",
+                admin_headers=admin_headers
+            ).run())
+            for i in range(users)
+        ]
+        started = time.perf_counter()
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+    return {'users': users, 'seconds': elapsed, **metrics.summary(elapsed)}
+
+
+def find_saturation(steps: List[Dict], p95_factor: float, max_error_rate: float) -> Optional[Dict]:
+    """First step whose chat p95 exceeds ``p95_factor`` x the first step's, or errors too often."""
+    baseline = next((s['actions']['chat']['p95_ms'] for s in steps if 'chat' in s['actions']), None)
+    for step in steps:
+        chat = step['actions'].get('chat')
+        if step['error_rate'] > max_error_rate:
+            return {'users': step['users'], 'reason': f"error rate {step['error_rate']:.1%}"}
+        if baseline and chat and chat['p95_ms'] > p95_factor * baseline:
+            return {'users': step['users'], 'reason': f"chat p95 {chat['p95_ms']:.0f}ms > {p95_factor:g}x {baseline:.0f}ms"}
+    return None
+
+
+def start_server(args) -> List:
+    """Launch fake Gemini in-process and uvicorn in a subprocess; returns handles to stop."""
+    from fake_gemini import FakeGemini, serve
+    
+    fake = serve(FakeGemini(
+        latency_ms=args.llm_latency_ms,
+        latency_sigma=args.llm_latency_sigma,
+        ttft_fraction=0.3,
+        error_rate=args.llm_error_rate,
+        error_codes=[429, 500, 503],
+        response_words=150,
+        seed=args.seed
+    ), port=args.fake_gemini_port)
+    
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    env = {
+        **os.environ,
+        'GEMINI_API_ENDPOINT': f"http://127.0.0.1:{args.fake_gemini_port}",
+        'GEMINI_API_KEY': "fake",
+        'RATE_LIMIT_PER_MINUTE': str(10 ** 9),
+        'RATE_LIMIT_PER_HOUR': str(10 ** 9),
+        'AUTH_RATE_LIMIT': "1000000/minute",
+        'ADMIN_EMAILS': json.dumps(["demo@example.com"]),
+        'GOOGLE_CLIENT_ID': "",
+        'GOOGLE_CLIENT_SECRET': "",
+    }
+    if not os.environ.get("DATABASE_URI"):
+        env['DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+        env['CHROMA_PERSIST_DIR'] = os.path.join(workdir, "chroma")
+    
+    port = args.url.rsplit(":", 1)[-1].strip("/")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", port, "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=env
+    )
+    
+    # Wait until every step, including background model loading, has finished
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{args.url}/health", timeout=2).json().get("ready"):
+                return [fake, server]
+        except (httpx.HTTPError, ValueError):
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(1)
+    server.terminate()
+    fake.shutdown()
+    raise RuntimeError("API server did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL")
+    parser.add_argument("--users", default="1,5,10,25,50", help="comma-separated concurrency steps")
+    parser.add_argument("--step-seconds", type=float, default=60, help="duration of each step")
+    parser.add_argument("--think-seconds", type=float, default=3, help="mean think time between actions")
+    parser.add_argument("--p95-factor", type=float, default=2.0, help="chat p95 growth that counts as saturation")
+    parser.add_argument("--max-error-rate", type=float, default=0.05, help="error rate that counts as saturation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest.json", help="where to write the JSON results")
+    parser.add_argument("--start-server", action="store_true", help="launch fake Gemini and the API locally")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --start-server")
+    parser.add_argument("--fake-gemini-port", type=int, default=8089)
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="fake Gemini median latency")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.4, help="fake Gemini log-normal spread")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fake Gemini injected error rate")
+    args = parser.parse_args()
+    
+    handles = start_server(args) if args.start_server else []
+    try:
+        steps = []
+        for users in [int(u) for u in args.users.split(",")]:
+            print(f"Running {users} users for {args.step_seconds:g}s...")
+            steps.append(asyncio.run(run_step(args.url, users, args.step_seconds, args.think_seconds, args.seed)))
+    finally:
+        for handle in handles:
+            if isinstance(handle, subprocess.Popen):
+                handle.terminate()
+                handle.wait()
+            else:
+                handle.shutdown()
+    
+    print("=" * 78)
+    print(f"Latency vs concurrency @ {git_commit()}")
+    print("=" * 78)
+    print(f"{'users':>5} {'req/s':>7} {'turns/s':>8} {'chat p50':>9} {'chat p95':>9} {'chat p99':>9} {'ttfb p95':>9} {'errors':>7}")
+    for step in steps:
+        chat = step['actions'].get('chat', {})
+        first_byte = step['actions'].get('chat_first_byte', {})
+        print(
+            f"{step['users']:>5} {step['requests_per_second']:>7.1f} {step['chat_turns_per_second']:>8.2f} "
+            f"{chat.get('p50_ms', 0):>7.0f}ms {chat.get('p95_ms', 0):>7.0f}ms {chat.get('p99_ms', 0):>7.0f}ms "
+            f"{first_byte.get('p95_ms', 0):>7.0f}ms {step['error_rate']:>7.1%}"
+        )
+    
+    saturation = find_saturation(steps, args.p95_factor, args.max_error_rate)
+    if saturation:
+        print(f"✗ Saturation begins at {saturation['users']} users ({saturation['reason']})")
+    else:
+        print("✓ No saturation within the tested range")
+    
+    with open(args.output, "w") as f:
+        json.dump({
+            'commit': git_commit(),
+            'config': {k: v for k, v in vars(args).items() if k != "output"},
+            'steps': steps,
+            'saturation': saturation
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
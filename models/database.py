@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, Index, JSON, MetaData, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -74,25 +74,107 @@ class Bookmark(Base):
 
 
 class Analytics(Base):
-    """Analytics and logging model."""
+    """Analytics and logging model.
+    
+    Range-partitioned by month on ``created_at`` (see ``utils/partitions.py``);
+    PostgreSQL requires the partition key in the primary key.
+    """
     __tablename__ = "analytics"
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_at)'}
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     event_type = Column(String(100), nullable=False)  # 'query', 'login', 'bookmark', etc.
     event_data = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
     ip_address = Column(String(50))
     user_agent = Column(Text)
 
 
+# SQLite cannot autoincrement one column of a composite key. Its events are
+# written to the monthly tables instead (see ``utils/partitions.py``), so the
+# base table only holds rows from before partitioning and needs no id
+# sequence; ``init_db`` creates it from this definition on SQLite.
+sqlite_analytics_base = Table(
+    "analytics",
+    MetaData(),
+    Column("id", Integer, primary_key=True, autoincrement=False, index=True),
+    Column("user_id", Integer, nullable=True),
+    Column("event_type", String(100), nullable=False),
+    Column("event_data", JSON),
+    Column("created_at", DateTime, primary_key=True, index=True),
+    Column("ip_address", String(50)),
+    Column("user_agent", Text),
+)
+
+
+class AnalyticsCounter(Base):
+    """Running totals maintained alongside the tables they count."""
+    __tablename__ = "analytics_counters"
+    
+    name = Column(String(100), primary_key=True)  # 'users', 'conversations', 'messages', etc.
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AnalyticsDailyCount(Base):
+    """Per-day event counts rolled up from the analytics table."""
+    __tablename__ = "analytics_daily_counts"
+    
+    day = Column(Date, primary_key=True)
+    event_type = Column(String(100), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DailyActiveUser(Base):
+    """One row per user per day on which they logged in."""
+    __tablename__ = "daily_active_users"
+    
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+
+class QuerySketch(Base):
+    """Per-day heavy-hitters sketch of normalized query text."""
+    __tablename__ = "query_sketches"
+    
+    day = Column(Date, primary_key=True)
+    sketch = Column(JSON, nullable=False)  # SpaceSaving.to_dict()
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UserSession(Base):
+    """Server-side record of a signed login session token."""
+    __tablename__ = "user_sessions"
+    
+    id = Column(String(64), primary_key=True)  # random session id embedded in the token
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked = Column(Boolean, default=False)
+
+
+class RateLimitCounter(Base):
+    """Shared sliding-window rate limit counters."""
+    __tablename__ = "rate_limit_counters"
+    
+    key = Column(String(255), primary_key=True)  # '<user_id>:<window seconds>:<window start>'
+    count = Column(Integer, nullable=False, default=0)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
 class KnowledgeBase(Base):
     """Knowledge base for embeddings and context."""
     __tablename__ = "knowledge_base"
+    __table_args__ = (
+        # Lets every worker seed the built-in entries with ON CONFLICT DO NOTHING
+        Index('uq_knowledge_base_seed_key', 'seed_key', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(500))
     content = Column(Text, nullable=False)
+    seed_key = Column(String(200), nullable=True)  # set on built-in entries only
     source = Column(String(500))  # URL or API source
     category = Column(String(100))  # 'placement', 'internship', 'role', etc.
     kb_metadata = Column(JSON)
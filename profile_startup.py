@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Startup profiler: per-module import-time breakdown of the login path.
+
+Usage:
+    python profile_startup.py             # top 25 modules by cumulative time
+    python profile_startup.py --top 50
+    python profile_startup.py --budget 2  # exit 1 if the login path is slower
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Everything app.py imports before it can render the login page
+LOGIN_PATH_MODULES = [
+    "streamlit",
+    "config.settings",
+    "utils.bootstrap",
+    "utils.auth",
+    "utils.llm",
+    "utils.knowledge",
+    "utils.conversation",
+    "utils.rate_limit",
+    "utils.analytics",
+]
+
+# Modules that must stay out of the login path
+HEAVY_MODULES = [
+    "google.generativeai",
+    "chromadb",
+    "sentence_transformers",
+    "torch",
+    "google_auth_oauthlib",
+    "streamlit_oauth",
+]
+
+DEFAULT_BUDGET_SECONDS = 3.0
+
+
+def measure_imports(modules: List[str] = LOGIN_PATH_MODULES) -> Tuple[float, List[Dict], List[str]]:
+    """Import ``modules`` in a fresh interpreter under ``-X importtime``.
+    
+    Returns:
+        Total import seconds, per-module rows sorted by cumulative time
+        (``module``, ``self``, ``cumulative`` in seconds), and any
+        ``HEAVY_MODULES`` that were loaded
+    """
+    code = (
+        "import sys\n"
+        f"import {', '.join(modules)}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            'module': name[1:].rstrip(),
+            'self': int(self_us) / 1e6,
+            'cumulative': int(cumulative_us) / 1e6
+        })
+    
+    # Top-level imports are the ones with no leading indentation
+    total = sum(r['cumulative'] for r in rows if not r['module'].startswith(" "))
+    rows.sort(key=lambda r: r['cumulative'], reverse=True)
+    heavy = [m for m in result.stdout.strip().split(",") if m]
+    return total, rows, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=25, help="number of modules to list")
+    parser.add_argument("--budget", type=float, default=None, help="fail if the total exceeds this many seconds")
+    args = parser.parse_args()
+    
+    total, rows, heavy = measure_imports()
+    
+    print("=" * 60)
+    print("Login path import profile")
+    print("=" * 60)
+    print(f"{'cumulative':>11} {'self':>9}  module")
+    for row in rows[:args.top]:
+        print(f"{row['cumulative']:>10.3f}s {row['self']:>8.3f}s  {row['module'].strip()}")
+    print("-" * 60)
+    print(f"Total: {total:.3f}s")
+    
+    if heavy:
+        print(f"✗ Heavy modules loaded on the login path: {', '.join(heavy)}")
+    if args.budget is not None and total > args.budget:
+        print(f"✗ Over budget ({args.budget:.3f}s)")
+    if heavy or (args.budget is not None and total > args.budget):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""Shared test setup: import project modules against a scratch database."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time, so point them at scratch locations first
+_workdir = tempfile.mkdtemp(prefix="boeing-tests-")
+os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["CHROMA_PERSIST_DIR"] = os.path.join(_workdir, "chroma")
+os.environ["KNOWLEDGE_SNAPSHOT_PATH"] = ""
+os.environ["RATE_LIMIT_BACKEND"] = "memory"
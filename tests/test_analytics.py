@@ -0,0 +1,94 @@
+"""Popular-query counting: sketch merging and when queries are buffered."""
+
+import random
+from collections import Counter
+
+import pytest
+
+from config.settings import settings
+from models.database import QuerySketch
+from utils.analytics import AnalyticsManager
+from utils.database import get_db, init_db
+from utils.sketches import SpaceSaving
+
+
+def sketch_of(stream, capacity):
+    sketch = SpaceSaving(capacity)
+    for item in stream:
+        sketch.offer(item)
+    return sketch
+
+
+def test_merging_full_sketches_keeps_the_error_bound():
+    rng = random.Random(7)
+    # Zipf-like streams with different heads, each far wider than the sketch
+    items = [f"q{i}" for i in range(300)]
+    weights = [1 / (i + 1) for i in range(300)]
+    first = rng.choices(items, weights, k=5000)
+    second = rng.choices(list(reversed(items)), weights, k=5000)
+    left, right = sketch_of(first, 20), sketch_of(second, 20)
+    assert len(left) == len(right) == 20
+    
+    merged = left.merge(right)
+    
+    truth = Counter(first + second)
+    assert merged.total == len(first) + len(second)
+    for entry in merged.top(20):
+        # Counts never underestimate, and the overestimate stays within the recorded error
+        assert truth[entry['item']] <= entry['count'] <= truth[entry['item']] + entry['error']
+        assert entry['error'] <= merged.total / 20
+    # Every item above total / capacity survives the merge
+    for item, count in truth.items():
+        if count > merged.total / 20:
+            assert item in merged.counts
+
+
+def test_item_missing_from_a_full_sketch_takes_its_minimum():
+    left = sketch_of(["a"] * 5 + ["b"] * 3 + ["d"], capacity=3)
+    right = sketch_of(["a"] * 4 + ["c"] * 2 + ["e"], capacity=3)
+    
+    merged = left.merge(right)
+    
+    # b and c may each have been counted once inside the other sketch's minimum
+    assert merged.counts == {'a': (9, 0), 'b': (4, 1), 'c': (3, 1)}
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    init_db()
+    with get_db() as db:
+        db.query(QuerySketch).delete()
+        db.commit()
+    monkeypatch.setattr(settings, "POPULAR_QUERY_FLUSH_SECONDS", 3600)
+    return AnalyticsManager()
+
+
+def test_query_is_buffered_only_after_commit(manager):
+    with get_db() as db:
+        manager.record_event(db, None, 'query', {'query': "What is the CGPA cutoff?"})
+        assert manager._pending_sketches == {}
+        db.rollback()
+    with get_db() as db:
+        manager.record_event(db, None, 'query', {'query': "cgpa cutoff"})
+        db.commit()
+    
+    manager.flush_query_sketches(force=True)
+    
+    assert manager.get_popular_queries() == [{'query': "cgpa cutoff", 'count': 1}]
+
+
+def test_popular_queries_survive_a_failed_flush(manager, monkeypatch):
+    with get_db() as db:
+        manager.record_event(db, None, 'query', {'query': "internships"})
+        db.commit()
+    manager.flush_query_sketches(force=True)
+    with get_db() as db:
+        manager.record_event(db, None, 'query', {'query': "graduate roles"})
+        db.commit()
+    
+    def fail(force=False):
+        raise RuntimeError("database is locked")
+    
+    monkeypatch.setattr(manager, "flush_query_sketches", fail)
+    
+    assert manager.get_popular_queries() == [{'query': "internships", 'count': 1}]
@@ -0,0 +1,105 @@
+"""IVF-PQ index: recall, incremental adds, deletes and persistence."""
+
+import numpy as np
+import pytest
+
+from config.settings import settings
+from utils.ann import IVFPQIndex, normalize
+
+DIMENSION = 32
+
+
+@pytest.fixture(autouse=True)
+def small_codes(monkeypatch):
+    monkeypatch.setattr(settings, "ANN_PQ_SUBVECTORS", 8)
+    monkeypatch.setattr(settings, "ANN_TRAIN_MIN", 10 ** 9)
+
+
+def clustered(count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(0).normal(size=(20, DIMENSION))
+    return normalize(centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, DIMENSION)))
+
+
+def recall(index: IVFPQIndex, vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int = 10) -> float:
+    exact = ids[np.argsort(-(queries @ vectors.T), axis=1)[:, :k]]
+    hits = index.search(queries, k)
+    return float(np.mean([len(set(found) & set(expected)) / k for (found, _), expected in zip(hits, exact)]))
+
+
+def test_recall_against_exact_search(tmp_path):
+    vectors = clustered(3000, seed=1)
+    ids = np.arange(1, len(vectors) + 1)
+    index = IVFPQIndex(str(tmp_path), nprobe=8, rescore_factor=10)
+    index.add(ids.tolist(), vectors)
+    
+    stats = index.train()
+    
+    assert stats['trained'] and stats['live'] == len(vectors)
+    assert stats['resident_bytes'] < stats['full_vector_bytes'] / 5
+    assert recall(index, vectors, ids, clustered(50, seed=2)) >= 0.9
+
+
+def test_add_after_training_is_searchable_without_retraining(tmp_path):
+    index = IVFPQIndex(str(tmp_path), nprobe=8, rescore_factor=10)
+    index.add(list(range(1, 2001)), clustered(2000, seed=1))
+    index.train()
+    nlist = index.stats()['nlist']
+    
+    added = clustered(500, seed=3)
+    index.add(list(range(2001, 2501)), added)
+    
+    assert index.stats()['rows'] == 2500
+    assert index.stats()['nlist'] == nlist
+    for found, scores in index.search(added[:5], 1):
+        assert found[0] >= 2001
+        assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_delete_then_train_compacts(tmp_path):
+    vectors = clustered(1000, seed=4)
+    index = IVFPQIndex(str(tmp_path), nprobe=8)
+    index.add(list(range(1, 1001)), vectors)
+    index.train()
+    
+    index.delete([1, 2, 3])
+    
+    assert index.stats()['rows'] == 1000 and index.stats()['live'] == 997
+    assert 1 not in index.search(vectors[:1], 5)[0][0]
+    assert index.contains([1, 4]) == [4]
+    
+    index.train()
+    
+    assert index.stats()['rows'] == 997
+    assert 1 not in index.search(vectors[:1], 5)[0][0]
+
+
+def test_reopening_from_disk_gives_the_same_results(tmp_path):
+    vectors = clustered(1500, seed=5)
+    queries = clustered(10, seed=6)
+    index = IVFPQIndex(str(tmp_path), nprobe=8)
+    index.add(list(range(1, 1001)), vectors[:1000])
+    index.train()
+    index.add(list(range(1001, 1501)), vectors[1000:])
+    index.delete([7])
+    
+    reopened = IVFPQIndex(str(tmp_path), nprobe=8)
+    
+    assert reopened.stats() == index.stats()
+    for (ids, scores), (reopened_ids, reopened_scores) in zip(index.search(queries, 5), reopened.search(queries, 5)):
+        assert ids.tolist() == reopened_ids.tolist()
+        np.testing.assert_allclose(scores, reopened_scores)
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    index = IVFPQIndex(str(tmp_path))
+    index.add([1, 2], clustered(2, seed=7))
+    generation = tmp_path / "current"
+    with open(generation / "vectors.f32", "ab") as f:
+        f.write(b"\0" * DIMENSION * 4)  # a row whose id was never written
+    
+    added = clustered(1, seed=8)
+    index.add([3], added)
+    
+    assert index.search(added, 1)[0][0].tolist() == [3]
+    assert (generation / "vectors.f32").stat().st_size == 3 * DIMENSION * 4
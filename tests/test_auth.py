@@ -0,0 +1,34 @@
+"""Account creation on login."""
+
+import pytest
+
+from models.database import User
+from utils.analytics import analytics_manager
+from utils.auth import auth_manager
+from utils.database import get_db, init_db
+
+USER_INFO = {'email': "new.student@example.edu", 'name': "New Student", 'google_id': "google-new-student"}
+
+
+@pytest.fixture(autouse=True)
+def database():
+    init_db()
+    with get_db() as db:
+        db.query(User).filter(User.email == USER_INFO['email']).delete()
+        db.commit()
+
+
+def test_only_the_first_login_counts_a_new_user():
+    before = analytics_manager._get_counters()
+    
+    created = auth_manager.get_or_create_user(USER_INFO)
+    after_first = analytics_manager._get_counters()
+    again = auth_manager.get_or_create_user(USER_INFO)
+    after_second = analytics_manager._get_counters()
+    
+    assert again.id == created.id
+    assert again.last_login >= created.last_login
+    assert again.created_at == created.created_at
+    assert after_first['users'] == before['users'] + 1
+    assert after_first['first_time_users'] == before['first_time_users'] + 1
+    assert after_second == after_first
@@ -0,0 +1,100 @@
+"""Streamed chat turns and the HTTP API's query parameters."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import utils.chat as chat
+from models.database import Message, User
+from utils.chat import chat_service
+from utils.conversation import conversation_manager
+from utils.database import get_db, init_db
+from utils.knowledge import retriever
+from utils.llm import chatbot
+from utils.session_state import MessageRecord, UserRecord
+from utils.tracing import Tracer
+
+HISTORY = [MessageRecord(id=None, role="user", content="Hello")]
+
+
+@pytest.fixture
+def user():
+    init_db()
+    with get_db() as db:
+        db.query(User).filter(User.email == "stream@example.com").delete()
+        row = User(email="stream@example.com", name="Stream", google_id="stream")
+        db.add(row)
+        db.commit()
+        return UserRecord.from_model(row)
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(chat, "tracer", tracer)
+    monkeypatch.setattr(retriever, "retrieve_context", lambda query: "Internships open in March.")
+    monkeypatch.setattr(
+        chatbot,
+        "generate_response_stream",
+        lambda prompt, history, context: iter(["Applications ", "open ", "in March."])
+    )
+    return tracer
+
+
+def assistant_messages(conversation_id):
+    with get_db() as db:
+        return db.query(Message.content, Message.msg_metadata)\
+            .filter(Message.conversation_id == conversation_id, Message.role == "assistant")\
+            .all()
+
+
+def test_disconnect_saves_partial_reply_and_ends_spans(user, tracer):
+    conversation = conversation_manager.create_conversation(user)
+    stream = chat_service.stream_message(user, conversation.id, "When do internships open?", HISTORY)
+    
+    assert next(stream) == "Applications "
+    # The stream is closed early when the client disconnects
+    stream.close()
+    
+    assert assistant_messages(conversation.id) == [
+        ("Applications ", {"context_used": True, "complete": False})
+    ]
+    turn = tracer.recent[-1]
+    llm = next(span for span in turn.children if span.name == "llm.stream")
+    assert turn.duration is not None and llm.duration is not None
+    assert llm.attributes['complete'] is False
+
+
+def test_finished_stream_saves_complete_reply(user, tracer):
+    conversation = conversation_manager.create_conversation(user)
+    
+    reply = "".join(chat_service.stream_message(user, conversation.id, "When do internships open?", HISTORY))
+    
+    assert reply == "Applications open in March."
+    assert assistant_messages(conversation.id) == [(reply, {"context_used": True})]
+    assert all(span.duration is not None for span in tracer.recent[-1].children)
+
+
+@pytest.fixture
+def client(user):
+    api.app.dependency_overrides[api.current_user] = lambda: user
+    api.app.dependency_overrides[api.admin_user] = lambda: user
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path", [
+    "/search?q=march&limit=0",
+    "/search?q=march&limit=51",
+    "/search?q=march&offset=-1",
+    "/conversations?limit=0",
+    "/conversations?limit=51",
+    "/analytics?days=0",
+    "/analytics?days=366",
+])
+def test_out_of_range_query_parameters_are_rejected(client, path):
+    assert client.get(path).status_code == 422
+
+
+def test_in_range_query_parameters_are_accepted(client):
+    assert client.get("/conversations?limit=50").status_code == 200
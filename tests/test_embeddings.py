@@ -0,0 +1,56 @@
+"""Embedding backends that run outside the calling thread."""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs as its own program: spawned pool workers re-import it as __mp_main__,
+# which is how the fake model reaches them
+POOL_SCRIPT = textwrap.dedent("""
+    import numpy as np
+    
+    import utils.embeddings as embeddings
+    
+    
+    class FakeModel:
+        def encode(self, texts):
+            return np.array([[len(t), i] for i, t in enumerate(texts)], dtype=np.float32)
+    
+    
+    embeddings.load_runtime = lambda runtime, model_name, threads=None: FakeModel()
+    
+    if __name__ == "__main__":
+        backend = embeddings.PoolBackend("fake", "fake", workers=2, threads_per_worker=1)
+        for texts in (["a", "bb", "ccc"], ["dddd"]):
+            print(backend.submit(texts).result().tolist())
+        backend._pool.shutdown()
+""")
+
+
+def shared_segments():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+def test_pool_backend_returns_vectors_without_leaking_shared_memory(tmp_path):
+    script = tmp_path / "pool_encode.py"
+    script.write_text(POOL_SCRIPT)
+    before = shared_segments()
+    
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ["[[1.0, 0.0], [2.0, 1.0], [3.0, 2.0]]", "[[4.0, 0.0]]"]
+    # The resource tracker reports segments it had to clean up itself
+    assert "leaked shared_memory" not in result.stderr
+    assert "FileNotFoundError" not in result.stderr
+    assert shared_segments() <= before
@@ -0,0 +1,155 @@
+"""Live fetching against a local HTTP server: caching, revalidation and ingest."""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from config.settings import settings
+from models.database import KnowledgeBase
+from utils.database import get_db, init_db
+from utils.fetcher import LiveFetcher
+from utils.knowledge import retriever
+
+LAST_MODIFIED = "Mon, 05 Oct 2026 09:00:00 GMT"
+
+
+def page(title: str, body: str) -> bytes:
+    return (
+        f"<html><head><title>{title}</title><script>track()</script></head>"
+        f"<body><nav>Home | Careers</nav><main><h1>{title}</h1><p>{body}</p></main></body></html>"
+    ).encode()
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves ``server.pages`` with an ETag and honours ``If-None-Match``."""
+    
+    def do_GET(self):
+        if self.path == "/robots.txt":
+            return self._send(200, b"User-agent: *\nDisallow: /private\n", content_type="text/plain")
+        
+        self.server.requests.append((self.path, dict(self.headers)))
+        body = self.server.pages.get(self.path)
+        if body is None:
+            return self._send(404, b"")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", etag=etag)
+        self._send(200, body, etag=etag)
+    
+    def _send(self, status: int, body: bytes, etag: str = None, content_type: str = "text/html; charset=utf-8"):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    httpd.pages = {
+        "/internships": page("Internships", "Summer internships open in March."),
+        "/graduates": page("Graduate roles", "Apply to the engineering graduate programme."),
+        "/private": page("Private", "Not for crawlers."),
+    }
+    httpd.requests = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_PER_HOST_DELAY", 0.0)
+    with httpx.Client() as client:
+        yield LiveFetcher(cache_dir=str(tmp_path / "cache"), client=client)
+
+
+def page_requests(server, path: str):
+    return [headers for requested, headers in server.requests if requested == path]
+
+
+def test_fresh_entry_is_served_from_cache(server, fetcher, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_MIN_REFRESH_SECONDS", 3600)
+    
+    first = fetcher.fetch(f"{server.url}/internships")
+    second = fetcher.fetch(f"{server.url}/internships")
+    
+    assert (first.status, first.from_cache) == (200, False)
+    assert first.title == "Internships"
+    assert "Summer internships open in March." in first.text
+    assert "track()" not in first.text and "Home | Careers" not in first.text
+    assert second.from_cache and second.text == first.text
+    assert len(page_requests(server, "/internships")) == 1
+
+
+def test_stale_entry_is_revalidated(server, fetcher, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_MIN_REFRESH_SECONDS", 0)
+    url = f"{server.url}/internships"
+    first = fetcher.fetch(url)
+    
+    unchanged = fetcher.fetch(url)
+    
+    conditional = page_requests(server, "/internships")[-1]
+    assert conditional["If-Modified-Since"] == LAST_MODIFIED
+    assert conditional["If-None-Match"]
+    assert (unchanged.status, unchanged.from_cache) == (304, True)
+    assert unchanged.content_hash == first.content_hash
+    
+    server.pages["/internships"] = page("Internships", "Winter internships open in September.")
+    changed = fetcher.fetch(url)
+    
+    assert (changed.status, changed.from_cache) == (200, False)
+    assert changed.content_hash != first.content_hash
+    assert "Winter internships" in changed.text
+
+
+def test_robots_txt_is_respected(server, fetcher):
+    result = fetcher.fetch(f"{server.url}/private")
+    
+    assert result.error == "Disallowed by robots.txt"
+    assert not page_requests(server, "/private")
+
+
+def test_ingest_adds_new_and_changed_pages_only(server, fetcher, monkeypatch):
+    init_db()
+    monkeypatch.setattr(settings, "FETCH_MIN_REFRESH_SECONDS", 0)
+    # Keep the rows in the database; embedding is not under test
+    monkeypatch.setattr(retriever, "_collection", None)
+    monkeypatch.setattr(retriever, "_collection_loaded", True)
+    batches = []
+    add_knowledge_batch = retriever.add_knowledge_batch
+    
+    def record_batch(items):
+        batches.append(items)
+        add_knowledge_batch(items)
+    
+    monkeypatch.setattr(retriever, "add_knowledge_batch", record_batch)
+    urls = [f"{server.url}/internships", f"{server.url}/graduates", f"{server.url}/missing"]
+    
+    assert fetcher.ingest(urls, "live") == {'added': 2, 'unchanged': 0, 'failed': 1}
+    assert fetcher.ingest(urls, "live") == {'added': 0, 'unchanged': 2, 'failed': 1}
+    
+    server.pages["/graduates"] = page("Graduate roles", "Applications for 2027 are closed.")
+    assert fetcher.ingest(urls, "live") == {'added': 1, 'unchanged': 1, 'failed': 1}
+    
+    assert [[item["source"] for item in batch] for batch in batches] == [[urls[0]], [urls[1]], [urls[1]]]
+    assert batches[0][0]["title"] == "Internships"
+    assert batches[0][0]["category"] == "live"
+    with get_db() as db:
+        rows = db.query(KnowledgeBase.content).filter(KnowledgeBase.source == urls[1]).all()
+    assert len(rows) == 1 and "Applications for 2027 are closed." in rows[0].content
@@ -0,0 +1,55 @@
+"""Analytics storage on a fresh SQLite database."""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Settings and the engine are fixed at import, so a fresh database needs a fresh process
+FRESH_DATABASE_SCRIPT = textwrap.dedent("""
+    import json
+    from datetime import datetime
+    
+    from sqlalchemy import inspect, text
+    
+    from utils.analytics import analytics_manager
+    from utils.database import engine, get_db, init_db
+    from utils.partitions import analytics_partitions
+    
+    init_db()
+    with get_db() as db:
+        analytics_manager.record_event(db, None, 'query', {'query': "internships"})
+        analytics_manager.record_event(db, None, 'login')
+        db.commit()
+    
+    month = analytics_partitions.name(datetime.utcnow())
+    with engine.connect() as conn:
+        print(json.dumps({
+            'base_pk': inspect(engine).get_pk_constraint('analytics')['constrained_columns'],
+            'base_rows': conn.execute(text("SELECT COUNT(*) FROM analytics")).scalar(),
+            'month_rows': conn.execute(text(f"SELECT id, event_type FROM {month} ORDER BY id")).all(),
+        }, default=list))
+""")
+
+
+def test_init_db_and_record_event_on_a_fresh_sqlite_file(tmp_path):
+    script = tmp_path / "fresh_database.py"
+    script.write_text(FRESH_DATABASE_SCRIPT)
+    
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT, "DATABASE_URI": f"sqlite:///{tmp_path / 'fresh.db'}"},
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    
+    assert result.returncode == 0, result.stderr
+    state = json.loads(result.stdout)
+    assert state['base_pk'] == ['id', 'created_at']
+    assert state['base_rows'] == 0
+    assert state['month_rows'] == [[1, 'query'], [2, 'login']]
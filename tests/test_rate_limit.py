@@ -0,0 +1,165 @@
+"""Sliding-window rate limiting against the memory, SQLite and Redis stores."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import utils.rate_limit as rate_limit
+from config.settings import settings
+from models.database import RateLimitCounter
+from utils.database import get_db, init_db
+from utils.rate_limit import DatabaseRateLimitStore, MemoryRateLimitStore, RateLimiter, RedisRateLimitStore
+
+# The start of a minute and of an hour
+WINDOW_START = 3600 * 500_000
+USER_ID = 7
+
+
+class StandInRedis:
+    """The part of redis-py the store uses, recording each pipeline it runs."""
+    
+    def __init__(self):
+        self.values: dict = {}
+        self.ttls: dict = {}
+        self.pipelines: list = []
+    
+    def pipeline(self):
+        return StandInPipeline(self)
+    
+    def incrby(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+    
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+        return True
+    
+    def mget(self, keys):
+        return [str(self.values[key]).encode() if key in self.values else None for key in keys]
+
+
+class StandInPipeline:
+    def __init__(self, client: StandInRedis):
+        self.client = client
+        self.commands = []
+    
+    def incrby(self, key, amount):
+        self.commands.append(("incrby", key, amount))
+        return self
+    
+    def expire(self, key, ttl):
+        self.commands.append(("expire", key, ttl))
+        return self
+    
+    def execute(self):
+        self.client.pipelines.append(self.commands)
+        return [getattr(self.client, name)(*args) for name, *args in self.commands]
+
+
+@pytest.fixture(params=["memory", "database", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryRateLimitStore()
+    if request.param == "redis":
+        return RedisRateLimitStore(StandInRedis())
+    init_db()
+    with get_db() as db:
+        db.query(RateLimitCounter).delete()
+        db.commit()
+    return DatabaseRateLimitStore()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall-clock time seen by the limiter, starting at ``WINDOW_START``."""
+    now = SimpleNamespace(value=float(WINDOW_START))
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: now.value, monotonic=time.monotonic))
+    return now
+
+
+def limiter(store, monkeypatch, per_minute: int, per_hour: int) -> RateLimiter:
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_MINUTE", per_minute)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_HOUR", per_hour)
+    return RateLimiter(store)
+
+
+def allowed(limiter: RateLimiter, attempts: int) -> int:
+    return sum(limiter.check_rate_limit(USER_ID) for _ in range(attempts))
+
+
+def stored_count(store, window: int, now: float) -> int:
+    current_key, _, _ = RateLimiter._window_keys(USER_ID, window, now)
+    return store.get_many([current_key])[0]
+
+
+@pytest.mark.parametrize("elapsed, expected", [(15, 2), (45, 7)])
+def test_previous_window_is_weighted_by_overlap(store, clock, monkeypatch, elapsed, expected):
+    limits = limiter(store, monkeypatch, per_minute=10, per_hour=1000)
+    clock.value = WINDOW_START - 30
+    assert allowed(limits, 10) == 10
+    
+    # 10 requests last minute still count 10 * (1 - elapsed / 60)
+    clock.value = WINDOW_START + elapsed
+    assert allowed(limits, 20) == expected
+    assert limits.get_remaining_queries(USER_ID)['per_minute'] == 10 - int(10 * (1 - elapsed / 60) + expected)
+
+
+def test_previous_window_expires_after_one_window(store, clock, monkeypatch):
+    limits = limiter(store, monkeypatch, per_minute=10, per_hour=1000)
+    clock.value = WINDOW_START - 30
+    assert allowed(limits, 10) == 10
+    
+    clock.value = WINDOW_START + 60
+    assert allowed(limits, 20) == 10
+
+
+def test_denied_request_is_not_counted(store, clock, monkeypatch):
+    limits = limiter(store, monkeypatch, per_minute=3, per_hour=1000)
+    
+    assert allowed(limits, 3) == 3
+    assert allowed(limits, 5) == 0
+    
+    assert stored_count(store, 60, clock.value) == 3
+    assert stored_count(store, 3600, clock.value) == 3
+    assert limits.get_remaining_queries(USER_ID) == {'per_minute': 0, 'per_hour': 997}
+
+
+def test_hour_denial_rolls_back_the_minute_count(store, clock, monkeypatch):
+    limits = limiter(store, monkeypatch, per_minute=100, per_hour=2)
+    
+    assert allowed(limits, 2) == 2
+    assert allowed(limits, 3) == 0
+    
+    assert stored_count(store, 60, clock.value) == 2
+    assert stored_count(store, 3600, clock.value) == 2
+
+
+def test_redis_store_increments_and_expires_in_one_pipeline(clock, monkeypatch):
+    client = StandInRedis()
+    limits = limiter(RedisRateLimitStore(client), monkeypatch, per_minute=100, per_hour=1)
+    minute, _, _ = RateLimiter._window_keys(USER_ID, 60, clock.value)
+    hour, _, _ = RateLimiter._window_keys(USER_ID, 3600, clock.value)
+    
+    assert allowed(limits, 2) == 1
+    
+    counted = [
+        [("incrby", minute, 1), ("expire", minute, 120)],
+        [("incrby", hour, 1), ("expire", hour, 7200)],
+    ]
+    rolled_back = [
+        [("incrby", minute, -1), ("expire", minute, 120)],
+        [("incrby", hour, -1), ("expire", hour, 7200)],
+    ]
+    assert client.pipelines == counted + counted + rolled_back
+    assert client.mget([minute, hour]) == [b"1", b"1"]
+    assert limits.get_remaining_queries(USER_ID) == {'per_minute': 99, 'per_hour': 0}
+
+
+def test_store_interface_is_abstract():
+    class IncrOnly(rate_limit.RateLimitStore):
+        def incr(self, key, amount, ttl):
+            return amount
+    
+    with pytest.raises(TypeError):
+        IncrOnly()
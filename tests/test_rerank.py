@@ -0,0 +1,70 @@
+"""Cross-encoder reranking: score scale and the minimum-score filter."""
+
+import numpy as np
+import pytest
+
+from config.settings import settings
+from utils.rerank import Reranker
+
+
+class LogitModel:
+    """Returns fixed logits, passed through ``activation_fct`` like ``CrossEncoder.predict``."""
+    
+    def __init__(self, logits):
+        self.logits = logits
+    
+    def predict(self, pairs, batch_size=32, activation_fct=None):
+        logits = np.array([self.logits[chunk] for _, chunk in pairs], dtype=np.float32)
+        return activation_fct(logits) if activation_fct is not None else logits
+
+
+@pytest.fixture
+def reranker(monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_BUDGET_MS", 5000)
+    reranker = Reranker()
+    reranker._model = LogitModel({"relevant": 4.0, "borderline": -0.5, "unrelated": -9.0})
+    reranker._activation = lambda logits: 1 / (1 + np.exp(-logits))
+    return reranker
+
+
+def candidates(*documents):
+    return [{'id': i, 'document': document} for i, document in enumerate(documents)]
+
+
+def test_scores_are_probabilities(reranker):
+    pairs = {("q", str(i)): chunk for i, chunk in enumerate(["relevant", "borderline", "unrelated"])}
+    
+    scores = reranker._score("internships", pairs).result()
+    
+    assert all(0.0 <= score <= 1.0 for score in scores.values())
+    assert scores[("q", "1")] == pytest.approx(0.3775, abs=1e-3)
+
+
+def test_min_score_drops_only_improbable_chunks(reranker, monkeypatch):
+    monkeypatch.setattr(settings, "RERANK_MIN_SCORE", 0.1)
+    
+    kept = reranker.rerank("internships", candidates("unrelated", "borderline", "relevant"), top_k=3)
+    
+    # A slightly negative logit is still a plausible match and survives
+    assert [c['document'] for c in kept] == ["relevant", "borderline"]
+
+
+def test_real_cross_encoder_scores_are_probabilities():
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    reranker = Reranker()
+    try:
+        model = reranker.model
+    except OSError as e:
+        pytest.skip(f"{settings.RERANK_MODEL} is not available: {e}")
+    
+    scores = model.predict(
+        [
+            ("When do Boeing India internships open?", "Boeing India summer internship applications open in March."),
+            ("When do Boeing India internships open?", "Bananas are rich in potassium."),
+        ],
+        activation_fct=reranker._activation
+    )
+    
+    assert all(0.0 <= score <= 1.0 for score in scores)
+    assert scores[0] > 0.5 > scores[1]
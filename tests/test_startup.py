@@ -0,0 +1,82 @@
+"""Startup steps that every worker process runs against one database."""
+
+import multiprocessing
+
+import pytest
+
+from models.database import AnalyticsCounter, KnowledgeBase
+from utils.analytics import analytics_manager
+from utils.database import get_db, init_db
+from utils.knowledge import retriever
+
+
+class IndexedCollection:
+    """A vector store that already holds every row, so seeding skips embedding."""
+    
+    def count(self):
+        return 10 ** 9
+
+
+def seed_knowledge(_):
+    retriever._collection, retriever._collection_loaded = IndexedCollection(), True
+    retriever.initialize_knowledge_base()
+
+
+def ensure_rollups(_):
+    analytics_manager.ensure_rollups()
+
+
+def run_in_workers(func, workers: int = 4):
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        pool.map(func, range(workers))
+
+
+@pytest.fixture(autouse=True)
+def database():
+    init_db()
+    with get_db() as db:
+        db.query(KnowledgeBase).delete()
+        db.query(AnalyticsCounter).delete()
+        db.commit()
+
+
+def seed_rows():
+    with get_db() as db:
+        return db.query(KnowledgeBase.title, KnowledgeBase.seed_key)\
+            .filter(KnowledgeBase.seed_key.isnot(None))\
+            .all()
+
+
+def test_concurrent_workers_seed_each_entry_once():
+    run_in_workers(seed_knowledge)
+    
+    rows = seed_rows()
+    assert len(rows) == 10
+    assert all(title == seed_key for title, seed_key in rows)
+
+
+def test_seeding_adopts_rows_from_before_seed_keys():
+    with get_db() as db:
+        db.add_all([
+            KnowledgeBase(title="Boeing India Overview", content="old copy", source="boeing.co.in", category="company_overview"),
+            KnowledgeBase(title="Boeing India Overview", content="duplicate", source="boeing.co.in", category="company_overview"),
+        ])
+        db.commit()
+    
+    seed_knowledge(None)
+    
+    with get_db() as db:
+        overview = db.query(KnowledgeBase.content, KnowledgeBase.seed_key)\
+            .filter(KnowledgeBase.title == "Boeing India Overview")\
+            .order_by(KnowledgeBase.id)\
+            .all()
+    assert overview == [("old copy", "Boeing India Overview"), ("duplicate", None)]
+    assert len(seed_rows()) == 10
+
+
+def test_concurrent_workers_backfill_rollups_once():
+    run_in_workers(ensure_rollups)
+    
+    with get_db() as db:
+        names = [name for (name,) in db.query(AnalyticsCounter.name).all()]
+    assert sorted(names) == ['conversations', 'first_time_users', 'messages', 'users']
@@ -0,0 +1,22 @@
+"""Span timing."""
+
+import time
+from types import SimpleNamespace
+
+import utils.tracing as tracing
+from utils.tracing import Tracer
+
+
+def test_elapsed_ms_marks_a_point_within_a_span(monkeypatch):
+    clock = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(tracing, "time", SimpleNamespace(perf_counter=lambda: clock.value, time_ns=time.time_ns))
+    tracer = Tracer()
+    span = tracer.start_span("llm.stream", root=True)
+    
+    clock.value += 0.25
+    span.attributes['first_chunk_ms'] = span.elapsed_ms()
+    clock.value += 0.75
+    tracer.end_span(span)
+    
+    assert span.attributes['first_chunk_ms'] == 250.0
+    assert span.duration == 1.0
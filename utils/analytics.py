@@ -1,39 +1,184 @@
 """Analytics utilities for admin dashboard."""
 
-from typing import List, Dict
-from datetime import datetime, timedelta
-from sqlalchemy import func
+import threading
+import time
+from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
 
-from models.database import Analytics, User, Message, Conversation
-from utils.database import get_db
+from config.settings import settings
+from models.database import (
+    AnalyticsCounter, AnalyticsDailyCount, DailyActiveUser, QuerySketch,
+    User, Message, Conversation
+)
+from utils.database import get_db, startup_lock, upsert
+from utils.partitions import analytics_partitions
+from utils.sketches import SpaceSaving, normalize_query
+
+
+def _as_date(value) -> date:
+    """Normalize ``func.date`` results, which SQLite returns as strings."""
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
 
 
 class AnalyticsManager:
-    """Manage analytics and reporting."""
+    """Manage analytics and reporting.
+    
+    Dashboard totals are served from rollup tables that writers keep up to
+    date incrementally (``bump_counter`` and ``record_event``), so reads cost
+    a handful of primary-key lookups regardless of how large ``messages`` and
+    ``analytics`` grow. ``rebuild_rollups`` recomputes them from the base
+    tables for backfills or after manual data fixes.
+    
+    Popular queries are counted online in a per-day Space-Saving sketch held
+    in memory and merged into ``query_sketches`` by ``flush_query_sketches``.
+    
+    Raw events live in monthly partitions (``analytics_partitions``), so
+    time-window reads only touch the months they cover and retention drops
+    whole months instead of deleting row by row.
+    """
+    
+    COUNTERS = ('users', 'first_time_users', 'conversations', 'messages')
+    
+    def __init__(self):
+        """Initialize the in-process query sketch buffer."""
+        self._pending_sketches: Dict[date, SpaceSaving] = {}
+        self._pending_lock = threading.Lock()
+        self._last_sketch_flush = time.monotonic()
+    
+    def bump_counter(self, db: Session, name: str, amount: int = 1):
+        """Atomically add ``amount`` to a running total within ``db``'s transaction."""
+        upsert(
+            db,
+            AnalyticsCounter,
+            {'name': name, 'value': amount, 'updated_at': datetime.utcnow()},
+            index_elements=['name'],
+            update={'value': AnalyticsCounter.value + amount, 'updated_at': datetime.utcnow()}
+        )
+    
+    def record_event(
+        self,
+        db: Session,
+        user_id: Optional[int],
+        event_type: str,
+        event_data: Optional[Dict] = None
+    ):
+        """Write an analytics event and update its daily rollups."""
+        now = datetime.utcnow()
+        analytics_partitions.insert(db, {
+            'user_id': user_id,
+            'event_type': event_type,
+            'event_data': event_data or {},
+            'created_at': now
+        })
+        
+        upsert(
+            db,
+            AnalyticsDailyCount,
+            {'day': now.date(), 'event_type': event_type, 'count': 1},
+            index_elements=['day', 'event_type'],
+            update={'count': AnalyticsDailyCount.count + 1}
+        )
+        
+        if event_type == 'login' and user_id is not None:
+            upsert(
+                db,
+                DailyActiveUser,
+                {'day': now.date(), 'user_id': user_id},
+                index_elements=['day', 'user_id']
+            )
+        
+        if event_type == 'query' and event_data and event_data.get('query'):
+            # Count the query only once the event itself is committed
+            if 'pending_queries' not in db.info:
+                db.info['pending_queries'] = []
+                event.listen(db, "after_commit", self._offer_committed_queries)
+                event.listen(db, "after_rollback", lambda session: session.info['pending_queries'].clear())
+            db.info['pending_queries'].append((now.date(), normalize_query(event_data['query'])))
+    
+    def _offer_committed_queries(self, db: Session):
+        """Move a session's committed queries into the in-process buffer."""
+        queries, db.info['pending_queries'] = db.info['pending_queries'], []
+        with self._pending_lock:
+            for day, query in queries:
+                sketch = self._pending_sketches.get(day)
+                if sketch is None:
+                    sketch = self._pending_sketches[day] = SpaceSaving(settings.POPULAR_QUERY_SKETCH_SIZE)
+                sketch.offer(query)
+    
+    def flush_query_sketches(self, force: bool = False):
+        """Merge buffered query counts into the stored per-day sketches.
+        
+        Cheap no-op until ``POPULAR_QUERY_FLUSH_SECONDS`` have passed since
+        the last flush, so writers can call it after every event. Must be
+        called outside any open write transaction.
+        """
+        with self._pending_lock:
+            due = time.monotonic() - self._last_sketch_flush >= settings.POPULAR_QUERY_FLUSH_SECONDS
+            if not self._pending_sketches or not (force or due):
+                return
+            pending, self._pending_sketches = self._pending_sketches, {}
+            self._last_sketch_flush = time.monotonic()
+        
+        try:
+            with get_db() as db:
+                for day, delta in pending.items():
+                    # Create the day's row first: locking a row that does not
+                    # exist yet locks nothing, and racing inserts would conflict
+                    upsert(
+                        db,
+                        QuerySketch,
+                        {'day': day, 'sketch': SpaceSaving(settings.POPULAR_QUERY_SKETCH_SIZE).to_dict()},
+                        index_elements=['day']
+                    )
+                    row = db.query(QuerySketch)\
+                        .filter(QuerySketch.day == day)\
+                        .with_for_update()\
+                        .one()
+                    merged = SpaceSaving.from_dict(row.sketch, settings.POPULAR_QUERY_SKETCH_SIZE).merge(delta)
+                    row.sketch = merged.to_dict()
+                db.commit()
+        except Exception:
+            # Keep the counts for the next attempt rather than dropping them
+            with self._pending_lock:
+                for day, delta in pending.items():
+                    if day in self._pending_sketches:
+                        delta.merge(self._pending_sketches[day])
+                    self._pending_sketches[day] = delta
+            raise
+    
+    def _get_counters(self) -> Dict[str, int]:
+        """Read all running totals in one query."""
+        with get_db() as db:
+            rows = db.query(AnalyticsCounter.name, AnalyticsCounter.value).all()
+            counters = {name: 0 for name in self.COUNTERS}
+            counters.update({name: value for name, value in rows})
+            return counters
     
     def get_total_users(self) -> int:
         """Get total number of users."""
-        with get_db() as db:
-            return db.query(User).count()
+        return self._get_counters()['users']
     
     def get_total_conversations(self) -> int:
         """Get total number of conversations."""
-        with get_db() as db:
-            return db.query(Conversation).count()
+        return self._get_counters()['conversations']
     
     def get_total_messages(self) -> int:
         """Get total number of messages."""
-        with get_db() as db:
-            return db.query(Message).count()
+        return self._get_counters()['messages']
     
     def get_recent_activity(self, days: int = 7) -> List[Dict]:
         """Get recent user activity."""
         with get_db() as db:
             since = datetime.utcnow() - timedelta(days=days)
+            events = analytics_partitions.source(since=since)
             
-            analytics = db.query(Analytics)\
-                .filter(Analytics.created_at >= since)\
-                .order_by(Analytics.created_at.desc())\
+            analytics = db.query(events)\
+                .filter(events.c.created_at >= since)\
+                .order_by(events.c.created_at.desc())\
                 .limit(100)\
                 .all()
             
@@ -47,62 +192,160 @@ class AnalyticsManager:
                 for a in analytics
             ]
     
-    def get_popular_queries(self, limit: int = 10) -> List[Dict]:
-        """Get most common query patterns."""
+    def get_popular_queries(self, limit: int = 10, days: int = 7) -> List[Dict]:
+        """Get the most frequent normalized queries over the last ``days`` days.
+        
+        Merges one small sketch per day, so the cost depends on the window
+        and sketch size rather than on the number of logged queries. Queries
+        still buffered in memory are counted once flushed, which happens at
+        most every ``POPULAR_QUERY_FLUSH_SECONDS``.
+        """
+        try:
+            self.flush_query_sketches()
+        except Exception:
+            # Serve the stored sketches; the buffered counts are kept for the next flush
+            pass
+        
         with get_db() as db:
-            analytics = db.query(Analytics)\
-                .filter(Analytics.event_type == 'query')\
-                .order_by(Analytics.created_at.desc())\
-                .limit(100)\
-                .all()
+            since = (datetime.utcnow() - timedelta(days=days)).date()
+            rows = db.query(QuerySketch).filter(QuerySketch.day >= since).all()
             
-            # Extract queries
-            queries = []
-            for a in analytics:
-                if a.event_data and 'query' in a.event_data:
-                    queries.append({
-                        'query': a.event_data['query'],
-                        'timestamp': a.created_at
-                    })
+            window = SpaceSaving(settings.POPULAR_QUERY_SKETCH_SIZE)
+            for row in rows:
+                window.merge(SpaceSaving.from_dict(row.sketch))
             
-            return queries[:limit]
+            return [
+                {'query': entry['item'], 'count': entry['count']}
+                for entry in window.top(limit)
+            ]
     
     def get_user_stats(self) -> Dict:
         """Get user statistics."""
+        counters = self._get_counters()
+        total_users = counters['users']
+        first_time_users = counters['first_time_users']
+        
         with get_db() as db:
-            total_users = db.query(User).count()
-            first_time_users = db.query(User).filter(User.is_first_time == True).count()
-            
             # Active users (logged in last 7 days)
-            week_ago = datetime.utcnow() - timedelta(days=7)
-            active_users = db.query(User).filter(User.last_login >= week_ago).count()
+            week_ago = (datetime.utcnow() - timedelta(days=7)).date()
+            active_users = db.query(func.count(func.distinct(DailyActiveUser.user_id)))\
+                .filter(DailyActiveUser.day >= week_ago)\
+                .scalar() or 0
             
-            return {
-                'total': total_users,
-                'first_time': first_time_users,
-                'returning': total_users - first_time_users,
-                'active_last_7_days': active_users
-            }
+        return {
+            'total': total_users,
+            'first_time': first_time_users,
+            'returning': total_users - first_time_users,
+            'active_last_7_days': active_users
+        }
     
     def get_daily_queries(self, days: int = 7) -> List[Dict]:
         """Get daily query counts."""
         with get_db() as db:
-            since = datetime.utcnow() - timedelta(days=days)
+            since = (datetime.utcnow() - timedelta(days=days)).date()
             
-            results = db.query(
-                func.date(Analytics.created_at).label('date'),
-                func.count(Analytics.id).label('count')
-            ).filter(
-                Analytics.event_type == 'query',
-                Analytics.created_at >= since
-            ).group_by(
-                func.date(Analytics.created_at)
-            ).all()
+            results = db.query(AnalyticsDailyCount)\
+                .filter(
+                    AnalyticsDailyCount.event_type == 'query',
+                    AnalyticsDailyCount.day >= since
+                )\
+                .order_by(AnalyticsDailyCount.day.asc())\
+                .all()
             
             return [
-                {'date': str(r.date), 'count': r.count}
+                {'date': str(r.day), 'count': r.count}
                 for r in results
             ]
+    
+    def ensure_rollups(self):
+        """Backfill rollup tables if they have never been populated.
+        
+        Every worker process calls this at startup; the lock makes the rest
+        wait for the first backfill and then find the tables populated.
+        """
+        with startup_lock("analytics_rollups"):
+            with get_db() as db:
+                populated = db.query(AnalyticsCounter.name).first() is not None
+            if not populated:
+                self._rebuild_rollups()
+    
+    def rebuild_rollups(self):
+        """Recompute every rollup table from the base tables.
+        
+        This is the periodic compactor: it is a full scan, so run it at
+        startup on an empty rollup set or from a maintenance job, never per
+        request. Events purged by the retention policy are gone, so a
+        rebuild also drops the daily counts for days before the cutoff.
+        """
+        with startup_lock("analytics_rollups"):
+            self._rebuild_rollups()
+    
+    def _rebuild_rollups(self):
+        with get_db() as db:
+            counters = {
+                'users': db.query(func.count(User.id)).scalar() or 0,
+                'first_time_users': db.query(func.count(User.id))
+                    .filter(User.is_first_time == True).scalar() or 0,
+                'conversations': db.query(func.count(Conversation.id)).scalar() or 0,
+                'messages': db.query(func.count(Message.id)).scalar() or 0,
+            }
+            
+            events = analytics_partitions.source()
+            daily_counts = db.query(
+                func.date(events.c.created_at).label('day'),
+                events.c.event_type,
+                func.count(events.c.id).label('count')
+            ).group_by(
+                func.date(events.c.created_at),
+                events.c.event_type
+            ).all()
+            
+            active_users = db.query(
+                func.date(events.c.created_at).label('day'),
+                events.c.user_id
+            ).filter(
+                events.c.event_type == 'login',
+                events.c.user_id.isnot(None)
+            ).distinct().all()
+            
+            query_sketches: Dict[date, SpaceSaving] = {}
+            query_events = db.query(events.c.created_at, events.c.event_data)\
+                .filter(events.c.event_type == 'query')\
+                .yield_per(1000)
+            for created_at, event_data in query_events:
+                if not event_data or not event_data.get('query'):
+                    continue
+                sketch = query_sketches.get(created_at.date())
+                if sketch is None:
+                    sketch = query_sketches[created_at.date()] = SpaceSaving(settings.POPULAR_QUERY_SKETCH_SIZE)
+                sketch.offer(normalize_query(event_data['query']))
+            
+            with self._pending_lock:
+                self._pending_sketches = {}
+            
+            db.query(AnalyticsCounter).delete()
+            db.query(AnalyticsDailyCount).delete()
+            db.query(DailyActiveUser).delete()
+            db.query(QuerySketch).delete()
+            
+            now = datetime.utcnow()
+            db.add_all([
+                AnalyticsCounter(name=name, value=value, updated_at=now)
+                for name, value in counters.items()
+            ])
+            db.add_all([
+                AnalyticsDailyCount(day=_as_date(r.day), event_type=r.event_type, count=r.count)
+                for r in daily_counts
+            ])
+            db.add_all([
+                DailyActiveUser(day=_as_date(r.day), user_id=r.user_id)
+                for r in active_users
+            ])
+            db.add_all([
+                QuerySketch(day=day, sketch=sketch.to_dict(), updated_at=now)
+                for day, sketch in query_sketches.items()
+            ])
+            db.commit()
 
 
 analytics_manager = AnalyticsManager()
@@ -0,0 +1,495 @@
+"""Approximate nearest-neighbour index for large knowledge corpora.
+
+``IVFPQIndex`` is an inverted-file index with product-quantized codes:
+
+- k-means splits the normalized vectors into ``nlist`` coarse lists
+- each vector's residual from its list centroid is cut into
+  ``ANN_PQ_SUBVECTORS`` pieces, and each piece is stored as the one-byte
+  number of its nearest entry in that piece's 256-entry codebook
+
+A query ranks the lists by centroid similarity, scans the best
+``ANN_NPROBE`` of them using per-query lookup tables (one table sum per
+vector instead of a 384-wide dot product), and rescores the top
+``ANN_RESCORE_FACTOR * n_results`` candidates exactly. The full vectors
+stay on disk and are memory-mapped, so only shortlisted rows are read;
+resident memory is ``ANN_PQ_SUBVECTORS + 4`` bytes per vector instead of
+1,536.
+
+Every file is append-only. Vectors added after training are assigned and
+encoded with the existing centroids, so no retrain is needed; retrain
+with ``python -m utils.ann train`` if the corpus drifts, which also
+compacts deleted rows. Until the index holds ``ANN_TRAIN_MIN`` vectors it
+is searched exactly. On disk::
+
+    ANN_INDEX_DIR/
+        current -> index-000002
+        index-000002/
+            meta.json        dimension, list and code sizes
+            centroids.npy    (nlist, dimension) float32
+            codebooks.npy    (subvectors, 256, dimension / subvectors) float32
+            vectors.f32      one normalized float32 row per vector
+            lists.i32        coarse list of each row
+            codes.u8         product-quantized code of each row
+            ids.i64          knowledge base id of each row; -1 once deleted
+"""
+
+import copy
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+
+FORMAT_VERSION = 1
+CODEBOOK_SIZE = 256  # entries per codebook, so each code piece fits in a byte
+_TRAIN_POINTS_PER_LIST = 50  # k-means sample size per coarse list
+_CHUNK = 16384  # rows per batch when assigning and re-encoding
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def nearest_centroid(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest (L2) centroid for each row of ``x``."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    nearest = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), _CHUNK):
+        nearest[start:start + _CHUNK] = np.argmax(x[start:start + _CHUNK] @ centroids.T - half_norms, axis=1)
+    return nearest
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are reseeded from random points."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(x)))
+    centroids = x[rng.choice(len(x), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignment = nearest_centroid(x, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        sums = np.add.reduceat(x[np.argsort(assignment, kind="stable")], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+    return centroids
+
+
+def encode(vectors: np.ndarray, centroids: np.ndarray, codebooks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Coarse list and product-quantized residual code for each vector."""
+    lists = nearest_centroid(vectors, centroids)
+    residuals = vectors - centroids[lists]
+    subvectors, _, width = codebooks.shape
+    codes = np.empty((len(vectors), subvectors), dtype=np.uint8)
+    for j in range(subvectors):
+        codes[:, j] = nearest_centroid(residuals[:, j * width:(j + 1) * width], codebooks[j])
+    return lists, codes
+
+
+def _append(path: str, array: np.ndarray):
+    with open(path, "ab") as f:
+        f.write(np.ascontiguousarray(array).tobytes())
+
+
+class _Generation:
+    """One trained (or untrained) version of the index, as loaded by this process.
+    
+    Treated as immutable so queries can run without a lock; rows appended
+    on disk are picked up by ``extended``, which returns a new object.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(self._file("meta.json")) as f:
+            self.meta = json.load(f)
+        self.dimension = self.meta["dimension"]
+        self.trained = self.meta["trained"]
+        self.rows = 0
+        self.vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        if self.trained:
+            self.centroids = np.load(self._file("centroids.npy"))
+            self.codebooks = np.load(self._file("codebooks.npy"))
+            self.list_rows = [np.empty(0, dtype=np.int32)] * len(self.centroids)
+            self.list_codes = [np.empty((0, len(self.codebooks)), dtype=np.uint8)] * len(self.centroids)
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def extended(self) -> "_Generation":
+        """This generation including rows appended since it was loaded."""
+        # ids.i64 is appended last, so its length counts complete rows
+        rows = os.path.getsize(self._file("ids.i64")) // 8
+        if rows == self.rows:
+            return self
+        
+        new = copy.copy(self)
+        if self.trained:
+            subvectors = len(self.codebooks)
+            added = rows - self.rows
+            lists = np.fromfile(self._file("lists.i32"), dtype=np.int32, count=added, offset=self.rows * 4)
+            codes = np.fromfile(
+                self._file("codes.u8"), dtype=np.uint8, count=added * subvectors, offset=self.rows * subvectors
+            ).reshape(added, subvectors)
+            
+            order = np.argsort(lists, kind="stable")
+            touched, starts = np.unique(lists[order], return_index=True)
+            new.list_rows = list(self.list_rows)
+            new.list_codes = list(self.list_codes)
+            for lst, list_rows, list_codes in zip(
+                touched, np.split(order + self.rows, starts[1:]), np.split(codes[order], starts[1:])
+            ):
+                new.list_rows[lst] = np.concatenate([new.list_rows[lst], list_rows.astype(np.int32)])
+                new.list_codes[lst] = np.concatenate([new.list_codes[lst], list_codes])
+        
+        new.vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        new.ids = np.memmap(self._file("ids.i64"), dtype=np.int64, mode="r", shape=(rows,))
+        new.rows = rows
+        return new
+    
+    def search(self, query: np.ndarray, k: int, nprobe: int, rescore_factor: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and cosine scores of the best ``k`` live rows for one normalized query."""
+        if self.rows == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        if self.trained:
+            coarse = self.centroids @ query
+            probe = np.argsort(-coarse)[:nprobe]
+            rows = np.concatenate([self.list_rows[lst] for lst in probe])
+            if len(rows) > k * rescore_factor:
+                subvectors, _, width = self.codebooks.shape
+                table = np.einsum("skw,sw->sk", self.codebooks, query.reshape(subvectors, width))
+                codes = np.concatenate([self.list_codes[lst] for lst in probe])
+                approximate = np.repeat(coarse[probe], [len(self.list_rows[lst]) for lst in probe]) \
+                    + table[np.arange(subvectors), codes].sum(axis=1)
+                rows = rows[np.argpartition(-approximate, k * rescore_factor - 1)[:k * rescore_factor]]
+            rows = np.sort(rows)  # sequential reads from the memory map
+        else:
+            rows = np.arange(self.rows)
+        
+        ids = np.asarray(self.ids[rows])
+        live = ids >= 0
+        rows, ids = rows[live], ids[live]
+        scores = np.asarray(self.vectors[rows]) @ query
+        best = np.argsort(-scores)[:k]
+        return ids[best], scores[best]
+
+
+class IVFPQIndex:
+    """Persistent IVF-PQ index keyed by knowledge base id.
+    
+    Writers are serialized with a lock file, so the app, the API and
+    ingestion jobs can share one index directory; each process picks up
+    the others' appends and retrains on its next query.
+    """
+    
+    def __init__(self, root: str, nprobe: Optional[int] = None, rescore_factor: Optional[int] = None):
+        self.root = root
+        self.nprobe = nprobe or settings.ANN_NPROBE
+        self.rescore_factor = rescore_factor or settings.ANN_RESCORE_FACTOR
+        self._generation: Optional[_Generation] = None
+        self._lock = threading.RLock()
+    
+    @contextmanager
+    def _exclusive(self):
+        """Hold the write lock across threads and processes."""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+    
+    def _current(self) -> Optional[_Generation]:
+        """The published generation, reloaded or extended if it changed on disk."""
+        link = os.path.join(self.root, "current")
+        if not os.path.exists(link):
+            return None
+        path = os.path.realpath(link)
+        with self._lock:
+            if self._generation is None or self._generation.path != path:
+                self._generation = _Generation(path)
+            self._generation = self._generation.extended()
+            return self._generation
+    
+    def _stage(self, meta: Dict, centroids: Optional[np.ndarray] = None, codebooks: Optional[np.ndarray] = None) -> str:
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"format": FORMAT_VERSION, **meta}, f, indent=2)
+        if meta["trained"]:
+            np.save(os.path.join(staging, "centroids.npy"), centroids)
+            np.save(os.path.join(staging, "codebooks.npy"), codebooks)
+        for name in ("vectors.f32", "lists.i32", "codes.u8", "ids.i64"):
+            open(os.path.join(staging, name), "wb").close()
+        return staging
+    
+    def _publish(self, staging: str):
+        """Move a staged generation into place and point ``current`` at it."""
+        previous = os.path.realpath(os.path.join(self.root, "current"))
+        existing = [name for name in os.listdir(self.root) if name.startswith("index-")]
+        generation = max((int(name.split("-")[1]) for name in existing), default=0) + 1
+        final = os.path.join(self.root, f"index-{generation:06d}")
+        os.rename(staging, final)
+        
+        link = os.path.join(self.root, "current.tmp")
+        if os.path.lexists(link):
+            os.unlink(link)
+        os.symlink(os.path.basename(final), link)
+        os.replace(link, os.path.join(self.root, "current"))
+        # Keep the generation just replaced, since readers in other processes
+        # may have resolved ``current`` right before the swap; older ones go
+        for name in existing:
+            path = os.path.join(self.root, name)
+            if path not in (final, previous):
+                shutil.rmtree(path, ignore_errors=True)
+    
+    @staticmethod
+    def _truncate_partial(generation: _Generation):
+        """Drop bytes past the last complete row, left by an interrupted append.
+        
+        ``ids.i64`` is written last and defines the row count; anything the
+        other files hold beyond it would shift every later row. Must be
+        called with the write lock held.
+        """
+        rows = os.path.getsize(os.path.join(generation.path, "ids.i64")) // 8
+        row_bytes = {"ids.i64": 8, "vectors.f32": generation.dimension * 4}
+        if generation.trained:
+            row_bytes.update({"lists.i32": 4, "codes.u8": len(generation.codebooks)})
+        for name, size in row_bytes.items():
+            path = os.path.join(generation.path, name)
+            if os.path.getsize(path) > rows * size:
+                os.truncate(path, rows * size)
+    
+    @staticmethod
+    def _write_rows(path: str, ids: np.ndarray, vectors: np.ndarray, meta: Dict,
+                    centroids: Optional[np.ndarray], codebooks: Optional[np.ndarray]):
+        if meta["trained"]:
+            lists, codes = encode(vectors, centroids, codebooks)
+            _append(os.path.join(path, "lists.i32"), lists)
+            _append(os.path.join(path, "codes.u8"), codes)
+        _append(os.path.join(path, "vectors.f32"), vectors)
+        _append(os.path.join(path, "ids.i64"), ids)
+    
+    def add(self, ids: List[int], vectors, auto_train: bool = True):
+        """Add vectors for knowledge base ``ids``.
+        
+        Args:
+            ids: Knowledge base ids, one per vector
+            vectors: (len(ids), dimension) embeddings; normalized here
+            auto_train: Train once an untrained index reaches ``ANN_TRAIN_MIN``
+        """
+        if not len(ids):
+            return
+        vectors = normalize(vectors)
+        with self._exclusive():
+            generation = self._current()
+            if generation is None:
+                self._publish(self._stage({"dimension": int(vectors.shape[1]), "trained": False}))
+                generation = self._current()
+            if vectors.shape[1] != generation.dimension:
+                raise ValueError(f"Expected {generation.dimension}-dimensional vectors, got {vectors.shape[1]}")
+            
+            self._truncate_partial(generation)
+            self._write_rows(
+                generation.path, np.asarray(ids, dtype=np.int64), vectors, generation.meta,
+                getattr(generation, "centroids", None), getattr(generation, "codebooks", None)
+            )
+            generation = self._current()
+        
+        if auto_train and not generation.trained and generation.rows >= settings.ANN_TRAIN_MIN:
+            self.train()
+    
+    def delete(self, ids: List[int]):
+        """Mark rows for ``ids`` deleted; ``train`` reclaims their space."""
+        with self._exclusive():
+            generation = self._current()
+            if generation is None or generation.rows == 0:
+                return
+            stored = np.memmap(os.path.join(generation.path, "ids.i64"), dtype=np.int64, mode="r+", shape=(generation.rows,))
+            stored[np.isin(stored, np.asarray(ids, dtype=np.int64))] = -1
+            stored.flush()
+            del stored
+    
+    def train(self, nlist: int = 0) -> Dict:
+        """(Re)train centroids and codebooks on the live vectors and re-encode them.
+        
+        Args:
+            nlist: Coarse lists; defaults to ``ANN_NLIST`` or about 2 * sqrt(n)
+        
+        Returns:
+            ``stats()`` of the new generation
+        """
+        with self._exclusive():
+            generation = self._current()
+            if generation is None:
+                raise ValueError(f"No index in {self.root}")
+            live = np.flatnonzero(np.asarray(generation.ids) >= 0)
+            if not len(live):
+                raise ValueError("The index has no live vectors to train on")
+            
+            subvectors = settings.ANN_PQ_SUBVECTORS
+            if generation.dimension % subvectors:
+                raise ValueError(f"ANN_PQ_SUBVECTORS ({subvectors}) must divide the dimension ({generation.dimension})")
+            width = generation.dimension // subvectors
+            
+            nlist = nlist or settings.ANN_NLIST or max(1, int(2 * np.sqrt(len(live))))
+            rng = np.random.default_rng(0)
+            sample_size = min(len(live), max(nlist * _TRAIN_POINTS_PER_LIST, CODEBOOK_SIZE * 40))
+            sample = np.asarray(generation.vectors[np.sort(rng.choice(live, sample_size, replace=False))])
+            
+            centroids = kmeans(sample, nlist)
+            residuals = sample - centroids[nearest_centroid(sample, centroids)]
+            codebooks = np.stack([
+                kmeans(np.ascontiguousarray(residuals[:, j * width:(j + 1) * width]), CODEBOOK_SIZE, seed=j)
+                for j in range(subvectors)
+            ])
+            
+            meta = {
+                "dimension": generation.dimension,
+                "trained": True,
+                "nlist": len(centroids),
+                "subvectors": subvectors,
+                "trained_on": int(sample_size)
+            }
+            staging = self._stage(meta, centroids, codebooks)
+            try:
+                for start in range(0, len(live), _CHUNK):
+                    rows = live[start:start + _CHUNK]
+                    self._write_rows(
+                        staging, np.asarray(generation.ids[rows]), np.asarray(generation.vectors[rows]),
+                        meta, centroids, codebooks
+                    )
+                self._publish(staging)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            self._generation = None
+        return self.stats()
+    
+    def search(self, query_embeddings, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Ids and cosine scores of the ``k`` nearest vectors, per query."""
+        generation = self._current()
+        queries = normalize(query_embeddings)
+        if generation is None:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        return [generation.search(query, k, self.nprobe, self.rescore_factor) for query in queries]
+    
+    def contains(self, ids: List[int]) -> List[int]:
+        """The subset of ``ids`` with a live row."""
+        generation = self._current()
+        if generation is None:
+            return []
+        wanted = np.asarray(ids, dtype=np.int64)
+        return wanted[np.isin(wanted, np.asarray(generation.ids))].tolist()
+    
+    def stats(self) -> Dict:
+        generation = self._current()
+        if generation is None:
+            return {'rows': 0, 'live': 0, 'trained': False}
+        rows = generation.rows
+        # Codes plus inverted-list row numbers are resident; vectors stay on disk
+        resident = rows * (generation.meta.get("subvectors", 0) + 4) if generation.trained else rows * generation.dimension * 4
+        return {
+            'rows': rows,
+            'live': int((np.asarray(generation.ids) >= 0).sum()),
+            'trained': generation.trained,
+            'nlist': generation.meta.get("nlist"),
+            'subvectors': generation.meta.get("subvectors"),
+            'resident_bytes': resident,
+            'full_vector_bytes': rows * generation.dimension * 4
+        }
+
+
+class IVFPQCollection:
+    """Chroma-compatible front for ``IVFPQIndex``.
+    
+    Only vectors are indexed; document texts and metadata are read from
+    the ``knowledge_base`` table for the hits, so ``add`` ignores them.
+    """
+    
+    def __init__(self, root: str):
+        self.index = IVFPQIndex(root)
+    
+    def count(self) -> int:
+        return self.index.stats()['live']
+    
+    def add(self, embeddings, ids: List[str], documents=None, metadatas=None):
+        self.index.add([int(kb_id) for kb_id in ids], embeddings)
+    
+    def delete(self, ids: List[str]):
+        self.index.delete([int(kb_id) for kb_id in ids])
+    
+    def get(self, ids: List[str], include=None) -> Dict:
+        """Which of ``ids`` are indexed, as ``{'ids': [...]}`` like Chroma's ``get``."""
+        return {'ids': [str(kb_id) for kb_id in self.index.contains([int(kb_id) for kb_id in ids])]}
+    
+    def query(self, query_embeddings, n_results: int = 10) -> Dict:
+        """Nearest documents by cosine similarity, in Chroma's result format."""
+        from models.database import KnowledgeBase
+        from utils.database import get_db
+        
+        hits = self.index.search(query_embeddings, n_results)
+        wanted = {int(kb_id) for ids, _ in hits for kb_id in ids}
+        
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        with get_db() as db:
+            entries = {
+                entry.id: entry
+                for entry in db.query(KnowledgeBase).filter(KnowledgeBase.id.in_(wanted)).all()
+            } if wanted else {}
+            
+            for ids, scores in hits:
+                found = [(entries[int(kb_id)], float(score)) for kb_id, score in zip(ids, scores) if int(kb_id) in entries]
+                result['ids'].append([str(entry.id) for entry, _ in found])
+                result['documents'].append([entry.content for entry, _ in found])
+                result['metadatas'].append([
+                    {"id": entry.id, "title": entry.title, "source": entry.source, "category": entry.category}
+                    for entry, _ in found
+                ])
+                result['distances'].append([1 - score for _, score in found])
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build, retrain or inspect the IVF-PQ knowledge index.")
+    parser.add_argument("command", choices=["stats", "train", "build"],
+                        help="'build' re-embeds the whole knowledge base into a fresh index")
+    parser.add_argument("--path", default=settings.ANN_INDEX_DIR, help="index directory")
+    parser.add_argument("--nlist", type=int, default=0, help="coarse lists (default: ANN_NLIST or about 2 * sqrt(n))")
+    parser.add_argument("--batch-size", type=int, default=1000, help="entries embedded per batch for 'build'")
+    args = parser.parse_args()
+    
+    index = IVFPQIndex(args.path)
+    if args.command == "build":
+        from models.database import KnowledgeBase
+        from utils.database import get_db
+        from utils.embeddings import embedding_service
+        
+        shutil.rmtree(args.path, ignore_errors=True)
+        last_id = 0
+        while True:
+            with get_db() as db:
+                batch = db.query(KnowledgeBase.id, KnowledgeBase.content).filter(
+                    KnowledgeBase.id > last_id
+                ).order_by(KnowledgeBase.id).limit(args.batch_size).all()
+            if not batch:
+                break
+            index.add([kb_id for kb_id, _ in batch], embedding_service.encode([content for _, content in batch]), auto_train=False)
+            last_id = batch[-1][0]
+            print(f"Embedded {index.stats()['rows']} entries")
+        if not last_id:
+            parser.exit(1, "The knowledge base is empty\n")
+    
+    if args.command in ("build", "train"):
+        index.train(args.nlist)
+    print(json.dumps(index.stats(), indent=2))
@@ -1,30 +1,89 @@
 """Authentication utilities for Google OAuth."""
 
 import streamlit as st
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from typing import Optional, Dict
+import streamlit.components.v1 as components
+import requests
+from typing import Optional, Dict, Tuple
+from dataclasses import replace
+from datetime import datetime
+from http.cookies import SimpleCookie
+import json
+import re
+import threading
 import time
 
 from config.settings import settings
 from models.database import User
-from utils.database import get_db
+from utils.database import get_db, upsert
+from utils.analytics import analytics_manager
+from utils.sessions import session_manager
+from utils.session_state import UserRecord
+
+
+class GoogleCertCache:
+    """Google's ID-token signing certificates, cached per process.
+    
+    Certificates are fetched over a pooled HTTP session and reused until the
+    ``Cache-Control: max-age`` Google sends with them expires, so verifying
+    a login is normally a local signature check with no network call.
+    """
+    
+    CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+    DEFAULT_MAX_AGE = 300
+    
+    def __init__(self):
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+    
+    def get(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Return the current key id -> PEM certificate mapping."""
+        with self._lock:
+            if force_refresh or not self._certs or time.monotonic() >= self._expires_at:
+                try:
+                    self._refresh()
+                except Exception:
+                    # Serve stale certificates through a transient outage
+                    if not self._certs:
+                        raise
+            return self._certs
+    
+    def _refresh(self):
+        response = self._session.get(self.CERTS_URL, timeout=10)
+        response.raise_for_status()
+        self._certs = response.json()
+        self._expires_at = time.monotonic() + self._max_age(response.headers)
+    
+    def _max_age(self, headers) -> int:
+        """Seconds the response may be cached, per Cache-Control and Age."""
+        match = re.search(r"max-age=(\d+)", headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else self.DEFAULT_MAX_AGE
+        age = int(headers.get("Age", 0) or 0)
+        return max(0, max_age - age)
 
 
 class AuthManager:
     """Manage authentication and user sessions."""
     
+    SESSION_COOKIE = "boeing_chatbot_session"
+    
     def __init__(self):
         self.client_id = settings.GOOGLE_CLIENT_ID
+        self._certs = GoogleCertCache()
         
     def verify_google_token(self, token: str) -> Optional[Dict]:
         """Verify Google OAuth token and return user info."""
+        from google.auth import jwt
+        
         try:
-            idinfo = id_token.verify_oauth2_token(
-                token, 
-                requests.Request(), 
-                self.client_id
-            )
+            try:
+                idinfo = jwt.decode(token, certs=self._certs.get(), audience=self.client_id)
+            except ValueError as e:
+                # Google rotated its keys since our cached copy was fetched
+                if "Certificate for key id" not in str(e):
+                    raise
+                idinfo = jwt.decode(token, certs=self._certs.get(force_refresh=True), audience=self.client_id)
             
             if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
                 raise ValueError('Wrong issuer.')
@@ -39,27 +98,40 @@ class AuthManager:
             return None
     
     def get_or_create_user(self, user_info: Dict) -> User:
-        """Get existing user or create new one."""
+        """Get existing user or create new one.
+        
+        Inserts with ``ON CONFLICT DO NOTHING``: a returned row means this
+        call created the user, even if another login for the same email is
+        racing it. Otherwise the existing row gets a new ``last_login``.
+        """
+        now = datetime.utcnow()
         with get_db() as db:
-            user = db.query(User).filter(User.email == user_info['email']).first()
+            user = upsert(
+                db,
+                User,
+                {
+                    'email': user_info['email'],
+                    'name': user_info['name'],
+                    'google_id': user_info['google_id'],
+                    'is_first_time': True,
+                    'created_at': now,
+                    'last_login': now
+                },
+                index_elements=['email'],
+                returning=[User]
+            ).scalar_one_or_none()
             
-            if not user:
-                user = User(
-                    email=user_info['email'],
-                    name=user_info['name'],
-                    google_id=user_info['google_id'],
-                    is_first_time=True
-                )
-                db.add(user)
-                db.commit()
-                db.refresh(user)
+            if user is not None:
+                analytics_manager.bump_counter(db, 'users')
+                analytics_manager.bump_counter(db, 'first_time_users')
             else:
-                # Update last login
-                from datetime import datetime
-                user.last_login = datetime.utcnow()
-                db.commit()
-                db.refresh(user)
+                user = db.query(User).filter(User.email == user_info['email']).one()
+                user.last_login = now
+                db.flush()
             
+            # Keep the loaded attributes usable once the session closes
+            db.expunge(user)
+            db.commit()
             return user
     
     def is_admin(self, email: str) -> bool:
@@ -76,34 +148,116 @@ class AuthManager:
             st.session_state.conversation_id = None
         if 'messages' not in st.session_state:
             st.session_state.messages = []
+        if 'session_token' not in st.session_state:
+            st.session_state.session_token = None
+    
+    def authenticate(self, user_info: Dict) -> Tuple[UserRecord, str]:
+        """Register a verified login and return the user and a session token.
+        
+        Independent of Streamlit, so the HTTP API can log users in too.
+        """
+        user = UserRecord.from_model(self.get_or_create_user(user_info))
+        token = session_manager.issue(user)
+        
+        # Log analytics
+        self._log_login(user)
+        return user, token
     
     def login(self, user_info: Dict):
         """Log in user."""
-        user = self.get_or_create_user(user_info)
+        user, token = self.authenticate(user_info)
         st.session_state.user = user
         st.session_state.authenticated = True
         
-        # Log analytics
-        self._log_login(user)
+        # The token goes into a cookie (see ``render_session_cookie``) so a
+        # refresh or reconnect can restore the login without another OAuth
+        # round-trip; it never appears in the URL, where it would end up in
+        # history, logs and shared links. Drop the OAuth callback parameters.
+        st.session_state.session_token = token
+        st.experimental_set_query_params()
+    
+    def _session_cookie(self) -> Optional[str]:
+        """The session token sent with this browser connection, if any."""
+        # st.context needs Streamlit >= 1.37; older versions expose the headers
+        context = getattr(st, "context", None)
+        if context is not None:
+            return context.cookies.get(self.SESSION_COOKIE)
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        cookies = SimpleCookie((_get_websocket_headers() or {}).get("Cookie", ""))
+        morsel = cookies.get(self.SESSION_COOKIE)
+        return morsel.value if morsel else None
+    
+    def _write_cookie(self, value: str, max_age: int):
+        """Set the session cookie on the page from a zero-height component.
+        
+        Streamlit cannot set response headers, so the cookie is written by
+        script and cannot be HttpOnly: anything able to run script on the
+        page can read it. It is only sent over HTTPS (browsers also accept
+        ``Secure`` on http://localhost) and never on cross-site requests,
+        and message text is escaped before it is rendered as HTML.
+        """
+        cookie = f"{self.SESSION_COOKIE}={value}; Max-Age={max_age}; Path=/; SameSite=Strict; Secure"
+        components.html(f"<script>window.parent.document.cookie = {json.dumps(cookie)};</script>", height=0)
+    
+    def render_session_cookie(self):
+        """Store the logged-in session's token in a cookie; call on every authenticated run."""
+        if st.session_state.get('session_token'):
+            self._write_cookie(st.session_state.session_token, settings.SESSION_TTL_HOURS * 3600)
+    
+    def clear_session_cookie(self):
+        """Remove a stale or revoked session cookie; call on the login page."""
+        if self._session_cookie():
+            self._write_cookie("", 0)
+    
+    def restore_session(self) -> bool:
+        """Restore a login from the session cookie, if valid."""
+        token = self._session_cookie()
+        if not token:
+            return False
+        
+        user = session_manager.restore(token)
+        if user is None:
+            return False
+        
+        st.session_state.user = user
+        st.session_state.authenticated = True
+        st.session_state.session_token = token
+        return True
     
     def logout(self):
         """Log out user."""
+        if st.session_state.get('session_token'):
+            session_manager.revoke(st.session_state.session_token)
+        st.session_state.session_token = None
         st.session_state.user = None
         st.session_state.authenticated = False
         st.session_state.conversation_id = None
         st.session_state.messages = []
+        st.session_state.has_earlier_messages = False
     
-    def _log_login(self, user: User):
-        """Log login event to analytics."""
-        from models.database import Analytics
+    def mark_returning_user(self, user: UserRecord) -> UserRecord:
+        """Clear the first-time flag once the welcome message has been shown.
         
+        Returns:
+            The updated user record
+        """
+        with get_db() as db:
+            db_user = db.query(User).filter_by(id=user.id).first()
+            if db_user and db_user.is_first_time:
+                db_user.is_first_time = False
+                analytics_manager.bump_counter(db, 'first_time_users', -1)
+                db.commit()
+        return replace(user, is_first_time=False)
+    
+    def _log_login(self, user: UserRecord):
+        """Log login event to analytics."""
         with get_db() as db:
-            analytics = Analytics(
-                user_id=user.id,
-                event_type='login',
-                event_data={'timestamp': time.time()}
+            analytics_manager.record_event(
+                db,
+                user.id,
+                'login',
+                {'timestamp': time.time()}
             )
-            db.add(analytics)
             db.commit()
 
 
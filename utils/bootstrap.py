@@ -0,0 +1,111 @@
+"""One-time, per-process application startup."""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.database import init_db
+from utils.analytics import analytics_manager
+from utils.partitions import analytics_partitions
+from utils.search import message_search
+from utils.embeddings import embedding_service
+from utils.knowledge import retriever
+from utils.rerank import reranker
+from config.settings import settings
+
+
+class Bootstrap:
+    """Run startup steps exactly once per process.
+    
+    Streamlit re-executes the script for every interaction, so schema
+    checks, knowledge-base seeding and model warm-up live here instead of
+    in the script body. Concurrent sessions block on a lock until the first
+    run finishes; later calls return immediately. Each step's duration and
+    error are kept for the admin dashboard.
+    
+    Background steps (model loading and the like) run on a daemon thread
+    after the foreground steps, so the login page can render while they
+    finish; ``ready`` turns true once every step has completed cleanly.
+    """
+    
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], None], bool]] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._started_at = 0.0
+        self.ready = False
+        self.finished = False
+        self.report: List[Dict] = []
+        self.total_seconds: Optional[float] = None
+    
+    def step(self, name: str, func: Callable[[], None], background: bool = False):
+        """Register a startup step; steps run in registration order."""
+        self._steps.append((name, func, background))
+    
+    def run(self) -> List[Dict]:
+        """Run all steps if they have not run yet, and return the report.
+        
+        A failing step is recorded and does not stop later steps, so a
+        missing vector store does not keep the app from serving chats.
+        """
+        if self._started:
+            return self.report
+        
+        with self._lock:
+            if self._started:
+                return self.report
+            
+            self._started_at = time.perf_counter()
+            self._run_steps([s for s in self._steps if not s[2]])
+            
+            background = [s for s in self._steps if s[2]]
+            if background:
+                threading.Thread(
+                    target=self._run_steps,
+                    args=(background, True),
+                    name="bootstrap",
+                    daemon=True
+                ).start()
+            else:
+                self._finish()
+            
+            self._started = True
+            return self.report
+    
+    def _run_steps(self, steps: List[Tuple[str, Callable[[], None], bool]], finish: bool = False):
+        for name, func, _ in steps:
+            step_started = time.perf_counter()
+            error = None
+            try:
+                func()
+            except Exception as e:
+                error = str(e)
+            self.report.append({
+                'step': name,
+                'seconds': time.perf_counter() - step_started,
+                'error': error
+            })
+        if finish:
+            self._finish()
+    
+    def _finish(self):
+        self.total_seconds = time.perf_counter() - self._started_at
+        self.ready = all(r['error'] is None for r in self.report)
+        self.finished = True
+
+
+def _warm_up_embeddings():
+    """Run one encode so the first student query does not pay for it."""
+    embedding_service.encode(["warm-up"])
+
+
+bootstrap = Bootstrap()
+bootstrap.step("Database schema", init_db)
+bootstrap.step("Analytics partitions", analytics_partitions.maintain)
+bootstrap.step("Analytics rollups", analytics_manager.ensure_rollups)
+bootstrap.step("Message search index", message_search.setup)
+bootstrap.step("Knowledge base seeding", retriever.initialize_knowledge_base, background=True)
+bootstrap.step("Embedding model warm-up", _warm_up_embeddings, background=True)
+if settings.RERANK_ENABLED:
+    bootstrap.step("Reranker warm-up", reranker.warm_up, background=True)
+bootstrap.step("Analytics retention", analytics_partitions.apply_retention, background=True)
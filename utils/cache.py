@@ -0,0 +1,66 @@
+"""In-process read-through cache for per-user panels."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class UserCache:
+    """Per-user values loaded on first read and dropped when the user's data changes.
+    
+    Writers call ``invalidate(user_id)`` after committing, so reads in this
+    process never see stale data. ``ttl_seconds`` bounds how long writes
+    made by other processes (e.g. the API next to the Streamlit app) can go
+    unnoticed. The least recently used users are evicted beyond ``max_users``.
+    """
+    
+    def __init__(self, max_users: int, ttl_seconds: float):
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[int, Dict[Hashable, Tuple[Any, float]]]" = OrderedDict()
+        # Invalidations seen by loads still in flight; users with no load in
+        # flight have no entry, so writes alone never grow these
+        self._versions: Dict[int, int] = {}
+        self._loading: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: int, key: Hashable, load: Callable[[], Any]) -> Any:
+        """The cached value for ``(user_id, key)``, calling ``load`` on a miss."""
+        with self._lock:
+            cached = self._entries.get(user_id, {}).get(key)
+            if cached and cached[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return cached[0]
+            version = self._versions.get(user_id, 0)
+            self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        
+        try:
+            value = load()
+        except BaseException:
+            with self._lock:
+                self._finish_load(user_id)
+            raise
+        
+        with self._lock:
+            # An invalidation while loading means the value may predate the write
+            if self._versions.get(user_id, 0) == version:
+                self._entries.setdefault(user_id, {})[key] = (value, time.monotonic() + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+            self._finish_load(user_id)
+        return value
+    
+    def _finish_load(self, user_id: int):
+        self._loading[user_id] -= 1
+        if not self._loading[user_id]:
+            del self._loading[user_id]
+            self._versions.pop(user_id, None)
+    
+    def invalidate(self, user_id: int):
+        """Drop everything cached for ``user_id``."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if user_id in self._loading:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
@@ -0,0 +1,133 @@
+"""Chat turn orchestration shared by the Streamlit UI and the HTTP API."""
+
+from typing import Iterator, List, Optional, Tuple
+
+from models.database import Message, User
+from utils.conversation import conversation_manager
+from utils.knowledge import retriever
+from utils.llm import chatbot
+from utils.session_state import MessageRecord
+from utils.tracing import tracer
+
+
+class ChatService:
+    """Run a single chat turn: persist, retrieve, generate, persist, log.
+    
+    Rate limiting is left to the caller, which decides how to report it.
+    Each turn is traced as a "chat.turn" root span.
+    """
+    
+    def _prepare_turn(self, conversation_id: int, prompt: str, history: List[MessageRecord]) -> Tuple[Message, str]:
+        """Save the user message, title new conversations and fetch context."""
+        user_message = conversation_manager.add_message(conversation_id, "user", prompt)
+        
+        # Title the conversation from its first message
+        if not history:
+            title = chatbot.generate_conversation_title(prompt)
+            conversation_manager.update_conversation_title(conversation_id, title)
+        
+        return user_message, retriever.retrieve_context(prompt)
+    
+    def _finish_turn(
+        self,
+        user: User,
+        conversation_id: int,
+        prompt: str,
+        response: str,
+        context: str,
+        complete: bool = True
+    ) -> Message:
+        """Save the assistant message and log the query.
+        
+        A reply cut off mid-stream is saved with ``complete: False`` in its metadata.
+        """
+        msg_metadata = {"context_used": bool(context)}
+        if not complete:
+            msg_metadata["complete"] = False
+        assistant_message = conversation_manager.add_message(
+            conversation_id,
+            "assistant",
+            response,
+            msg_metadata=msg_metadata
+        )
+        conversation_manager.log_query(user, prompt, response)
+        return assistant_message
+    
+    def send_message(
+        self,
+        user: User,
+        conversation_id: int,
+        prompt: str,
+        history: Optional[List[MessageRecord]] = None
+    ) -> Tuple[Message, Message]:
+        """Run a full turn and return the saved messages.
+        
+        Args:
+            user: The user sending the message
+            conversation_id: Conversation to append to
+            prompt: The user's message
+            history: Earlier messages in the conversation, oldest first
+        
+        Returns:
+            The saved user message and assistant response
+        """
+        history = history or []
+        with tracer.span("chat.turn", root=True, conversation_id=conversation_id):
+            user_message, context = self._prepare_turn(conversation_id, prompt, history)
+            response = chatbot.generate_response(prompt, history, context)
+            return user_message, self._finish_turn(user, conversation_id, prompt, response, context)
+    
+    def stream_message(
+        self,
+        user: User,
+        conversation_id: int,
+        prompt: str,
+        history: Optional[List[MessageRecord]] = None
+    ) -> Iterator[str]:
+        """Run a full turn, yielding the response as it is generated.
+        
+        The assistant message is saved when the stream ends, including when
+        the consumer stops early (e.g. the client disconnected), in which
+        case whatever was generated so far is saved as an incomplete reply.
+        """
+        history = history or []
+        
+        # The consumer may resume this generator in another context, so the
+        # turn's spans are activated only around code that does not yield
+        turn = tracer.start_span("chat.turn", root=True, conversation_id=conversation_id, streamed=True)
+        stream = None
+        context = None
+        chunks = []
+        complete = False
+        try:
+            with tracer.activate(turn):
+                _, context = self._prepare_turn(conversation_id, prompt, history)
+        
+            stream = tracer.start_span("llm.stream", parent=turn)
+            for chunk in chatbot.generate_response_stream(prompt, history, context):
+                if not chunks and stream is not None:
+                    stream.attributes['first_chunk_ms'] = round(stream.elapsed_ms(), 1)
+                chunks.append(chunk)
+                yield chunk
+            complete = True
+        except Exception as e:
+            tracer.end_span(stream, error=e)
+            tracer.end_span(turn, error=e)
+            raise
+        finally:
+            # Also runs on GeneratorExit when the consumer closes the stream early
+            if stream is not None and not complete:
+                stream.attributes['complete'] = False
+            tracer.end_span(stream)
+            try:
+                if chunks:
+                    with tracer.activate(turn):
+                        self._finish_turn(user, conversation_id, prompt, "".join(chunks), context, complete=complete)
+            except Exception as e:
+                tracer.end_span(turn, error=e)
+                raise
+            finally:
+                tracer.end_span(turn)
+
+
+chat_service = ChatService()
@@ -1,14 +1,32 @@
 """Conversation management utilities."""
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 from datetime import datetime
 
-from models.database import Conversation, Message, User, Bookmark, Analytics
+from sqlalchemy.orm import joinedload
+
+from config.settings import settings
+from models.database import Conversation, Message, User, Bookmark
 from utils.database import get_db
+from utils.analytics import analytics_manager
+from utils.cache import UserCache
+from utils.search import message_search
+from utils.session_state import BookmarkRecord, ConversationRecord, MessageRecord
+from utils.tracing import tracer
 
 
 class ConversationManager:
-    """Manage conversations and messages."""
+    """Manage conversations and messages.
+    
+    Each user's recent-conversation list and bookmarks are served from an
+    in-process ``UserCache``, so sidebar and bookmark page reruns do not
+    query the database; the methods that change them invalidate the
+    affected user's entries.
+    """
+    
+    def __init__(self):
+        self._conversations = UserCache(settings.PANEL_CACHE_USERS, settings.PANEL_CACHE_TTL_SECONDS)
+        self._bookmarks = UserCache(settings.PANEL_CACHE_USERS, settings.PANEL_CACHE_TTL_SECONDS)
     
     def create_conversation(self, user: User, title: str = "New Conversation") -> Conversation:
         """Create a new conversation for a user."""
@@ -19,23 +37,35 @@ class ConversationManager:
                 is_active=True
             )
             db.add(conversation)
+            analytics_manager.bump_counter(db, 'conversations')
             db.commit()
             db.refresh(conversation)
-            return conversation
+        
+        self._conversations.invalidate(user.id)
+        return conversation
     
     def get_conversation(self, conversation_id: int) -> Optional[Conversation]:
         """Get a conversation by ID."""
         with get_db() as db:
             return db.query(Conversation).filter(Conversation.id == conversation_id).first()
     
-    def get_user_conversations(self, user: User, limit: int = 10) -> List[Conversation]:
-        """Get recent conversations for a user."""
-        with get_db() as db:
-            return db.query(Conversation)\
-                .filter(Conversation.user_id == user.id)\
-                .order_by(Conversation.updated_at.desc())\
-                .limit(limit)\
-                .all()
+    def get_user_conversations(self, user: User, limit: int = 10) -> List[ConversationRecord]:
+        """Get recent conversations for a user (cached).
+        
+        One list of the ``PANEL_CONVERSATIONS`` most recent is cached per
+        user and sliced, so ``limit`` is capped at that size.
+        """
+        def load() -> List[ConversationRecord]:
+            with get_db() as db:
+                rows = db.query(Conversation)\
+                    .filter(Conversation.user_id == user.id)\
+                    .order_by(Conversation.updated_at.desc())\
+                    .limit(settings.PANEL_CONVERSATIONS)\
+                    .all()
+                return [ConversationRecord.from_model(c) for c in rows]
+        
+        limit = max(0, min(limit, settings.PANEL_CONVERSATIONS))
+        return self._conversations.get(user.id, None, load)[:limit]
     
     def add_message(
         self, 
@@ -59,9 +89,22 @@ class ConversationManager:
             if conversation:
                 conversation.updated_at = datetime.utcnow()
             
+            analytics_manager.bump_counter(db, 'messages')
             db.commit()
             db.refresh(message)
-            return message
+        
+        # The conversation moves to the top of its owner's recent list
+        if conversation:
+            self._conversations.invalidate(conversation.user_id)
+        return message
+    
+    def user_owns_message(self, user: User, message_id: int) -> bool:
+        """Check that a message is in one of the user's conversations."""
+        with get_db() as db:
+            return db.query(Message.id)\
+                .join(Conversation, Conversation.id == Message.conversation_id)\
+                .filter(Message.id == message_id, Conversation.user_id == user.id)\
+                .first() is not None
     
     def get_conversation_messages(self, conversation_id: int) -> List[Message]:
         """Get all messages in a conversation."""
@@ -71,14 +114,38 @@ class ConversationManager:
                 .order_by(Message.created_at.asc())\
                 .all()
     
-    def get_conversation_history(self, conversation_id: int) -> List[Dict[str, str]]:
-        """Get conversation history in format for LLM."""
-        messages = self.get_conversation_messages(conversation_id)
+    def get_conversation_history(self, conversation_id: int, limit: Optional[int] = None) -> List[MessageRecord]:
+        """Get conversation history as compact records, oldest first.
+        
+        Args:
+            conversation_id: Conversation to load
+            limit: Only return the most recent ``limit`` messages
+        """
+        if limit is None:
+            messages = self.get_conversation_messages(conversation_id)
+        else:
+            with get_db() as db:
+                messages = db.query(Message)\
+                    .filter(Message.conversation_id == conversation_id)\
+                    .order_by(Message.created_at.desc(), Message.id.desc())\
+                    .limit(limit)\
+                    .all()
+            messages.reverse()
+        
         return [
-            {"role": msg.role, "content": msg.content}
+            MessageRecord(id=msg.id, role=msg.role, content=msg.content)
             for msg in messages
         ]
     
+    def search_messages(self, user: User, query: str, limit: int = 10, offset: int = 0) -> Dict:
+        """Full-text search over the user's messages.
+        
+        Returns:
+            ``results`` (ranked messages with a highlighted ``snippet``) and
+            ``has_more``; see ``MessageSearch.search``
+        """
+        return message_search.search(user.id, query, limit=limit, offset=offset)
+    
     def update_conversation_title(self, conversation_id: int, title: str):
         """Update conversation title."""
         with get_db() as db:
@@ -86,6 +153,7 @@ class ConversationManager:
             if conversation:
                 conversation.title = title
                 db.commit()
+                self._conversations.invalidate(conversation.user_id)
     
     def bookmark_message(self, user: User, message_id: int, note: str = "") -> Bookmark:
         """Bookmark/star a message."""
@@ -106,7 +174,9 @@ class ConversationManager:
             db.add(bookmark)
             db.commit()
             db.refresh(bookmark)
-            return bookmark
+        
+        self._bookmarks.invalidate(user.id)
+        return bookmark
     
     def unbookmark_message(self, user: User, message_id: int):
         """Remove bookmark from a message."""
@@ -117,14 +187,29 @@ class ConversationManager:
             if bookmark:
                 db.delete(bookmark)
                 db.commit()
+                self._bookmarks.invalidate(user.id)
+    
+    def get_user_bookmarks(self, user: User) -> List[BookmarkRecord]:
+        """Get all bookmarks for a user (cached), each with its message."""
+        def load() -> List[BookmarkRecord]:
+            with get_db() as db:
+                rows = db.query(Bookmark)\
+                    .options(joinedload(Bookmark.message))\
+                    .filter(Bookmark.user_id == user.id)\
+                    .order_by(Bookmark.created_at.desc())\
+                    .all()
+                return [BookmarkRecord.from_model(b) for b in rows]
+        
+        return list(self._bookmarks.get(user.id, None, load))
     
-    def get_user_bookmarks(self, user: User) -> List[Bookmark]:
-        """Get all bookmarks for a user."""
+    def get_bookmarked_message_ids(self, user: User, conversation_id: int) -> Set[int]:
+        """Get ids of the user's bookmarked messages in one conversation."""
         with get_db() as db:
-            return db.query(Bookmark)\
-                .filter(Bookmark.user_id == user.id)\
-                .order_by(Bookmark.created_at.desc())\
+            rows = db.query(Bookmark.message_id)\
+                .join(Message, Message.id == Bookmark.message_id)\
+                .filter(Bookmark.user_id == user.id, Message.conversation_id == conversation_id)\
                 .all()
+            return {message_id for (message_id,) in rows}
     
     def is_message_bookmarked(self, user: User, message_id: int) -> bool:
         """Check if a message is bookmarked by user."""
@@ -134,20 +219,27 @@ class ConversationManager:
                 .first()
             return bookmark is not None
     
+    @tracer.traced("analytics.log")
     def log_query(self, user: User, query: str, response: str):
         """Log a query for analytics."""
         with get_db() as db:
-            analytics = Analytics(
-                user_id=user.id,
-                event_type='query',
-                event_data={
+            analytics_manager.record_event(
+                db,
+                user.id,
+                'query',
+                {
                     'query': query,
                     'response_length': len(response),
                     'timestamp': datetime.utcnow().isoformat()
                 }
             )
-            db.add(analytics)
             db.commit()
 
+        try:
+            analytics_manager.flush_query_sketches()
+        except Exception:
+            # The counts stay buffered for the next flush; the turn is already saved
+            pass
+
 
 conversation_manager = ConversationManager()
@@ -1,14 +1,16 @@
 """Database utilities and connection management."""
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 from contextlib import contextmanager
-from typing import Generator
+from typing import Dict, Generator, List, Optional
 import streamlit as st
 
-from models.database import Base
+from models.database import Analytics, Base, KnowledgeBase, sqlite_analytics_base
 from config.settings import settings
+from utils.tracing import tracer
 
 
 # Create engine
@@ -18,13 +20,92 @@ engine = create_engine(
     echo=False
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factory. Objects are returned from get_db() blocks and
+# used after the session closes, so they must not be expired on commit.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+# Time every statement issued inside a trace as a "db.query" span
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    if tracer.current() is not None:
+        context._trace_span = tracer.start_span("db.query", statement=statement.split(None, 1)[0].upper())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+    tracer.end_span(getattr(context, "_trace_span", None))
+
+
+@event.listens_for(engine, "handle_error")
+def _fail_query_span(exception_context):
+    context = exception_context.execution_context
+    if context is not None:
+        tracer.end_span(getattr(context, "_trace_span", None), error=exception_context.original_exception)
 
 
 def init_db():
-    """Initialize database tables."""
-    Base.metadata.create_all(bind=engine)
+    """Initialize database tables.
+    
+    Also adds ``knowledge_base.seed_key`` to databases created before it
+    existed; ``create_all`` only creates missing tables. On SQLite the
+    analytics base table has its own definition, ``sqlite_analytics_base``.
+    """
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(
+            bind=engine,
+            tables=[t for t in Base.metadata.sorted_tables if t is not Analytics.__table__]
+        )
+        sqlite_analytics_base.create(bind=engine, checkfirst=True)
+    else:
+        Base.metadata.create_all(bind=engine)
+    
+    if 'seed_key' not in {c['name'] for c in inspect(engine).get_columns('knowledge_base')}:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE knowledge_base ADD COLUMN seed_key VARCHAR(200)"))
+        except DBAPIError:
+            # Another worker added it first
+            if 'seed_key' not in {c['name'] for c in inspect(engine).get_columns('knowledge_base')}:
+                raise
+        for index in KnowledgeBase.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+@contextmanager
+def startup_lock(name: str) -> Generator[None, None, None]:
+    """Hold a cross-process lock around one-time startup work.
+    
+    Every worker process runs the same startup steps; holding this lock
+    around a check-then-write makes the others wait and then find the work
+    done. PostgreSQL uses a session-level advisory lock. A SQLite database
+    is a local file, so a lock file next to it covers every process that
+    shares it.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {'name': name})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {'name': name})
+                conn.commit()
+    elif engine.dialect.name == "sqlite":
+        database = engine.url.database
+        if not database or database == ":memory:":
+            # Only this process can see the database
+            yield
+            return
+        import fcntl
+        with open(f"{database}.{name}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        raise NotImplementedError(f"startup_lock is not supported on {engine.dialect.name}")
 
 
 @contextmanager
@@ -44,3 +125,44 @@ def get_db() -> Generator[Session, None, None]:
 def get_db_session() -> Session:
     """Get database session for Streamlit."""
     return SessionLocal()
+
+
+def upsert(
+    db: Session,
+    model,
+    values: Dict,
+    index_elements: List[str],
+    update: Optional[Dict] = None,
+    returning: Optional[List] = None
+):
+    """Insert a row, or update it in place if the key already exists.
+    
+    Issues a single ``INSERT ... ON CONFLICT`` statement on PostgreSQL and
+    SQLite so concurrent writers never race between a SELECT and an INSERT.
+    
+    Args:
+        db: Active database session
+        model: Mapped model class to write to
+        values: Column values for the new row
+        index_elements: Columns of the unique constraint to conflict on
+        update: Column values to set when the row exists (``None`` leaves it untouched)
+    
+    Returns:
+        The statement result
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upsert is not supported on {dialect}")
+    
+    stmt = insert(model).values(**values)
+    if update:
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=update)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    if returning:
+        stmt = stmt.returning(*returning)
+    return db.execute(stmt)
@@ -0,0 +1,175 @@
+"""CPU runtimes for the sentence embedding model.
+
+All runtimes expose ``encode(texts) -> np.ndarray`` (float32, one row per
+text) and are selected by name:
+
+- ``torch``: the reference ``SentenceTransformer`` in float32
+- ``torch-int8``: the same model with its Linear layers dynamically
+  quantized to int8
+- ``onnx``: the transformer exported to ONNX and run with onnxruntime
+- ``onnx-int8``: the ONNX export with dynamically quantized int8 weights
+
+ONNX exports are written once to ``EMBEDDING_CACHE_DIR`` and reused, so
+only the first load needs torch.
+"""
+
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from config.settings import settings
+
+RUNTIMES = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Same chunk size SentenceTransformer.encode uses by default
+ENCODE_BATCH_SIZE = 32
+
+
+class TorchRuntime:
+    """SentenceTransformer on CPU, optionally with int8 dynamic quantization."""
+    
+    def __init__(self, model_name: str, quantize: bool = False, threads: Optional[int] = None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if quantize:
+            torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=ENCODE_BATCH_SIZE), dtype=np.float32)
+
+
+def _export_dir(model_name: str) -> str:
+    return os.path.join(settings.EMBEDDING_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str) -> str:
+    """Export the model's transformer, tokenizer and pooling config.
+    
+    Returns:
+        Directory holding ``model.onnx``, the tokenizer and ``pooling.json``
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    path = _export_dir(model_name)
+    os.makedirs(path, exist_ok=True)
+    
+    reference = SentenceTransformer(model_name, device="cpu")
+    transformer = reference[0]
+    pooling = reference[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError(f"{model_name} does not use mean pooling; only the torch runtime supports it")
+    
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids)[0]
+    
+    dummy = reference.tokenizer(["warm-up"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer.auto_model).eval(),
+            tuple(dummy[name] for name in input_names),
+            os.path.join(path, "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    
+    reference.tokenizer.save_pretrained(path)
+    with open(os.path.join(path, "pooling.json"), "w") as f:
+        json.dump({
+            'max_seq_length': reference.max_seq_length,
+            'normalize': any(type(module).__name__ == "Normalize" for module in reference)
+        }, f)
+    return path
+
+
+def quantize_onnx(model_name: str) -> str:
+    """Write ``model-int8.onnx`` next to the float export; returns its path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    path = _export_dir(model_name)
+    if not os.path.exists(os.path.join(path, "model.onnx")):
+        export_onnx(model_name)
+    
+    quantized = os.path.join(path, "model-int8.onnx")
+    quantize_dynamic(os.path.join(path, "model.onnx"), quantized, weight_type=QuantType.QInt8)
+    return quantized
+
+
+class OnnxRuntime:
+    """The exported transformer on onnxruntime with mean pooling in numpy."""
+    
+    def __init__(self, model_name: str, quantize: bool = False, threads: Optional[int] = None):
+        import onnxruntime
+        from transformers import AutoTokenizer
+        
+        path = _export_dir(model_name)
+        model_file = os.path.join(path, "model-int8.onnx" if quantize else "model.onnx")
+        if not os.path.exists(model_file):
+            if quantize:
+                quantize_onnx(model_name)
+            else:
+                export_onnx(model_name)
+        
+        with open(os.path.join(path, "pooling.json")) as f:
+            pooling = json.load(f)
+        self.max_seq_length = pooling['max_seq_length']
+        self.normalize = pooling['normalize']
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        hidden = self.session.run(None, {name: tokens[name].astype(np.int64) for name in self.input_names})[0]
+        
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.concatenate([
+            self._encode_batch(texts[i:i + ENCODE_BATCH_SIZE])
+            for i in range(0, len(texts), ENCODE_BATCH_SIZE)
+        ])
+
+
+def load_runtime(name: str, model_name: str, threads: Optional[int] = None):
+    """Load ``model_name`` on the named runtime (see ``RUNTIMES``)."""
+    if name == "torch":
+        return TorchRuntime(model_name, threads=threads)
+    if name == "torch-int8":
+        return TorchRuntime(model_name, quantize=True, threads=threads)
+    if name == "onnx":
+        return OnnxRuntime(model_name, threads=threads)
+    if name == "onnx-int8":
+        return OnnxRuntime(model_name, quantize=True, threads=threads)
+    raise ValueError(f"Unknown embedding runtime: {name}")
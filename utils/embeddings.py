@@ -0,0 +1,336 @@
+"""Shared embedding inference with dynamic micro-batching.
+
+Every caller (retrieval, ingestion) goes through ``embedding_service``,
+which collects concurrent ``encode`` requests for a few milliseconds and
+runs them as one batch on the ``EMBEDDING_RUNTIME`` model (see
+``utils.embedding_runtimes``). Where the batch runs is configurable:
+
+- ``inline``: in a background thread of this process (one model copy)
+- ``pool``: in a process pool, one model copy per worker, each worker
+  pinned to its own group of cores; vectors come back via shared memory
+- ``socket``: in a sidecar started with ``python -m utils.embeddings``,
+  shared by every process on the host over a Unix socket
+"""
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from utils.embedding_runtimes import load_runtime
+from utils.tracing import tracer
+
+
+class InlineBackend:
+    """Encode in the calling process; the model loads on first use."""
+    
+    def __init__(self, runtime: str, model_name: str):
+        self.runtime = runtime
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = load_runtime(self.runtime, self.model_name)
+        return self._model
+    
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        try:
+            future.set_result(self.model.encode(texts))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+# Per-worker state for PoolBackend
+_worker_model = None
+
+
+def _init_pool_worker(runtime: str, model_name: str, threads: int, core_groups):
+    """Load one model copy and pin this worker to a core group."""
+    global _worker_model
+    
+    try:
+        cores = core_groups.get_nowait()
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+    except Exception:
+        pass
+    
+    _worker_model = load_runtime(runtime, model_name, threads=threads)
+
+
+def _pool_encode(texts: List[str]) -> Tuple[str, Tuple[int, ...]]:
+    """Encode in a worker and hand the vectors back through shared memory.
+    
+    The segment belongs to the parent from here on: ``_read_shared``
+    unlinks it, so this process stops tracking it. Otherwise the resource
+    tracker registers it twice before Python 3.13 and unlinks it again
+    (with a leak warning) when the worker exits.
+    """
+    from multiprocessing import resource_tracker, shared_memory
+    
+    vectors = _worker_model.encode(texts)
+    shm = shared_memory.SharedMemory(create=True, size=max(vectors.nbytes, 1))
+    np.ndarray(vectors.shape, dtype=np.float32, buffer=shm.buf)[:] = vectors
+    shm.close()
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm.name, vectors.shape
+
+
+def _read_shared(name: str, shape: Tuple[int, ...]) -> np.ndarray:
+    from multiprocessing import shared_memory
+    
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+class PoolBackend:
+    """Encode in a process pool with one pinned model copy per worker."""
+    
+    def __init__(self, runtime: str, model_name: str, workers: int, threads_per_worker: int):
+        import multiprocessing
+        
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        workers = workers or max(1, len(cpus) // threads_per_worker)
+        
+        context = multiprocessing.get_context("spawn")
+        core_groups = context.Manager().Queue()
+        for i in range(workers):
+            core_groups.put(cpus[i * threads_per_worker:(i + 1) * threads_per_worker] or None)
+        
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_pool_worker,
+            initargs=(runtime, model_name, threads_per_worker, core_groups)
+        )
+    
+    def submit(self, texts: List[str]) -> Future:
+        result = Future()
+        
+        def _done(future: Future):
+            try:
+                result.set_result(_read_shared(*future.result()))
+            except Exception as e:
+                result.set_exception(e)
+        
+        self._pool.submit(_pool_encode, texts).add_done_callback(_done)
+        return result
+
+
+class MicroBatcher:
+    """Coalesce concurrent encode requests into batches.
+    
+    The first queued request opens a window of ``window_ms``; everything
+    that arrives before it closes (up to ``max_batch`` texts) is encoded
+    in one backend call and the vectors are split back per request.
+    """
+    
+    def __init__(self, submit: Callable[[List[str]], Future], window_ms: float, max_batch: int):
+        self._submit = submit
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode ``texts``; blocks until their batch has run."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self._window
+            
+            while size < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            
+            self._dispatch(batch)
+    
+    def _dispatch(self, batch: List[Tuple[List[str], Future]]):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        
+        def _split(future: Future):
+            try:
+                vectors = future.result()
+            except Exception as e:
+                for _, request_future in batch:
+                    request_future.set_exception(e)
+                return
+            
+            offset = 0
+            for request_texts, request_future in batch:
+                request_future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+        
+        try:
+            submitted = self._submit(texts)
+        except Exception as e:
+            # e.g. a broken or shut-down pool; fail this batch, keep the loop alive
+            for _, request_future in batch:
+                request_future.set_exception(e)
+            return
+        submitted.add_done_callback(_split)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("embedding socket closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+class SocketClient:
+    """Talk to the embedding sidecar over a Unix socket.
+    
+    Request: 4-byte length + JSON list of texts. Response: rows and
+    dimension as two 4-byte ints, then row-major float32 vectors. One
+    connection is kept per thread.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+    
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        payload = json.dumps(list(texts)).encode()
+        sock = self._connection()
+        try:
+            sock.sendall(struct.pack("!I", len(payload)) + payload)
+            rows, dim = struct.unpack("!II", _recv_exact(sock, 8))
+            data = _recv_exact(sock, rows * dim * 4)
+        except Exception:
+            sock.close()
+            self._local.sock = None
+            raise
+        return np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+
+
+class _SidecarHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                (size,) = struct.unpack("!I", _recv_exact(self.request, 4))
+            except ConnectionError:
+                return
+            texts = json.loads(_recv_exact(self.request, size))
+            vectors = np.ascontiguousarray(self.server.batcher.encode(texts), dtype=np.float32)
+            rows, dim = vectors.shape if vectors.ndim == 2 else (0, 0)
+            self.request.sendall(struct.pack("!II", rows, dim) + vectors.tobytes())
+
+
+class EmbeddingService:
+    """Process-wide entry point for text embeddings."""
+    
+    def __init__(self):
+        self._encode: Optional[Callable[[List[str]], np.ndarray]] = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _model_name() -> str:
+        """The knowledge snapshot's bundled model if there is one, so
+        queries match the stored vectors and nothing is downloaded."""
+        from utils.snapshot import bundled_model
+        return bundled_model() or settings.EMBEDDING_MODEL
+    
+    def _build_batcher(self, mode: str) -> MicroBatcher:
+        if mode == "pool":
+            backend = PoolBackend(
+                settings.EMBEDDING_RUNTIME,
+                self._model_name(),
+                settings.EMBEDDING_POOL_WORKERS,
+                settings.EMBEDDING_THREADS_PER_WORKER
+            )
+        else:
+            backend = InlineBackend(settings.EMBEDDING_RUNTIME, self._model_name())
+        return MicroBatcher(backend.submit, settings.EMBEDDING_BATCH_WINDOW_MS, settings.EMBEDDING_MAX_BATCH)
+    
+    def _encoder(self) -> Callable[[List[str]], np.ndarray]:
+        if self._encode is None:
+            with self._lock:
+                if self._encode is None:
+                    mode = settings.EMBEDDING_SERVICE
+                    if mode == "socket":
+                        self._encode = SocketClient(settings.EMBEDDING_SOCKET_PATH).encode
+                    elif mode in ("inline", "pool"):
+                        self._encode = self._build_batcher(mode).encode
+                    else:
+                        raise ValueError(f"Unknown embedding service: {mode}")
+        return self._encode
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` as a (len(texts), dim) float32 array."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        with tracer.span("embedding.encode", texts=len(texts)):
+            return self._encoder()(texts)
+    
+    def serve(self, path: str, mode: str = "pool"):
+        """Run the Unix-socket sidecar until interrupted."""
+        if os.path.exists(path):
+            os.unlink(path)
+        
+        server = socketserver.ThreadingUnixStreamServer(path, _SidecarHandler)
+        server.daemon_threads = True
+        server.batcher = self._build_batcher(mode)
+        print(f"Embedding sidecar ({mode}) listening on {path}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(path)
+
+
+embedding_service = EmbeddingService()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the shared embedding sidecar.")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--mode", choices=["inline", "pool"], default="pool", help="where batches run")
+    args = parser.parse_args()
+    
+    embedding_service.serve(args.socket, args.mode)
@@ -0,0 +1,360 @@
+"""Live data: cached career-page fetching and web search.
+
+Pages are fetched concurrently over a pooled ``httpx`` client, revalidated
+with ETag / Last-Modified, and stored in a content-addressed disk cache:
+bodies live under ``objects/<sha256>`` so identical pages are stored once,
+and ``urls/<sha256 of url>.json`` records the validators and body hash for
+each URL. Requests to one host are limited in concurrency, spaced by a
+minimum delay and checked against its robots.txt.
+
+Fetched pages are reduced to plain text and can be ingested straight into
+the knowledge base:
+
+    python -m utils.fetcher https://www.boeing.co.in/careers --category careers
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from config.settings import settings
+
+USER_AGENT = f"BoeingIndiaCareerBot/{settings.APP_VERSION}"
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    """Outcome of fetching one URL."""
+    url: str
+    status: int
+    title: str = ""
+    text: str = ""
+    content_hash: str = ""
+    from_cache: bool = False
+    error: Optional[str] = None
+
+
+def html_to_text(html: str) -> Dict[str, str]:
+    """Extract the title and readable text of an HTML page.
+    
+    Returns:
+        Dict with ``title`` and ``text``; scripts, styles and page chrome
+        (nav, header, footer, forms) are dropped
+    """
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript", "template", "svg", "nav", "header", "footer", "form"]):
+        tag.decompose()
+    
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    root = soup.find("main") or soup.body or soup
+    lines = (line.strip() for line in root.get_text(separator="\n").splitlines())
+    text = "\n".join(line for line in lines if line)
+    return {'title': title, 'text': re.sub(r"[ \t]+", " ", text)}
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """Split text into chunks of whole lines, each at most ``max_chars`` long."""
+    chunks, current = [], ""
+    for line in text.splitlines():
+        while len(line) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class FetchCache:
+    """Content-addressed on-disk cache of response bodies and validators."""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, "urls", hashlib.sha256(key.encode()).hexdigest() + ".json")
+    
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash[:2], content_hash)
+    
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    
+    def get_entry(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def get_body(self, content_hash: str) -> Optional[bytes]:
+        try:
+            with open(self._object_path(content_hash), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def put(self, key: str, body: bytes, **validators) -> Dict:
+        """Store ``body`` (once per distinct content) and the entry for ``key``."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, body)
+        
+        entry = {'key': key, 'content_hash': content_hash, 'fetched_at': time.time(), **validators}
+        self._write_atomic(self._entry_path(key), json.dumps(entry).encode())
+        return entry
+    
+    def touch(self, key: str, entry: Dict) -> Dict:
+        """Mark a revalidated entry as fresh."""
+        entry = {**entry, 'fetched_at': time.time()}
+        self._write_atomic(self._entry_path(key), json.dumps(entry).encode())
+        return entry
+
+
+class _HostGate:
+    """Per-host concurrency limit and minimum spacing between requests."""
+    
+    def __init__(self, concurrency: int, delay: float):
+        self._semaphore = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self._delay = delay
+        self._next_at = 0.0
+    
+    def __enter__(self):
+        self._semaphore.acquire()
+        with self._lock:
+            wait = self._next_at - time.monotonic()
+            self._next_at = max(self._next_at, time.monotonic()) + self._delay
+        if wait > 0:
+            time.sleep(wait)
+        return self
+    
+    def __exit__(self, *exc):
+        self._semaphore.release()
+
+
+class LiveFetcher:
+    """Polite, cached fetching of web pages and LangSearch results."""
+    
+    def __init__(self, cache_dir: Optional[str] = None, client: Optional[httpx.Client] = None):
+        self.cache = FetchCache(cache_dir or settings.FETCH_CACHE_DIR)
+        self.client = client or httpx.Client(
+            headers={"User-Agent": USER_AGENT},
+            timeout=settings.FETCH_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=settings.FETCH_MAX_WORKERS,
+                max_keepalive_connections=settings.FETCH_MAX_WORKERS
+            )
+        )
+        self._gates: Dict[str, _HostGate] = {}
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._lock = threading.Lock()
+    
+    def _gate(self, host: str) -> _HostGate:
+        with self._lock:
+            if host not in self._gates:
+                self._gates[host] = _HostGate(settings.FETCH_PER_HOST_CONCURRENCY, settings.FETCH_PER_HOST_DELAY)
+            return self._gates[host]
+    
+    def _allowed(self, url: str) -> bool:
+        """Check robots.txt, fetched once per host; unreachable robots allow all."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        
+        with self._lock:
+            known = origin in self._robots
+        if not known:
+            parser = None
+            try:
+                with self._gate(parts.netloc):
+                    response = self.client.get(f"{origin}/robots.txt")
+                if response.status_code == 200:
+                    parser = RobotFileParser()
+                    parser.parse(response.text.splitlines())
+            except httpx.HTTPError:
+                pass
+            with self._lock:
+                self._robots[origin] = parser
+        
+        parser = self._robots[origin]
+        return parser is None or parser.can_fetch(USER_AGENT, url)
+    
+    def _result(self, url: str, status: int, entry: Dict, body: bytes, from_cache: bool) -> FetchResult:
+        page = html_to_text(body.decode(entry.get('encoding') or "utf-8", errors="replace"))
+        return FetchResult(
+            url=url,
+            status=status,
+            title=page['title'],
+            text=page['text'],
+            content_hash=entry['content_hash'],
+            from_cache=from_cache
+        )
+    
+    def fetch(self, url: str) -> FetchResult:
+        """Fetch one page, serving or revalidating the cached copy when possible."""
+        entry = self.cache.get_entry(url)
+        body = self.cache.get_body(entry['content_hash']) if entry else None
+        if body is None:
+            entry = None
+        elif time.time() - entry['fetched_at'] < settings.FETCH_MIN_REFRESH_SECONDS:
+            return self._result(url, 200, entry, body, from_cache=True)
+        
+        if not self._allowed(url):
+            return FetchResult(url=url, status=0, error="Disallowed by robots.txt")
+        
+        headers = {}
+        if entry and entry.get('etag'):
+            headers["If-None-Match"] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers["If-Modified-Since"] = entry['last_modified']
+        
+        try:
+            with self._gate(urlsplit(url).netloc):
+                response = self.client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            if entry:
+                return self._result(url, 200, entry, body, from_cache=True)
+            return FetchResult(url=url, status=0, error=str(e))
+        
+        if response.status_code == 304 and entry:
+            return self._result(url, 304, self.cache.touch(url, entry), body, from_cache=True)
+        if response.status_code != 200:
+            return FetchResult(url=url, status=response.status_code, error=f"HTTP {response.status_code}")
+        
+        entry = self.cache.put(
+            url,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            encoding=response.encoding
+        )
+        return self._result(url, 200, entry, response.content, from_cache=False)
+    
+    def fetch_many(self, urls: List[str]) -> List[FetchResult]:
+        """Fetch pages concurrently; results are in the order of ``urls``."""
+        with ThreadPoolExecutor(max_workers=settings.FETCH_MAX_WORKERS) as executor:
+            return list(executor.map(self.fetch, urls))
+    
+    def search(self, query: str, count: int = 5) -> List[Dict]:
+        """Web search through LangSearch, cached for ``FETCH_MIN_REFRESH_SECONDS``.
+        
+        Returns:
+            Results as dicts with ``title``, ``url`` and ``snippet``; empty
+            when no API key is configured or the request fails
+        """
+        if not settings.LANGSEARCH_API_KEY:
+            return []
+        
+        key = f"search:{count}:{' '.join(query.lower().split())}"
+        entry = self.cache.get_entry(key)
+        if entry and time.time() - entry['fetched_at'] < settings.FETCH_MIN_REFRESH_SECONDS:
+            body = self.cache.get_body(entry['content_hash'])
+            if body is not None:
+                return json.loads(body)
+        
+        try:
+            with self._gate(urlsplit(settings.LANGSEARCH_URL).netloc):
+                response = self.client.post(
+                    settings.LANGSEARCH_URL,
+                    headers={"Authorization": f"Bearer {settings.LANGSEARCH_API_KEY}"},
+                    json={"query": query, "count": count, "summary": True}
+                )
+            response.raise_for_status()
+            pages = response.json().get("data", {}).get("webPages", {}).get("value", [])
+        except (httpx.HTTPError, ValueError):
+            return []
+        
+        results = [
+            {'title': page.get("name", ""), 'url': page.get("url", ""), 'snippet': page.get("summary") or page.get("snippet", "")}
+            for page in pages
+        ]
+        self.cache.put(key, json.dumps(results).encode())
+        return results
+    
+    def ingest(self, urls: List[str], category: str) -> Dict[str, int]:
+        """Fetch pages and add new or changed ones to the knowledge base.
+        
+        Each page is stored as text chunks with its URL as ``source``; a page
+        whose content hash is unchanged since the last ingest is skipped, and
+        a changed page replaces its earlier chunks.
+        
+        Returns:
+            Counts of ``added``, ``unchanged`` and ``failed`` pages
+        """
+        from models.database import KnowledgeBase
+        from utils.database import get_db
+        from utils.knowledge import retriever
+        
+        counts = {'added': 0, 'unchanged': 0, 'failed': 0}
+        for result in self.fetch_many(urls):
+            if result.error or not result.text:
+                counts['failed'] += 1
+                continue
+            
+            with get_db() as db:
+                existing = db.query(KnowledgeBase.id, KnowledgeBase.kb_metadata) \
+                    .filter(KnowledgeBase.source == result.url) \
+                    .all()
+            if existing and all((meta or {}).get('content_hash') == result.content_hash for _, meta in existing):
+                counts['unchanged'] += 1
+                continue
+            
+            retriever.remove_knowledge([kb_id for kb_id, _ in existing])
+            chunks = chunk_text(result.text, settings.FETCH_CHUNK_CHARS)
+            retriever.add_knowledge_batch([
+                {
+                    "title": result.title if len(chunks) == 1 else f"{result.title} ({i + 1}/{len(chunks)})",
+                    "content": chunk,
+                    "source": result.url,
+                    "category": category,
+                    "kb_metadata": {"content_hash": result.content_hash, "fetched": True}
+                }
+                for i, chunk in enumerate(chunks)
+            ])
+            counts['added'] += 1
+        return counts
+
+
+fetcher = LiveFetcher()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Fetch pages and ingest them into the knowledge base.")
+    parser.add_argument("urls", nargs="*", default=settings.CAREER_PAGE_URLS, help="pages to fetch")
+    parser.add_argument("--category", default="live", help="knowledge category for the pages")
+    parser.add_argument("--dry-run", action="store_true", help="fetch and print, without ingesting")
+    args = parser.parse_args()
+    
+    if args.dry_run:
+        for result in fetcher.fetch_many(args.urls):
+            state = f"✗ {result.error}" if result.error else ("✓ cached" if result.from_cache else "✓ fetched")
+            print(f"{state}  {result.url}  {result.title!r}  {len(result.text)} chars")
+    else:
+        print(fetcher.ingest(args.urls, args.category))
@@ -1,109 +1,272 @@
 """Knowledge base and retrieval system using embeddings."""
 
 from typing import List, Optional, Dict
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from sentence_transformers import SentenceTransformer
+import threading
 import streamlit as st
+from sqlalchemy import func
 
 from models.database import KnowledgeBase
-from utils.database import get_db
+from utils.database import get_db, startup_lock, upsert
+from utils.embeddings import embedding_service
+from utils.rerank import reranker
+from config.settings import settings
+from utils.tracing import tracer
 
 
 class KnowledgeRetriever:
-    """Retrieve relevant context from knowledge base using embeddings."""
+    """Retrieve relevant context from knowledge base using embeddings.
+    
+    Embeddings come from the shared ``embedding_service``, and ``chromadb``
+    is only imported the first time the collection is used, so importing
+    this module stays cheap for pages that never retrieve. With
+    ``KNOWLEDGE_SNAPSHOT_PATH`` set, a prebuilt read-only snapshot (see
+    ``utils.snapshot``) is memory-mapped instead, and ``VECTOR_INDEX=ivfpq``
+    swaps ChromaDB for the approximate index in ``utils.ann``.
+    """
     
     def __init__(self):
-        """Initialize knowledge retriever with ChromaDB and embeddings."""
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        """Initialize knowledge retriever; ChromaDB loads on first use."""
+        self._collection = None
+        self._collection_loaded = False
+        self._collection_lock = threading.Lock()
+    
+    @property
+    def collection(self):
+        """The vector collection, or None if it could not be opened."""
+        if not self._collection_loaded:
+            with self._collection_lock:
+                if not self._collection_loaded:
+                    self._collection = self._open_collection()
+                    self._collection_loaded = True
+        return self._collection
+    
+    @property
+    def snapshot_active(self) -> bool:
+        """Whether queries are served from a prebuilt snapshot."""
+        from utils.snapshot import SnapshotCollection
+        return isinstance(self.collection, SnapshotCollection)
+    
+    def _open_collection(self):
+        if settings.KNOWLEDGE_SNAPSHOT_PATH:
+            from utils.snapshot import SnapshotCollection, SnapshotError
+            try:
+                return SnapshotCollection(
+                    settings.KNOWLEDGE_SNAPSHOT_PATH,
+                    verify_checksums=settings.KNOWLEDGE_SNAPSHOT_VERIFY
+                )
+            except SnapshotError as e:
+                st.warning(f"Knowledge snapshot unavailable, falling back to ChromaDB: {str(e)}")
+        
+        if settings.VECTOR_INDEX == "ivfpq":
+            from utils.ann import IVFPQCollection
+            return IVFPQCollection(settings.ANN_INDEX_DIR)
+        
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
         
         # Initialize ChromaDB
         self.chroma_client = chromadb.Client(ChromaSettings(
             anonymized_telemetry=False,
             is_persistent=True,
-            persist_directory="./chroma_db"
+            persist_directory=settings.CHROMA_PERSIST_DIR
         ))
         
         # Get or create collection
         try:
-            self.collection = self.chroma_client.get_or_create_collection(
+            return self.chroma_client.get_or_create_collection(
                 name="boeing_india_knowledge",
                 metadata={"description": "Boeing India career information"}
             )
         except Exception as e:
             st.warning(f"ChromaDB initialization: {str(e)}")
-            self.collection = None
+            return None
     
     def add_knowledge(self, title: str, content: str, source: str, category: str, kb_metadata: Optional[Dict] = None):
         """Add knowledge to the database and vector store."""
-        # Save to PostgreSQL
+        self.add_knowledge_batch([{
+            "title": title,
+            "content": content,
+            "source": source,
+            "category": category,
+            "kb_metadata": kb_metadata
+        }])
+    
+    def add_knowledge_batch(self, items: List[Dict]):
+        """Add several entries, embedding them in a single batch.
+        
+        Args:
+            items: Dicts with ``title``, ``content``, ``source``, ``category``
+                and optionally ``kb_metadata``
+        """
+        if not items:
+            return
+        self._require_writable()
+        
+        kb_entries = self._save_entries(items)
+        
+        # Rows whose embedding fails here are picked up by the next reindex()
+        if self.collection:
+            self._index_entries(kb_entries)
+    
+    def _index_entries(self, kb_entries: List[KnowledgeBase]):
+        """Embed saved entries and add them to the vector store."""
+        embeddings = embedding_service.encode([entry.content for entry in kb_entries])
+        self.collection.add(
+            embeddings=embeddings.tolist(),
+            documents=[entry.content for entry in kb_entries],
+            metadatas=[{
+                "id": entry.id,
+                "title": entry.title,
+                "source": entry.source,
+                "category": entry.category
+            } for entry in kb_entries],
+            ids=[str(entry.id) for entry in kb_entries]
+        )
+    
+    def reindex(self, batch_size: int = 1000) -> int:
+        """Embed knowledge base rows that are missing from the vector store.
+        
+        Covers a fresh or wiped store next to a persisted database, and rows
+        whose embedding failed after they were committed. Only runs the
+        per-id comparison when the store holds fewer entries than the table.
+        
+        Returns:
+            Number of entries indexed
+        """
+        if self.collection is None:
+            raise RuntimeError("The vector store could not be opened")
+        if self.snapshot_active:
+            return 0
+        
         with get_db() as db:
-            kb_entry = KnowledgeBase(
-                title=title,
-                content=content,
-                source=source,
-                category=category,
-                kb_metadata=kb_metadata or {}
+            total = db.query(KnowledgeBase).count()
+        if self.collection.count() >= total:
+            return 0
+        
+        indexed, last_id = 0, 0
+        while True:
+            with get_db() as db:
+                batch = db.query(KnowledgeBase)\
+                    .filter(KnowledgeBase.id > last_id)\
+                    .order_by(KnowledgeBase.id)\
+                    .limit(batch_size)\
+                    .all()
+            if not batch:
+                return indexed
+            last_id = batch[-1].id
+            
+            present = set(self.collection.get(ids=[str(entry.id) for entry in batch], include=[])['ids'])
+            missing = [entry for entry in batch if str(entry.id) not in present]
+            if missing:
+                self._index_entries(missing)
+                indexed += len(missing)
+    
+    def _require_writable(self):
+        """Refuse writes that a read-only snapshot would silently drop."""
+        if self.snapshot_active:
+            from utils.snapshot import SnapshotError
+            raise SnapshotError(
+                "The knowledge snapshot is read-only; unset KNOWLEDGE_SNAPSHOT_PATH to add or "
+                "remove knowledge, then rebuild the snapshot with build_snapshot.py"
             )
-            db.add(kb_entry)
+    
+    def _save_entries(self, items: List[Dict]) -> List[KnowledgeBase]:
+        """Insert entries into the knowledge_base table only."""
+        with get_db() as db:
+            kb_entries = [
+                KnowledgeBase(
+                    title=item["title"],
+                    content=item["content"],
+                    source=item["source"],
+                    category=item["category"],
+                    kb_metadata=item.get("kb_metadata") or {}
+                )
+                for item in items
+            ]
+            db.add_all(kb_entries)
             db.commit()
-            db.refresh(kb_entry)
-            
-            # Add to ChromaDB if available
-            if self.collection:
-                try:
-                    embedding = self.embedding_model.encode([content])[0]
-                    self.collection.add(
-                        embeddings=[embedding.tolist()],
-                        documents=[content],
-                        metadatas=[{
-                            "id": kb_entry.id,
-                            "title": title,
-                            "source": source,
-                            "category": category
-                        }],
-                        ids=[str(kb_entry.id)]
-                    )
-                except Exception as e:
-                    st.warning(f"ChromaDB add error: {str(e)}")
-    
-    def retrieve_context(self, query: str, top_k: int = 3) -> str:
-        """Retrieve relevant context for a query.
+        return kb_entries
+    
+    def remove_knowledge(self, kb_ids: List[int]):
+        """Delete entries from the database and vector store."""
+        if not kb_ids:
+            return
+        self._require_writable()
+        
+        with get_db() as db:
+            db.query(KnowledgeBase).filter(KnowledgeBase.id.in_(kb_ids)).delete(synchronize_session=False)
+        
+        if self.collection:
+            try:
+                self.collection.delete(ids=[str(kb_id) for kb_id in kb_ids])
+            except Exception as e:
+                st.warning(f"ChromaDB delete error: {str(e)}")
+    
+    def retrieve(self, query: str, top_k: int = 3, query_embedding=None) -> List[Dict]:
+        """Ranked knowledge chunks for a query, best first.
         
         Args:
             query: User's question or query
-            top_k: Number of top results to retrieve
-            
+            top_k: Number of top results to return
+            query_embedding: Precomputed embedding of ``query``, e.g. from one
+                batched ``embedding_service.encode`` call over many queries
+        
         Returns:
-            Formatted context string
+            Dicts with the chunk ``id``, its ``document`` text and ``metadata``
         """
         if not self.collection:
-            return ""
-            
-        try:
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode([query])[0]
-            
-            # Search for similar documents
+            return []
+        
+        # Generate query embedding
+        if query_embedding is None:
+            query_embedding = embedding_service.encode([query])[0]
+        
+        # Search for similar documents, over-fetching when reranking
+        n_results = top_k * settings.RERANK_OVERFETCH if settings.RERANK_ENABLED else top_k
+        with tracer.span("vector.query", n_results=n_results):
             results = self.collection.query(
                 query_embeddings=[query_embedding.tolist()],
-                n_results=top_k
+                n_results=n_results
             )
+        
+        if not results['documents'] or not results['documents'][0]:
+            return []
+        
+        candidates = [
+            {'id': chunk_id, 'document': doc, 'metadata': metadata}
+            for chunk_id, doc, metadata in zip(results['ids'][0], results['documents'][0], results['metadatas'][0])
+        ]
+        if settings.RERANK_ENABLED:
+            with tracer.span("rerank", candidates=len(candidates)):
+                candidates = reranker.rerank(query, candidates, top_k)
+        return candidates[:top_k]
+    
+    @tracer.traced("retrieval")
+    def retrieve_context(self, query: str, top_k: int = 3, query_embedding=None) -> str:
+        """Retrieve relevant context for a query.
+        
+        Args:
+            query: User's question or query
+            top_k: Number of top results to retrieve
+            query_embedding: Optional precomputed embedding, as for ``retrieve``
             
-            if not results['documents'] or not results['documents'][0]:
-                return ""
-            
-            # Format context
-            context_parts = []
-            for i, (doc, metadata) in enumerate(zip(results['documents'][0], results['metadatas'][0])):
-                context_parts.append(f"Source {i+1} ({metadata.get('category', 'general')}): {doc}")
-            
-            return "\n\n".join(context_parts)
-            
+        Returns:
+            Formatted context string
+        """
+        try:
+            return self.format_context(self.retrieve(query, top_k, query_embedding))
         except Exception as e:
             st.warning(f"Context retrieval error: {str(e)}")
             return ""
     
+    def format_context(self, candidates: List[Dict]) -> str:
+        """Format retrieved chunks as the numbered sources the prompt expects."""
+        context_parts = []
+        for i, candidate in enumerate(candidates):
+            context_parts.append(f"Source {i+1} ({candidate['metadata'].get('category', 'general')}): {candidate['document']}")
+        
+        return "\n\n".join(context_parts)
+    
     def initialize_knowledge_base(self):
         """Initialize knowledge base with Boeing India information."""
         boeing_knowledge = [
@@ -207,13 +370,30 @@ These projects demonstrate relevant technical skills and aerospace interest.""",
             }
         ]
         
-        # Add all knowledge to the database
-        for item in boeing_knowledge:
-            try:
-                self.add_knowledge(**item)
-            except Exception as e:
-                # Skip if already exists
-                pass
+        # Every worker process seeds at startup: the lock makes the others wait
+        # for the first, and the unique seed_key makes repeated inserts no-ops
+        with startup_lock("knowledge_base"):
+            with get_db() as db:
+                # Entries seeded before seed_key existed: adopt the oldest row per title
+                claimed = {key for (key,) in db.query(KnowledgeBase.seed_key).filter(KnowledgeBase.seed_key.isnot(None))}
+                legacy = db.query(func.min(KnowledgeBase.id), KnowledgeBase.title)\
+                    .filter(
+                        KnowledgeBase.seed_key.is_(None),
+                        KnowledgeBase.title.in_([item["title"] for item in boeing_knowledge if item["title"] not in claimed])
+                    )\
+                    .group_by(KnowledgeBase.title)\
+                    .all()
+                for kb_id, title in legacy:
+                    db.query(KnowledgeBase).filter(KnowledgeBase.id == kb_id).update({'seed_key': title})
+        
+                for item in boeing_knowledge:
+                    upsert(db, KnowledgeBase, {**item, 'seed_key': item["title"], 'kb_metadata': {}}, index_elements=['seed_key'])
+                db.commit()
+        
+            # A prebuilt snapshot already holds the vectors; otherwise embed every
+            # row the store lacks, including ones seeded on an earlier start.
+            # Errors propagate so they show up in the startup report.
+            self.reindex()
 
 
 retriever = KnowledgeRetriever()
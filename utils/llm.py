@@ -1,10 +1,12 @@
 """LLM integration with Google Gemini API."""
 
-import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
+import threading
 import streamlit as st
 
 from config.settings import settings
+from utils.session_state import MessageRecord
+from utils.tracing import tracer
 
 
 class GeminiChatbot:
@@ -39,67 +41,153 @@ Target audience: Engineering students in India interested in Boeing India career
 Always be helpful, accurate, and encouraging!"""
     
     def __init__(self):
-        """Initialize Gemini chatbot."""
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        """Initialize Gemini chatbot; the SDK is imported on first use."""
+        self._genai = None
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """The Gemini model, configured on first access."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    if settings.GEMINI_API_ENDPOINT:
+                        # e.g. the local fake_gemini.py server for load tests
+                        genai.configure(
+                            api_key=settings.GEMINI_API_KEY,
+                            transport="rest",
+                            client_options={"api_endpoint": settings.GEMINI_API_ENDPOINT}
+                        )
+                    else:
+                        genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._genai = genai
+                    self._model = genai.GenerativeModel('gemini-2.5-flash')
+        return self._model
+        
+    FALLBACK_RESPONSE = "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+    
+    def build_prompt(
+        self,
+        user_message: str,
+        conversation_history: List[MessageRecord],
+        context: Optional[str] = None
+    ) -> str:
+        """Assemble the full prompt sent to Gemini."""
+        # Build conversation context
+        prompt_parts = [self.SYSTEM_PROMPT]
+        
+        # Add knowledge base context if available
+        if context:
+            prompt_parts.append(f"\n\nRelevant Context:\n{context}\n")
+        
+        # Add conversation history (limited to recent messages)
+        if conversation_history:
+            prompt_parts.append("\n\nConversation History:")
+            for msg in conversation_history[-settings.MAX_HISTORY_MESSAGES:]:
+                role = "Student" if msg.role == "user" else "Assistant"
+                prompt_parts.append(f"{role}: {msg.content}")
         
+        # Add current user message
+        prompt_parts.append(f"\n\nStudent: {user_message}")
+        prompt_parts.append("\nAssistant:")
+        
+        return "\n".join(prompt_parts)
+    
+    def _generation_config(self):
+        return self._genai.types.GenerationConfig(
+            temperature=settings.TEMPERATURE,
+            max_output_tokens=settings.MAX_TOKENS,
+        )
+    
     def generate_response(
         self, 
         user_message: str, 
-        conversation_history: List[Dict[str, str]],
-        context: Optional[str] = None
+        conversation_history: List[MessageRecord],
+        context: Optional[str] = None,
+        usage: Optional[Dict] = None
     ) -> str:
         """Generate response using Gemini API.
         
         Args:
             user_message: The user's current message
-            conversation_history: List of previous messages [{"role": "user/assistant", "content": "..."}]
+            conversation_history: Previous messages, oldest first (``role`` is "user" or "assistant")
             context: Additional context from knowledge base
+            usage: If given, filled with ``prompt_tokens`` and ``response_tokens``
             
         Returns:
             Generated response from the model
         """
         try:
-            # Build conversation context
-            prompt_parts = [self.SYSTEM_PROMPT]
-            
-            # Add knowledge base context if available
-            if context:
-                prompt_parts.append(f"\n\nRelevant Context:\n{context}\n")
+            full_prompt = self.build_prompt(user_message, conversation_history, context)
             
-            # Add conversation history (limited to recent messages)
-            if conversation_history:
-                prompt_parts.append("\n\nConversation History:")
-                for msg in conversation_history[-settings.MAX_HISTORY_MESSAGES:]:
-                    role = "Student" if msg["role"] == "user" else "Assistant"
-                    prompt_parts.append(f"{role}: {msg['content']}")
+            model = self.model
+            with tracer.span("llm.generate", prompt_chars=len(full_prompt)):
+                response = model.generate_content(
+                    full_prompt,
+                    generation_config=self._generation_config()
+                )
             
-            # Add current user message
-            prompt_parts.append(f"\n\nStudent: {user_message}")
-            prompt_parts.append("\nAssistant:")
+            if usage is not None:
+                usage.update(self._usage(response, full_prompt))
+            return response.text
             
-            # Generate response
-            full_prompt = "\n".join(prompt_parts)
+        except Exception as e:
+            st.error(f"Error generating response: {str(e)}")
+            return self.FALLBACK_RESPONSE
+    
+    @staticmethod
+    def _usage(response, prompt: str) -> Dict:
+        """Token counts reported by Gemini, or a ~4 chars/token estimate."""
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is not None and getattr(metadata, "prompt_token_count", None):
+            return {
+                'prompt_tokens': metadata.prompt_token_count,
+                'response_tokens': metadata.candidates_token_count,
+                'estimated': False
+            }
+        return {
+            'prompt_tokens': len(prompt) // 4,
+            'response_tokens': len(response.text) // 4,
+            'estimated': True
+        }
+    
+    def generate_response_stream(
+        self,
+        user_message: str,
+        conversation_history: List[MessageRecord],
+        context: Optional[str] = None
+    ) -> Iterator[str]:
+        """Generate a response as it is produced, yielding text chunks.
+        
+        Takes the same arguments as ``generate_response``. On failure the
+        fallback apology is yielded in place of the rest of the response.
+        """
+        try:
+            full_prompt = self.build_prompt(user_message, conversation_history, context)
             
-            response = self.model.generate_content(
+            model = self.model
+            response = model.generate_content(
                 full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=settings.TEMPERATURE,
-                    max_output_tokens=settings.MAX_TOKENS,
-                )
+                generation_config=self._generation_config(),
+                stream=True
             )
             
-            return response.text
-            
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        
         except Exception as e:
             st.error(f"Error generating response: {str(e)}")
-            return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+            yield self.FALLBACK_RESPONSE
     
     def generate_conversation_title(self, first_message: str) -> str:
         """Generate a title for the conversation based on the first message."""
         try:
             prompt = f"Generate a short, descriptive title (max 50 characters) for a conversation that starts with: '{first_message[:100]}'"
-            response = self.model.generate_content(prompt)
+            with tracer.span("llm.title"):
+                response = self.model.generate_content(prompt)
             title = response.text.strip().replace('"', '').replace("'", "")
             return title[:100]  # Limit length
         except Exception:
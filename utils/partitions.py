@@ -0,0 +1,380 @@
+"""Monthly range partitions for the append-only analytics log.
+
+On PostgreSQL ``analytics`` is a native ``PARTITION BY RANGE (created_at)``
+table (see ``models.database.Analytics``) with one ``analytics_YYYY_MM``
+partition per month plus ``analytics_default`` for anything outside them,
+so the planner skips partitions outside a query's time window. SQLite has
+no partitioning: each month is a separate table with the same columns,
+writes are routed to the month's table and reads go through ``source()``,
+a ``UNION ALL`` over only the months that overlap the window.
+
+Retention drops partitions that are entirely older than the cutoff and
+deletes what is left in the boundary month in bounded batches, so no
+statement holds locks for long. Rollup tables are not touched: dashboard
+totals and daily counts keep their history after raw events are purged.
+"""
+
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, event, func, inspect, select, text, union_all
+from sqlalchemy.orm import Session
+
+from config.settings import settings
+from models.database import Analytics
+from utils.database import engine
+
+
+def month_start(value) -> date:
+    """First day of the month containing ``value``."""
+    return date(value.year, value.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _as_datetime(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+class MonthlyPartitions:
+    """Month-partitioned storage for a table keyed by ``id`` and a timestamp.
+    
+    Partition DDL normally happens in ``maintain`` (startup and the
+    maintenance CLI), which creates the current month and the next
+    ``ANALYTICS_PARTITIONS_AHEAD`` months. Writes never wait on it: on
+    PostgreSQL rows for a missing month land in the default partition, and
+    on SQLite ``insert`` creates the month's table inside the caller's
+    transaction.
+    """
+    
+    def __init__(self, table: Table, column: str = "created_at"):
+        self.table = table
+        self.column = column
+        self.native = engine.dialect.name == "postgresql"
+        self.default_name = f"{table.name}_default"
+        self._pattern = re.compile(rf"^{table.name}_(\d{{4}})_(\d{{2}})$")
+        self._metadata = MetaData()
+        self._tables: Dict[date, Table] = {}
+        self._known: Optional[Set[date]] = None
+        self._seeded: Set[date] = set()  # SQLite months whose id sequence is set
+        self._lock = threading.RLock()
+    
+    def name(self, month: date) -> str:
+        return f"{self.table.name}_{month.year:04d}_{month.month:02d}"
+    
+    def months(self, refresh: bool = False) -> List[date]:
+        """Months that have a partition, oldest first."""
+        with self._lock:
+            if self._known is None or refresh:
+                self._known = set()
+                for name in inspect(engine).get_table_names():
+                    match = self._pattern.match(name)
+                    if match:
+                        self._known.add(date(int(match.group(1)), int(match.group(2)), 1))
+            return sorted(self._known)
+    
+    def _month_table(self, month: date) -> Table:
+        """SQLite: the table holding ``month``'s rows."""
+        table = self._tables.get(month)
+        if table is None:
+            name = self.name(month)
+            columns = [
+                Column(c.name, c.type, primary_key=c.name == "id", nullable=c.nullable)
+                for c in self.table.columns
+            ]
+            table = Table(name, self._metadata, *columns, sqlite_autoincrement=True)
+            Index(f"ix_{name}_{self.column}", table.c[self.column])
+            self._tables[month] = table
+        return table
+    
+    def _create(self, conn, month: date):
+        """Create ``month``'s partition on ``conn`` if it does not exist."""
+        name = self.name(month)
+        if self.native:
+            lower, upper = month.isoformat(), next_month(month).isoformat()
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {self.default_name} PARTITION OF {self.table.name} DEFAULT"))
+            pending = conn.execute(text(
+                f"SELECT 1 FROM {self.default_name} "
+                f"WHERE {self.column} >= '{lower}' AND {self.column} < '{upper}' LIMIT 1"
+            )).first()
+            if pending is None:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table.name} "
+                    f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                ))
+                return
+            # Rows for this month already sit in the default partition, which
+            # would make the new bounds overlap; move them across.
+            conn.execute(text(f"ALTER TABLE {self.table.name} DETACH PARTITION {self.default_name}"))
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {self.table.name} "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            ))
+            conn.execute(text(
+                f"INSERT INTO {name} SELECT * FROM {self.default_name} "
+                f"WHERE {self.column} >= '{lower}' AND {self.column} < '{upper}'"
+            ))
+            conn.execute(text(
+                f"DELETE FROM {self.default_name} "
+                f"WHERE {self.column} >= '{lower}' AND {self.column} < '{upper}'"
+            ))
+            conn.execute(text(f"ALTER TABLE {self.table.name} ATTACH PARTITION {self.default_name} DEFAULT"))
+        else:
+            self._month_table(month).create(conn, checkfirst=True)
+    
+    def _seed_ids(self, conn, month: date):
+        """SQLite: start ``month``'s ids after every id issued so far.
+        
+        Runs in the transaction of the month's first write rather than at
+        creation, so months created ahead by ``maintain`` do not all start
+        from the same value and overlap. A month with rows already has its
+        ``sqlite_sequence`` entry, which makes this a no-op.
+        """
+        conn.execute(text(
+            "INSERT INTO sqlite_sequence (name, seq) "
+            "SELECT :name, MAX("
+            "(SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name LIKE :others ESCAPE '\\'), "
+            f"(SELECT COALESCE(MAX(id), 0) FROM {self.table.name})) "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+        ), {'name': self.name(month), 'others': f"{self.table.name}\\_%"})
+    
+    def ensure(self, month: date):
+        """Create the partition for ``month`` in its own transaction."""
+        month = month_start(month)
+        with self._lock:
+            if month in self.months():
+                return
+            with engine.begin() as conn:
+                self._create(conn, month)
+            self._known.add(month)
+    
+    def ensure_range(self, since, until):
+        """Create partitions for every month from ``since`` through ``until``."""
+        month = month_start(since)
+        while month <= month_start(until):
+            self.ensure(month)
+            month = next_month(month)
+    
+    def maintain(self, ahead: int = settings.ANALYTICS_PARTITIONS_AHEAD):
+        """Create partitions for the current and upcoming months."""
+        this_month = month_start(datetime.utcnow())
+        until = this_month
+        for _ in range(ahead):
+            until = next_month(until)
+        self.ensure_range(this_month, until)
+    
+    def table_for(self, timestamp: datetime) -> Table:
+        """The table new rows with ``timestamp`` are written to."""
+        return self.table if self.native else self._month_table(month_start(timestamp))
+    
+    def insert(self, db: Session, values: Dict):
+        """Insert one row into the partition for its timestamp, within ``db``'s transaction."""
+        month = month_start(values[self.column])
+        if not self.native and month not in self._seeded:
+            if month not in self.months():
+                self._create(db.connection(), month)
+                event.listen(db, "after_commit", lambda session: self._known.add(month), once=True)
+            self._seed_ids(db.connection(), month)
+            event.listen(db, "after_commit", lambda session: self._seeded.add(month), once=True)
+        return db.execute(self.table_for(values[self.column]).insert().values(**values))
+    
+    def source(self, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        """A selectable over every row, to be filtered on ``[since, until)``.
+        
+        PostgreSQL prunes partitions itself, so this is the parent table.
+        On SQLite it unions only the month tables overlapping the window,
+        plus any rows still in the unpartitioned base table.
+        """
+        if self.native:
+            return self.table
+        
+        selects = [select(self.table)]
+        for month in self.months():
+            if since is not None and _as_datetime(next_month(month)) <= since:
+                continue
+            if until is not None and _as_datetime(month) >= until:
+                continue
+            selects.append(select(self._month_table(month)))
+        if len(selects) == 1:
+            return self.table
+        return union_all(*selects).subquery(self.table.name)
+    
+    def max_id(self) -> int:
+        """Highest id across all partitions."""
+        events = self.source()
+        with engine.connect() as conn:
+            return conn.execute(select(func.coalesce(func.max(events.c.id), 0))).scalar()
+    
+    def _delete_batches(self, table: Table, before: datetime, batch_size: int, pause: float) -> int:
+        timestamp = table.c[self.column]
+        deleted = 0
+        while True:
+            batch = select(table.c.id).where(timestamp < before).limit(batch_size).scalar_subquery()
+            with engine.begin() as conn:
+                count = conn.execute(delete(table).where(timestamp < before, table.c.id.in_(batch))).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+            if pause:
+                time.sleep(pause)
+    
+    def purge(
+        self,
+        before: datetime,
+        batch_size: int = settings.ANALYTICS_PURGE_BATCH_SIZE,
+        pause: float = 0.0,
+        log: Callable[[str], None] = lambda message: None
+    ) -> Dict:
+        """Remove rows older than ``before``.
+        
+        Whole partitions below the cutoff are dropped; the rest is deleted
+        ``batch_size`` rows per transaction, sleeping ``pause`` seconds
+        between batches.
+        
+        Returns:
+            ``dropped`` partition names and the number of ``deleted`` rows
+        """
+        dropped = []
+        for month in self.months(refresh=True):
+            if _as_datetime(next_month(month)) > before:
+                continue
+            with self._lock, engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {self.name(month)}"))
+                self._known.discard(month)
+                self._tables.pop(month, None)
+            dropped.append(self.name(month))
+            log(f"dropped {self.name(month)}")
+        
+        # The boundary month, the base table and (PostgreSQL) the default partition
+        if self.native:
+            targets = [self.table]
+        else:
+            targets = [self.table] + [
+                self._month_table(month) for month in self.months() if _as_datetime(month) < before
+            ]
+        deleted = 0
+        for table in targets:
+            count = self._delete_batches(table, before, batch_size, pause)
+            if count:
+                log(f"deleted {count} rows from {table.name}")
+            deleted += count
+        return {'dropped': dropped, 'deleted': deleted}
+    
+    def apply_retention(self, days: int = settings.ANALYTICS_RETENTION_DAYS) -> Optional[Dict]:
+        """Purge rows older than ``days``; 0 keeps everything."""
+        if days <= 0:
+            return None
+        return self.purge(datetime.utcnow() - timedelta(days=days))
+    
+    def migrate(self, batch_size: int = settings.ANALYTICS_PURGE_BATCH_SIZE, log: Callable[[str], None] = print):
+        """Move rows from an unpartitioned ``analytics`` table into partitions.
+        
+        Needed once for databases created before partitioning. On
+        PostgreSQL the old table is renamed aside, the partitioned parent is
+        created in its place and rows are copied one month per transaction.
+        On SQLite rows move from the base table to the month tables in
+        batches.
+        """
+        if self.native:
+            self._migrate_postgres(log)
+        else:
+            self._migrate_sqlite(batch_size, log)
+    
+    def _migrate_postgres(self, log: Callable[[str], None]):
+        parent, legacy = self.table.name, f"{self.table.name}_unpartitioned"
+        with engine.begin() as conn:
+            kind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :name"), {'name': parent}).scalar()
+            if kind != "r":
+                log(f"{parent} is already partitioned")
+                return
+            conn.execute(text(f"ALTER TABLE {parent} RENAME TO {legacy}"))
+            conn.execute(text(f"ALTER SEQUENCE IF EXISTS {parent}_id_seq RENAME TO {legacy}_id_seq"))
+            for (index,) in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :name"), {'name': legacy}):
+                conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_unpartitioned"))
+            self.table.create(conn)
+            span = conn.execute(text(f"SELECT MIN({self.column}), MAX({self.column}), MAX(id) FROM {legacy}")).first()
+        log(f"renamed the old table to {legacy}")
+        
+        self.maintain()
+        if span[0] is not None:
+            self.ensure_range(span[0], span[1])
+            columns = ", ".join(c.name for c in self.table.columns)
+            month = month_start(span[0])
+            while month <= month_start(span[1]):
+                lower, upper = month.isoformat(), next_month(month).isoformat()
+                with engine.begin() as conn:
+                    copied = conn.execute(text(
+                        f"INSERT INTO {parent} ({columns}) SELECT {columns} FROM {legacy} "
+                        f"WHERE {self.column} >= '{lower}' AND {self.column} < '{upper}'"
+                    )).rowcount
+                log(f"copied {copied} rows into {self.name(month)}")
+                month = next_month(month)
+        with engine.begin() as conn:
+            columns = ", ".join(c.name for c in self.table.columns if c.name != self.column)
+            conn.execute(text(
+                f"INSERT INTO {parent} ({columns}, {self.column}) "
+                f"SELECT {columns}, now() AT TIME ZONE 'utc' FROM {legacy} WHERE {self.column} IS NULL"
+            ))
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{parent}', 'id'), :value)"), {'value': max(span[2] or 0, 1)})
+            conn.execute(text(f"DROP TABLE {legacy}"))
+        log(f"dropped {legacy}")
+    
+    def _migrate_sqlite(self, batch_size: int, log: Callable[[str], None]):
+        timestamp = self.table.c[self.column]
+        moved = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(select(self.table).order_by(self.table.c.id).limit(batch_size)).mappings().all()
+                if not rows:
+                    break
+                by_month: Dict[date, List[Dict]] = {}
+                for row in rows:
+                    row = dict(row)
+                    row[self.column] = row[self.column] or datetime.utcnow()
+                    by_month.setdefault(month_start(row[self.column]), []).append(row)
+                for month, month_rows in by_month.items():
+                    if month not in self.months():
+                        self._create(conn, month)
+                    conn.execute(self._month_table(month).insert(), month_rows)
+                conn.execute(delete(self.table).where(self.table.c.id.in_([row['id'] for row in rows])))
+            moved += len(rows)
+            log(f"moved {moved} rows")
+        self.months(refresh=True)
+
+
+analytics_partitions = MonthlyPartitions(Analytics.__table__)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Maintain the monthly analytics partitions.")
+    parser.add_argument("command", choices=["list", "maintain", "purge", "migrate"])
+    parser.add_argument("--days", type=int, default=settings.ANALYTICS_RETENTION_DAYS, help="retention for purge")
+    parser.add_argument("--batch-size", type=int, default=settings.ANALYTICS_PURGE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between delete batches")
+    args = parser.parse_args()
+    
+    if args.command == "list":
+        for month in analytics_partitions.months():
+            print(analytics_partitions.name(month))
+    elif args.command == "maintain":
+        analytics_partitions.maintain()
+        print(f"✓ {len(analytics_partitions.months())} partitions")
+    elif args.command == "purge":
+        if args.days <= 0:
+            parser.error("--days must be positive")
+        result = analytics_partitions.purge(
+            datetime.utcnow() - timedelta(days=args.days),
+            batch_size=args.batch_size,
+            pause=args.pause,
+            log=print
+        )
+        print(f"✓ dropped {len(result['dropped'])} partitions, deleted {result['deleted']} rows")
+    else:
+        analytics_partitions.migrate(batch_size=args.batch_size)
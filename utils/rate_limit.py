@@ -1,73 +1,233 @@
 """Rate limiting utilities."""
 
+import threading
 import time
-from typing import Dict
-import streamlit as st
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
 from config.settings import settings
+from models.database import RateLimitCounter
+from utils.cache import UserCache
+from utils.database import get_db, upsert
+from utils.tracing import tracer
 
 
-class RateLimiter:
-    """Simple rate limiter for user queries."""
+class RateLimitStore(ABC):
+    """Storage backend for rate limit window counters.
+    
+    Counters are plain integers addressed by string keys that expire after
+    ``ttl`` seconds, so any shared key-value store can back the limiter.
+    """
+    
+    @abstractmethod
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        """Atomically add ``amount`` to ``key`` and return the new value."""
+    
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[int]:
+        """Return the current value of each key (0 if missing or expired)."""
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """In-process store. Shared by every session in one worker process."""
     
     def __init__(self):
+        self._counters: Dict[str, Tuple[int, float]] = {}  # key -> (count, expires_at)
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + 60
+    
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, 0.0))
+            if expires_at <= now:
+                count, expires_at = 0, now + ttl
+            count += amount
+            self._counters[key] = (count, expires_at)
+            
+            if now >= self._next_prune:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+                self._next_prune = now + 60
+            return count
+    
+    def get_many(self, keys: List[str]) -> List[int]:
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                count, expires_at = self._counters.get(key, (0, 0.0))
+                values.append(count if expires_at > now else 0)
+            return values
+
+
+class DatabaseRateLimitStore(RateLimitStore):
+    """Store counters in the ``rate_limit_counters`` table.
+    
+    Shared by every process pointed at the same database. Increments are a
+    single ``INSERT ... ON CONFLICT ... RETURNING`` statement.
+    """
+    
+    PRUNE_INTERVAL = 300
+    
+    def __init__(self):
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+    
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        with get_db() as db:
+            count = upsert(
+                db,
+                RateLimitCounter,
+                {'key': key, 'count': amount, 'expires_at': expires_at},
+                index_elements=['key'],
+                update={'count': RateLimitCounter.count + amount},
+                returning=[RateLimitCounter.count]
+            ).scalar()
+            db.commit()
+        
+        if time.monotonic() >= self._next_prune:
+            self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+            self._prune()
+        return count
+    
+    def get_many(self, keys: List[str]) -> List[int]:
+        with get_db() as db:
+            rows = db.query(RateLimitCounter.key, RateLimitCounter.count)\
+                .filter(
+                    RateLimitCounter.key.in_(keys),
+                    RateLimitCounter.expires_at > datetime.utcnow()
+                )\
+                .all()
+            counts = dict(rows)
+            return [counts.get(key, 0) for key in keys]
+    
+    def _prune(self):
+        """Delete expired counters."""
+        with get_db() as db:
+            db.query(RateLimitCounter)\
+                .filter(RateLimitCounter.expires_at <= datetime.utcnow())\
+                .delete(synchronize_session=False)
+            db.commit()
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Store counters in Redis, or anything speaking its protocol.
+    
+    Accepts any client exposing ``pipeline``, ``incrby``, ``expire`` and
+    ``mget`` (redis-py, or a local stand-in such as fakeredis in tests).
+    """
+    
+    def __init__(self, client):
+        self.client = client
+    
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimitStore":
+        """Connect using redis-py, which is only needed for this backend."""
+        import redis
+        return cls(redis.Redis.from_url(url))
+    
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        pipe.expire(key, ttl)
+        count, _ = pipe.execute()
+        return int(count)
+    
+    def get_many(self, keys: List[str]) -> List[int]:
+        return [int(value or 0) for value in self.client.mget(keys)]
+
+
+def create_store(backend: str) -> RateLimitStore:
+    """Build the rate limit store named by ``RATE_LIMIT_BACKEND``."""
+    if backend == "memory":
+        return MemoryRateLimitStore()
+    if backend == "database":
+        return DatabaseRateLimitStore()
+    if backend == "redis":
+        return RedisRateLimitStore.from_url(settings.REDIS_URL)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+class RateLimiter:
+    """Sliding-window rate limiter for user queries.
+    
+    Uses the sliding-window counter approximation: each limit keeps one
+    counter for the current fixed window and one for the previous window,
+    weighting the previous count by how much of it still overlaps the
+    sliding window. Every check is O(1) regardless of traffic, and state
+    lives in a pluggable store keyed by user id, so the limit holds across
+    browser tabs and worker processes.
+    """
+    
+    def __init__(self, store: Optional[RateLimitStore] = None):
         """Initialize rate limiter."""
-        if 'rate_limit_data' not in st.session_state:
-            st.session_state.rate_limit_data = {}
+        self.store = store or create_store(settings.RATE_LIMIT_BACKEND)
+        # Window counts shown in the sidebar, keyed by the window keys they were read for
+        self._counts = UserCache(settings.PANEL_CACHE_USERS, settings.PANEL_CACHE_TTL_SECONDS)
+    
+    def _limits(self) -> List[Tuple[str, int, int]]:
+        """Return (name, window seconds, limit) for each configured limit."""
+        return [
+            ('per_minute', 60, settings.RATE_LIMIT_PER_MINUTE),
+            ('per_hour', 3600, settings.RATE_LIMIT_PER_HOUR),
+        ]
+    
+    @staticmethod
+    def _window_keys(user_id: int, window: int, now: float) -> Tuple[str, str, float]:
+        """Return the current and previous window keys and the previous window's weight."""
+        start = int(now // window) * window
+        weight = 1 - (now - start) / window
+        return f"{user_id}:{window}:{start}", f"{user_id}:{window}:{start - window}", weight
     
+    @tracer.traced("rate_limit.check")
     def check_rate_limit(self, user_id: int) -> bool:
         """Check if user has exceeded rate limit.
         
         Returns:
             True if user is within rate limit, False if exceeded
         """
-        current_time = time.time()
-        user_key = str(user_id)
-        
-        if user_key not in st.session_state.rate_limit_data:
-            st.session_state.rate_limit_data[user_key] = {
-                'minute': [],
-                'hour': []
-            }
-        
-        user_data = st.session_state.rate_limit_data[user_key]
+        now = time.time()
+        windows = [
+            (self._window_keys(user_id, window, now), window, limit)
+            for _, window, limit in self._limits()
+        ]
+        previous_counts = self.store.get_many([keys[1] for keys, _, _ in windows])
         
-        # Clean old timestamps
-        minute_ago = current_time - 60
-        hour_ago = current_time - 3600
-        
-        user_data['minute'] = [t for t in user_data['minute'] if t > minute_ago]
-        user_data['hour'] = [t for t in user_data['hour'] if t > hour_ago]
-        
-        # Check limits
-        if len(user_data['minute']) >= settings.RATE_LIMIT_PER_MINUTE:
-            return False
-        
-        if len(user_data['hour']) >= settings.RATE_LIMIT_PER_HOUR:
-            return False
-        
-        # Add current timestamp
-        user_data['minute'].append(current_time)
-        user_data['hour'].append(current_time)
+        # Count the request first, then roll back if it went over, so
+        # concurrent checks from other processes cannot both slip through
+        counted = []
+        for ((current_key, _, weight), window, limit), previous in zip(windows, previous_counts):
+            current = self.store.incr(current_key, 1, ttl=2 * window)
+            counted.append((current_key, window))
+            if previous * weight + current > limit:
+                for key, key_window in counted:
+                    self.store.incr(key, -1, ttl=2 * key_window)
+                self._counts.invalidate(user_id)
+                return False
         
+        self._counts.invalidate(user_id)
         return True
     
     def get_remaining_queries(self, user_id: int) -> Dict[str, int]:
         """Get remaining queries for user."""
-        user_key = str(user_id)
-        
-        if user_key not in st.session_state.rate_limit_data:
-            return {
-                'per_minute': settings.RATE_LIMIT_PER_MINUTE,
-                'per_hour': settings.RATE_LIMIT_PER_HOUR
-            }
+        now = time.time()
+        limits = self._limits()
+        window_keys = [self._window_keys(user_id, window, now) for _, window, _ in limits]
         
-        user_data = st.session_state.rate_limit_data[user_key]
+        keys = []
+        for current_key, previous_key, _ in window_keys:
+            keys.extend([current_key, previous_key])
+        # Counts only change on a check or when a window rolls over; the
+        # previous window's weight is recomputed from the current time
+        counts = self._counts.get(user_id, tuple(keys), lambda: self.store.get_many(keys))
         
-        return {
-            'per_minute': settings.RATE_LIMIT_PER_MINUTE - len(user_data['minute']),
-            'per_hour': settings.RATE_LIMIT_PER_HOUR - len(user_data['hour'])
-        }
+        remaining = {}
+        for i, ((name, _, limit), (_, _, weight)) in enumerate(zip(limits, window_keys)):
+            current, previous = counts[2 * i], counts[2 * i + 1]
+            used = int(previous * weight + current)
+            remaining[name] = max(0, limit - used)
+        return remaining
 
 
 rate_limiter = RateLimiter()
@@ -0,0 +1,117 @@
+"""Cross-encoder reranking of retrieved knowledge chunks."""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from config.settings import settings
+
+
+class Reranker:
+    """Re-order bi-encoder candidates with a small cross-encoder.
+    
+    Every uncached (query, chunk) pair is scored in one batched
+    ``predict`` call. The cross-encoder's raw logits go through a sigmoid,
+    so scores (and ``RERANK_MIN_SCORE``) are relevance probabilities in
+    [0, 1]. If that call takes longer than ``RERANK_BUDGET_MS`` the
+    candidates keep their original order. A call that has started
+    still finishes in the background and its scores are cached for the
+    next time; one still queued behind another is cancelled, so requests
+    that gave up do not keep the worker busy.
+    """
+    
+    def __init__(self):
+        self._model = None
+        self._activation = None
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """The cross-encoder, loaded on first access."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    from torch.nn import Sigmoid
+                    # ms-marco cross-encoders ship an identity activation
+                    self._activation = Sigmoid()
+                    self._model = CrossEncoder(settings.RERANK_MODEL, device="cpu")
+        return self._model
+    
+    def _cached_scores(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        with self._cache_lock:
+            found = {}
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+            return found
+    
+    def _store_scores(self, scores: Dict[Tuple[str, str], float]):
+        with self._cache_lock:
+            self._cache.update(scores)
+            for key in scores:
+                self._cache.move_to_end(key)
+            while len(self._cache) > settings.RERANK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _score(self, query: str, pairs: Dict[Tuple[str, str], str]) -> Future:
+        """Score ``pairs`` (cache key -> chunk text) on the worker thread."""
+        keys = list(pairs)
+        
+        def _predict() -> Dict[Tuple[str, str], float]:
+            scores = self.model.predict(
+                [(query, pairs[key]) for key in keys],
+                batch_size=len(keys),
+                activation_fct=self._activation
+            )
+            result = {key: float(score) for key, score in zip(keys, scores)}
+            self._store_scores(result)
+            return result
+        
+        return self._executor.submit(_predict)
+    
+    def rerank(self, query: str, candidates: List[Dict], top_k: int) -> List[Dict]:
+        """Pick the best ``top_k`` candidates for ``query``.
+        
+        Args:
+            query: User's question
+            candidates: Dicts with ``id`` and ``document``, best first
+            top_k: Maximum number of candidates to return
+        
+        Returns:
+            Candidates scoring at least ``RERANK_MIN_SCORE`` (always at least
+            one), best first, or the first ``top_k`` in their original order
+            when scoring fails or runs over budget
+        """
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+        
+        query_key = " ".join(query.lower().split())
+        keys = [(query_key, str(c['id'])) for c in candidates]
+        scores = self._cached_scores(keys)
+        
+        missing = {key: c['document'] for key, c in zip(keys, candidates) if key not in scores}
+        if missing:
+            future = self._score(query, missing)
+            try:
+                scores.update(future.result(timeout=settings.RERANK_BUDGET_MS / 1000))
+            except Exception:
+                # Over budget (TimeoutError) or the model failed
+                future.cancel()
+                return candidates[:top_k]
+        
+        ranked = sorted(zip(keys, candidates), key=lambda item: scores[item[0]], reverse=True)
+        kept = [c for key, c in ranked if scores[key] >= settings.RERANK_MIN_SCORE][:top_k]
+        return kept or [ranked[0][1]]
+    
+    def warm_up(self):
+        """Load the model and run one prediction."""
+        self.model.predict([("warm-up", "warm-up")])
+
+
+reranker = Reranker()
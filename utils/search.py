@@ -0,0 +1,200 @@
+"""Full-text search over a user's messages.
+
+SQLite uses an FTS5 index (``messages_fts``) over an external-content view
+that pairs each message with an ``owner`` token for its user, so a search
+intersects the user's postings with the query terms instead of scanning.
+Triggers on ``messages`` keep the index current as messages are written.
+
+PostgreSQL uses a GIN index on ``to_tsvector('english', content)``, which
+the database maintains on insert like any other index; matches are
+filtered to the user's conversations and ranked with ``ts_rank_cd``.
+"""
+
+import re
+from typing import Dict, List
+
+from sqlalchemy import DateTime, Integer, String, Text, text
+
+from utils.database import engine, get_db
+
+# Wrapped around matched terms in snippets (Markdown bold)
+HIGHLIGHT = ("**", "**")
+
+_SQLITE_SETUP = [
+    """
+    CREATE VIEW IF NOT EXISTS messages_search_source AS
+    SELECT m.id AS id, m.content AS content, 'u' || c.user_id AS owner
+    FROM messages m JOIN conversations c ON c.id = m.conversation_id
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, owner,
+        content='messages_search_source', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content, owner)
+        SELECT new.id, new.content, 'u' || user_id FROM conversations WHERE id = new.conversation_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content, owner)
+        SELECT 'delete', old.id, old.content, 'u' || user_id FROM conversations WHERE id = old.conversation_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content, owner)
+        SELECT 'delete', old.id, old.content, 'u' || user_id FROM conversations WHERE id = old.conversation_id;
+        INSERT INTO messages_fts (rowid, content, owner)
+        SELECT new.id, new.content, 'u' || user_id FROM conversations WHERE id = new.conversation_id;
+    END
+    """,
+]
+
+_SQLITE_SEARCH = """
+SELECT m.id, m.conversation_id, c.title, m.role, m.created_at, hits.snippet, hits.rank
+FROM (
+    SELECT rowid AS id,
+           snippet(messages_fts, 0, :open, :close, '…', 16) AS snippet,
+           bm25(messages_fts, 1.0, 0.0) AS rank
+    FROM messages_fts
+    WHERE messages_fts MATCH :match
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+) hits
+JOIN messages m ON m.id = hits.id
+JOIN conversations c ON c.id = m.conversation_id
+WHERE c.user_id = :user_id
+ORDER BY hits.rank
+"""
+
+_POSTGRES_SEARCH = """
+SELECT hits.id, hits.conversation_id, hits.title, hits.role, hits.created_at,
+       ts_headline('english', m.content, hits.query, :options) AS snippet,
+       hits.rank
+FROM (
+    SELECT m.id, m.conversation_id, c.title, m.role, m.created_at, query,
+           ts_rank_cd(to_tsvector('english', m.content), query) AS rank
+    FROM messages m
+    JOIN conversations c ON c.id = m.conversation_id,
+         websearch_to_tsquery('english', :query) AS query
+    WHERE c.user_id = :user_id
+      AND to_tsvector('english', m.content) @@ query
+    ORDER BY rank DESC, m.id DESC
+    LIMIT :limit OFFSET :offset
+) hits
+JOIN messages m ON m.id = hits.id
+ORDER BY hits.rank DESC, hits.id DESC
+"""
+
+_RESULT_COLUMNS = {
+    'id': Integer,
+    'conversation_id': Integer,
+    'title': String,
+    'role': String,
+    'created_at': DateTime,
+    'snippet': Text,
+}
+
+
+def fts5_match(user_id: int, query: str) -> str:
+    """FTS5 MATCH expression for ``query`` within one user's messages.
+    
+    Words are quoted so user input can never be parsed as FTS syntax, and
+    the last word is a prefix so results appear while typing.
+    """
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return f"owner : u{user_id} AND ({' '.join(terms)})"
+
+
+class MessageSearch:
+    """Ranked, paginated full-text search scoped to one user."""
+    
+    def setup(self):
+        """Create the search index if it does not exist.
+        
+        Safe to run on every start. On SQLite the first run indexes the
+        existing messages; on PostgreSQL the index is built concurrently so
+        writes are not blocked.
+        """
+        dialect = engine.dialect.name
+        if dialect == "sqlite":
+            with engine.begin() as conn:
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+                )).first() is not None
+                for statement in _SQLITE_SETUP:
+                    conn.exec_driver_sql(statement)
+                if not exists:
+                    conn.exec_driver_sql("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        elif dialect == "postgresql":
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql(
+                    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_content_fts "
+                    "ON messages USING GIN (to_tsvector('english', content))"
+                )
+        else:
+            raise NotImplementedError(f"message search is not supported on {dialect}")
+    
+    def search(self, user_id: int, query: str, limit: int = 10, offset: int = 0) -> Dict:
+        """Find the user's messages matching ``query``, best first.
+        
+        Args:
+            user_id: Only this user's conversations are searched
+            query: Words to look for (PostgreSQL also accepts web-search
+                syntax such as quoted phrases and ``-word``)
+            limit: Page size
+            offset: Number of results to skip
+        
+        Returns:
+            ``results`` (dicts with ``message_id``, ``conversation_id``,
+            ``conversation_title``, ``role``, ``created_at``, ``snippet`` and
+            ``rank``; higher rank is better) and ``has_more``
+        """
+        dialect = engine.dialect.name
+        params = {'user_id': user_id, 'limit': limit + 1, 'offset': offset}
+        if dialect == "sqlite":
+            match = fts5_match(user_id, query)
+            if not match:
+                return {'results': [], 'has_more': False}
+            statement = text(_SQLITE_SEARCH)
+            params.update({'match': match, 'open': HIGHLIGHT[0], 'close': HIGHLIGHT[1]})
+        elif dialect == "postgresql":
+            if not query.strip():
+                return {'results': [], 'has_more': False}
+            statement = text(_POSTGRES_SEARCH)
+            params.update({
+                'query': query,
+                'options': f"StartSel={HIGHLIGHT[0]}, StopSel={HIGHLIGHT[1]}, MaxWords=30, MinWords=10, "
+                           "MaxFragments=2, FragmentDelimiter=\" … \""
+            })
+        else:
+            raise NotImplementedError(f"message search is not supported on {dialect}")
+        
+        with get_db() as db:
+            rows = db.execute(statement.columns(**_RESULT_COLUMNS), params).all()
+        
+        results: List[Dict] = [
+            {
+                'message_id': row.id,
+                'conversation_id': row.conversation_id,
+                'conversation_title': row.title,
+                'role': row.role,
+                'created_at': row.created_at,
+                'snippet': row.snippet,
+                # bm25 is lower-is-better; flip it so both backends sort descending
+                'rank': -row.rank if dialect == "sqlite" else row.rank
+            }
+            for row in rows[:limit]
+        ]
+        return {'results': results, 'has_more': len(rows) > limit}
+
+
+message_search = MessageSearch()
@@ -0,0 +1,149 @@
+"""Compact per-session records and session-state memory diagnostics."""
+
+import sys
+from collections import deque
+from dataclasses import dataclass, fields, is_dataclass
+from datetime import datetime
+from types import FunctionType, ModuleType
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    """The fields the UI needs about the logged-in user.
+    
+    Kept in ``st.session_state`` instead of an ORM ``User``, which drags its
+    instance state along and breaks once its session is gone.
+    """
+    id: int
+    email: str
+    name: str
+    is_first_time: bool
+    
+    @classmethod
+    def from_model(cls, user) -> "UserRecord":
+        """Build from a ``models.database.User`` row."""
+        return cls(id=user.id, email=user.email, name=user.name or "", is_first_time=bool(user.is_first_time))
+
+
+@dataclass(frozen=True, slots=True)
+class MessageRecord:
+    """One transcript entry."""
+    id: Optional[int]
+    role: str
+    content: str
+
+
+@dataclass(frozen=True, slots=True)
+class ConversationRecord:
+    """A conversation as listed in the sidebar and the API."""
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    
+    @classmethod
+    def from_model(cls, conversation) -> "ConversationRecord":
+        """Build from a ``models.database.Conversation`` row."""
+        return cls(
+            id=conversation.id,
+            title=conversation.title or "",
+            created_at=conversation.created_at,
+            updated_at=conversation.updated_at
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class BookmarkRecord:
+    """A bookmark with the message it points at."""
+    id: int
+    message_id: int
+    note: Optional[str]
+    created_at: datetime
+    message: MessageRecord
+    
+    @classmethod
+    def from_model(cls, bookmark) -> "BookmarkRecord":
+        """Build from a ``models.database.Bookmark`` row with ``message`` loaded."""
+        message = bookmark.message
+        return cls(
+            id=bookmark.id,
+            message_id=bookmark.message_id,
+            note=bookmark.note,
+            created_at=bookmark.created_at,
+            message=MessageRecord(id=message.id, role=message.role, content=message.content)
+        )
+
+
+def deep_sizeof(obj) -> int:
+    """Approximate bytes retained by ``obj`` and everything it references.
+    
+    Follows containers, ``__dict__`` and ``__slots__``; shared objects are
+    counted once. Modules, classes and functions are not followed.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, (ModuleType, type, FunctionType)):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool)) or current is None:
+            continue
+        else:
+            if is_dataclass(current):
+                stack.extend(getattr(current, f.name) for f in fields(current))
+            elif hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    
+    return total
+
+
+def state_footprint(state) -> Dict[str, int]:
+    """Bytes retained by each key of a session state mapping."""
+    footprint = {}
+    for key in list(state.keys()):
+        try:
+            footprint[str(key)] = deep_sizeof(state[key])
+        except Exception:
+            continue
+    return footprint
+
+
+def all_sessions_footprint() -> List[Dict]:
+    """Footprint of every active Streamlit session in this process.
+    
+    Relies on Streamlit runtime internals, so it returns an empty list when
+    they are unavailable (e.g. outside ``streamlit run``).
+    """
+    try:
+        from streamlit.runtime import Runtime
+        sessions = Runtime.instance()._session_mgr.list_active_sessions()
+    except Exception:
+        return []
+    
+    report = []
+    for info in sessions:
+        try:
+            state = info.session.session_state
+            per_key = state_footprint(getattr(state, "filtered_state", state))
+        except Exception:
+            continue
+        report.append({
+            'session_id': info.session.id,
+            'bytes': sum(per_key.values()),
+            'keys': per_key
+        })
+    return report
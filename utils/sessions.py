@@ -0,0 +1,138 @@
+"""Signed, expiring login session tokens."""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config.settings import settings
+from models.database import User, UserSession
+from utils.database import get_db
+from utils.session_state import UserRecord
+
+
+# Published with the code, so tokens signed with them can be forged by anyone
+PLACEHOLDER_SECRET_KEYS = {
+    "",
+    "dev-secret-key-change-in-production",
+    "your-secret-key-change-in-production",
+    "your-secret-key-for-production",
+}
+
+
+class SessionManager:
+    """Issue and restore login sessions that survive page refreshes.
+    
+    A token is ``<session id>.<expiry>.<signature>``, signed with
+    ``settings.SECRET_KEY``. Restoring checks the signature and expiry
+    locally, then resolves the session id through a small in-process cache
+    backed by the ``user_sessions`` table, which also makes sessions
+    revocable.
+    """
+    
+    def __init__(self):
+        self._cache: "OrderedDict[str, Tuple[UserRecord, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def check_secret_key(self):
+        """Refuse to run outside development with a placeholder ``SECRET_KEY``.
+        
+        Raises:
+            RuntimeError: If the key is a placeholder and ``ENVIRONMENT`` is
+                not ``development``
+        """
+        if settings.ENVIRONMENT != "development" and settings.SECRET_KEY in PLACEHOLDER_SECRET_KEYS:
+            raise RuntimeError(
+                f"SECRET_KEY is unset or a placeholder in the {settings.ENVIRONMENT} environment; "
+                "set it to a long random value (e.g. python -c 'import secrets; print(secrets.token_urlsafe(48))')"
+            )
+    
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(settings.SECRET_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+    
+    def issue(self, user: UserRecord) -> str:
+        """Create a session for ``user`` and return its signed token."""
+        session_id = secrets.token_urlsafe(24)
+        expiry = int(time.time()) + settings.SESSION_TTL_HOURS * 3600
+        
+        with get_db() as db:
+            db.add(UserSession(
+                id=session_id,
+                user_id=user.id,
+                expires_at=datetime.utcfromtimestamp(expiry)
+            ))
+            db.commit()
+        
+        payload = f"{session_id}.{expiry}"
+        return f"{payload}.{self._sign(payload)}"
+    
+    def _parse(self, token: str) -> Optional[str]:
+        """Return the session id if the token is authentic and unexpired."""
+        try:
+            session_id, expiry, signature = token.split(".")
+            expiry_ts = int(expiry)
+        except (AttributeError, ValueError):
+            return None
+        
+        if not hmac.compare_digest(signature, self._sign(f"{session_id}.{expiry}")):
+            return None
+        if expiry_ts <= time.time():
+            return None
+        return session_id
+    
+    def restore(self, token: str) -> Optional[UserRecord]:
+        """Return the user a token belongs to, or None if it is not valid."""
+        session_id = self._parse(token)
+        if session_id is None:
+            return None
+        
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached and cached[1] > time.monotonic():
+                self._cache.move_to_end(session_id)
+                return cached[0]
+        
+        with get_db() as db:
+            user = db.query(User)\
+                .join(UserSession, UserSession.user_id == User.id)\
+                .filter(
+                    UserSession.id == session_id,
+                    UserSession.revoked == False,
+                    UserSession.expires_at > datetime.utcnow()
+                )\
+                .first()
+            if user is None:
+                return None
+            user = UserRecord.from_model(user)
+        
+        with self._lock:
+            # Re-check revocation in the database at least once a minute
+            self._cache[session_id] = (user, time.monotonic() + 60)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > settings.SESSION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return user
+    
+    def revoke(self, token: str):
+        """Invalidate a session, e.g. on logout."""
+        session_id = self._parse(token)
+        if session_id is None:
+            return
+        
+        with self._lock:
+            self._cache.pop(session_id, None)
+        
+        with get_db() as db:
+            db.query(UserSession)\
+                .filter(UserSession.id == session_id)\
+                .update({'revoked': True})
+            db.commit()
+
+
+session_manager = SessionManager()
@@ -0,0 +1,131 @@
+"""Bounded-memory streaming sketches for analytics."""
+
+import heapq
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+STOPWORDS = frozenset("""
+a an and are as at be can could do does for from how i in is it me my of on or
+please should tell the to what when where which who why will with would you your
+""".split())
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Reduce a query to a canonical form for counting.
+    
+    Lowercases, strips punctuation and drops stopwords so that
+    "What is the CGPA cutoff?" and "cgpa cutoff" count as the same query.
+    Falls back to the cleaned text if every word is a stopword.
+    """
+    cleaned = _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+    words = [w for w in cleaned.split(" ") if w and w not in STOPWORDS]
+    return " ".join(words) if words else cleaned
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitters sketch (Metwally et al.).
+    
+    Tracks at most ``capacity`` items. Any item whose true frequency exceeds
+    ``total / capacity`` is guaranteed to be present, and each reported count
+    overestimates the true count by at most its recorded ``error``.
+    """
+    
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[str, Tuple[int, int]] = {}  # item -> (count, error)
+        self._heap: List[Tuple[int, str]] = []  # lazy min-heap of (count, item)
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    def offer(self, item: str, count: int = 1):
+        """Record ``count`` occurrences of ``item``."""
+        self.total += count
+        
+        if item in self.counts:
+            current, error = self.counts[item]
+            self._set(item, current + count, error)
+        elif len(self.counts) < self.capacity:
+            self._set(item, count, 0)
+        else:
+            # Replace the current minimum; its count becomes our error bound
+            min_count, min_item = self._pop_min()
+            del self.counts[min_item]
+            self._set(item, min_count + count, min_count)
+    
+    def top(self, k: int) -> List[Dict]:
+        """Return the ``k`` most frequent items, highest count first."""
+        best = heapq.nlargest(k, self.counts.items(), key=lambda kv: kv[1][0])
+        return [
+            {'item': item, 'count': count, 'error': error}
+            for item, (count, error) in best
+        ]
+    
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Fold another sketch into this one and trim back to capacity.
+        
+        An item missing from a full sketch may still have occurred there up
+        to that sketch's minimum count times, so the minimum is added to
+        both its count and its error (Agarwal et al., mergeable summaries).
+        """
+        self_floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for item in dict.fromkeys([*self.counts, *other.counts]):
+            count, error = self.counts.get(item, (self_floor, self_floor))
+            other_count, other_error = other.counts.get(item, (other_floor, other_floor))
+            merged[item] = (count + other_count, error + other_error)
+        
+        self.total += other.total
+        keep = heapq.nlargest(self.capacity, merged.items(), key=lambda kv: kv[1][0])
+        self.counts = dict(keep)
+        self._rebuild_heap()
+        return self
+    
+    def to_dict(self) -> Dict:
+        """Serialize to a JSON-friendly dict."""
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'counts': {item: [count, error] for item, (count, error) in self.counts.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict], capacity: Optional[int] = None) -> "SpaceSaving":
+        """Rebuild a sketch serialized with ``to_dict``."""
+        data = data or {}
+        sketch = cls(capacity or data.get('capacity', 200))
+        sketch.total = data.get('total', 0)
+        sketch.counts = {
+            item: (int(count), int(error))
+            for item, (count, error) in data.get('counts', {}).items()
+        }
+        sketch._rebuild_heap()
+        return sketch
+    
+    def _floor(self) -> int:
+        """Most occurrences an untracked item can have had: the minimum count once full."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counts.values())
+    
+    def _set(self, item: str, count: int, error: int):
+        self.counts[item] = (count, error)
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+    
+    def _pop_min(self) -> Tuple[int, str]:
+        # Skip stale heap entries left behind by increments
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if item in self.counts and self.counts[item][0] == count:
+                return count, item
+    
+    def _rebuild_heap(self):
+        self._heap = [(count, item) for item, (count, _) in self.counts.items()]
+        heapq.heapify(self._heap)
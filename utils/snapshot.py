@@ -0,0 +1,242 @@
+"""Prebuilt knowledge snapshots for fast, read-only startup.
+
+A snapshot is a directory built once (at image build time) by
+``build_snapshot.py``:
+
+- ``manifest.json``: format, version, embedding model and a SHA-256 and
+  size for every other file
+- ``embeddings.npy``: normalized float32 matrix, one row per document
+- ``documents.jsonl``: id, title, content, source and category per row
+- ``model/``: the sentence-transformers model, so nothing is downloaded
+
+With ``KNOWLEDGE_SNAPSHOT_PATH`` set, ``KnowledgeRetriever`` serves queries
+from ``SnapshotCollection`` instead of ChromaDB and refuses knowledge
+writes, which the bundle could not reflect. The
+matrix is memory-mapped read-only, so opening costs milliseconds and every
+worker process on the host shares the same page-cache pages.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.settings import settings
+
+FORMAT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    """The snapshot is missing, incomplete or does not match this deployment."""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _files(root: str) -> List[str]:
+    """Paths of every file under ``root``, relative and sorted."""
+    paths = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            paths.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(p for p in paths if p != "manifest.json")
+
+
+def read_manifest(path: str) -> Dict:
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"No readable manifest in {path}: {e}")
+    if manifest.get("format") != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')} in {path}")
+    return manifest
+
+
+def verify(path: str, checksums: bool = True) -> Dict:
+    """Check that every file in the manifest is present and intact.
+    
+    Sizes are always compared; ``checksums=True`` also rehashes every file.
+    
+    Returns:
+        The manifest
+    """
+    manifest = read_manifest(path)
+    for name, expected in manifest["files"].items():
+        file_path = os.path.join(path, name)
+        if not os.path.isfile(file_path) or os.path.getsize(file_path) != expected["bytes"]:
+            raise SnapshotError(f"{name} is missing or has the wrong size")
+        if checksums and _sha256(file_path) != expected["sha256"]:
+            raise SnapshotError(f"{name} does not match its checksum")
+    return manifest
+
+
+def build_snapshot(output_dir: str, documents: List[Dict]) -> str:
+    """Embed ``documents`` and write a versioned snapshot under ``output_dir``.
+    
+    The bundle is written to a temporary directory and renamed into place,
+    and ``output_dir/current`` is pointed at it.
+    
+    Args:
+        output_dir: Parent directory for snapshot versions
+        documents: Dicts with ``id``, ``title``, ``content``, ``source``
+            and ``category``
+    
+    Returns:
+        Path of the new snapshot
+    """
+    from sentence_transformers import SentenceTransformer
+    from utils.embedding_runtimes import load_runtime
+    
+    if not documents:
+        raise SnapshotError("No documents to snapshot")
+    
+    corpus = hashlib.sha256()
+    for doc in documents:
+        corpus.update(json.dumps(doc, sort_keys=True).encode())
+    corpus.update(f"{settings.EMBEDDING_MODEL}\n{settings.EMBEDDING_RUNTIME}".encode())
+    version = corpus.hexdigest()[:12]
+    
+    os.makedirs(output_dir, exist_ok=True)
+    final = os.path.join(output_dir, f"knowledge-{version}")
+    if not os.path.exists(final):
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=output_dir)
+        try:
+            model_dir = os.path.join(staging, "model")
+            SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu").save(model_dir)
+            
+            runtime = load_runtime(settings.EMBEDDING_RUNTIME, model_dir)
+            vectors = runtime.encode([doc["content"] for doc in documents])
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            np.save(os.path.join(staging, "embeddings.npy"), vectors.astype(np.float32))
+            
+            with open(os.path.join(staging, "documents.jsonl"), "w") as f:
+                for doc in documents:
+                    f.write(json.dumps(doc) + "\n")
+            
+            manifest = {
+                "format": FORMAT_VERSION,
+                "version": version,
+                "created_at": datetime.utcnow().isoformat(),
+                "embedding_model": settings.EMBEDDING_MODEL,
+                "embedding_runtime": settings.EMBEDDING_RUNTIME,
+                "count": len(documents),
+                "dimension": int(vectors.shape[1]),
+                "files": {
+                    name: {
+                        "sha256": _sha256(os.path.join(staging, name)),
+                        "bytes": os.path.getsize(os.path.join(staging, name))
+                    }
+                    for name in _files(staging)
+                }
+            }
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(staging, final)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+    
+    current = os.path.join(output_dir, "current")
+    link = current + ".tmp"
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(os.path.basename(final), link)
+    os.replace(link, current)
+    return final
+
+
+def open_manifest(path: str, verify_checksums: bool = False) -> Dict:
+    """Verify a snapshot and check it was built for this deployment's model.
+    
+    Returns:
+        The manifest
+    """
+    manifest = verify(path, checksums=verify_checksums)
+    if manifest["embedding_model"] != settings.EMBEDDING_MODEL:
+        raise SnapshotError(
+            f"Snapshot was built with {manifest['embedding_model']}, "
+            f"but EMBEDDING_MODEL is {settings.EMBEDDING_MODEL}"
+        )
+    return manifest
+
+
+class SnapshotCollection:
+    """Read-only, Chroma-compatible view of a snapshot.
+    
+    ``query`` returns the same shape as ``chromadb.Collection.query`` so the
+    retriever treats both alike. Writes are not supported; rebuild the
+    snapshot to change the corpus.
+    """
+    
+    def __init__(self, path: str, verify_checksums: bool = False):
+        self.path = os.path.realpath(path)
+        self.manifest = open_manifest(self.path, verify_checksums)
+        
+        self.embeddings = np.load(os.path.join(self.path, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(self.path, "documents.jsonl")) as f:
+            self.documents = [json.loads(line) for line in f]
+        if self.embeddings.shape != (self.manifest["count"], self.manifest["dimension"]) \
+                or len(self.documents) != self.manifest["count"]:
+            raise SnapshotError(f"Snapshot {self.path} does not match its manifest")
+    
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+    
+    def count(self) -> int:
+        return len(self.documents)
+    
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10) -> Dict:
+        """Nearest documents by cosine similarity, in Chroma's result format."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.embeddings.T
+        n = min(n_results, len(self.documents))
+        
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for row in scores:
+            top = np.argpartition(-row, n - 1)[:n] if n < len(row) else np.arange(len(row))
+            top = top[np.argsort(-row[top])]
+            docs = [self.documents[i] for i in top]
+            result['ids'].append([str(doc["id"]) for doc in docs])
+            result['documents'].append([doc["content"] for doc in docs])
+            result['metadatas'].append([
+                {"id": doc["id"], "title": doc["title"], "source": doc["source"], "category": doc["category"]}
+                for doc in docs
+            ])
+            result['distances'].append([float(1 - row[i]) for i in top])
+        return result
+    
+    def add(self, **kwargs):
+        raise SnapshotError("The knowledge snapshot is read-only; rebuild it to add documents")
+    
+    def delete(self, **kwargs):
+        raise SnapshotError("The knowledge snapshot is read-only; rebuild it to remove documents")
+
+
+def bundled_model() -> Optional[str]:
+    """The configured snapshot's model directory, if the snapshot is usable.
+    
+    Checked the same way ``SnapshotCollection`` checks it, so queries are
+    never embedded with the bundled model while retrieval has fallen back
+    to ChromaDB (whose vectors come from ``EMBEDDING_MODEL``).
+    """
+    if not settings.KNOWLEDGE_SNAPSHOT_PATH:
+        return None
+    try:
+        open_manifest(settings.KNOWLEDGE_SNAPSHOT_PATH, settings.KNOWLEDGE_SNAPSHOT_VERIFY)
+    except SnapshotError:
+        return None
+    model_dir = os.path.join(settings.KNOWLEDGE_SNAPSHOT_PATH, "model")
+    return model_dir if os.path.isdir(model_dir) else None
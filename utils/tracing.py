@@ -0,0 +1,367 @@
+"""Lightweight tracing: nested spans, latency histograms and exporters.
+
+Spans nest through a context variable, so code only needs
+``with tracer.span("name"):`` to time itself and attach to whatever trace
+is running. Every finished span feeds a per-name ``LatencyHistogram``;
+root spans (a chat turn, a page render) also keep their span tree in a
+bounded list of recent traces and are handed to the configured exporter.
+
+Generators that yield inside a trace (response streaming) cannot keep a
+span open across ``yield``, because the consumer may resume them in a
+different context. They use ``start_span``/``activate``/``end_span``
+explicitly instead.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from config.settings import settings
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+# Children kept per span; more are still timed into the histograms
+MAX_CHILDREN = 200
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of durations in microseconds.
+    
+    Values below ``2**SUB_BUCKET_BITS`` us are exact; above that every power
+    of two is split into ``2**SUB_BUCKET_BITS`` linear buckets, so any
+    reported value is within ~3% of the truth. Memory is bounded by the
+    number of distinct buckets (a few hundred for realistic latencies), and
+    histograms from different processes merge by adding counts.
+    """
+    
+    SUB_BUCKET_BITS = 5
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+    
+    @classmethod
+    def _index(cls, value_us: int) -> int:
+        sub = 1 << cls.SUB_BUCKET_BITS
+        if value_us < sub:
+            return value_us
+        shift = value_us.bit_length() - 1 - cls.SUB_BUCKET_BITS
+        return ((shift + 1) << cls.SUB_BUCKET_BITS) + (value_us >> shift) - sub
+    
+    @classmethod
+    def _value(cls, index: int) -> float:
+        """Midpoint of a bucket, in microseconds."""
+        sub = 1 << cls.SUB_BUCKET_BITS
+        if index < sub:
+            return float(index)
+        shift = (index >> cls.SUB_BUCKET_BITS) - 1
+        mantissa = (index & (sub - 1)) + sub
+        return ((mantissa << shift) + ((mantissa + 1) << shift)) / 2
+    
+    def record(self, seconds: float):
+        value_us = max(0, int(seconds * 1e6))
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.min_us = value_us if not self.count else min(self.min_us, value_us)
+        self.max_us = max(self.max_us, value_us)
+        self.count += 1
+        self.total_us += value_us
+    
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        if other.count:
+            self.min_us = other.min_us if not self.count else min(self.min_us, other.min_us)
+            self.max_us = max(self.max_us, other.max_us)
+        self.count += other.count
+        self.total_us += other.total_us
+    
+    def percentile(self, pct: float) -> float:
+        """Value at ``pct`` percent, in milliseconds."""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-pct * self.count // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min_us), self.max_us) / 1000
+        return self.max_us / 1000
+    
+    def to_dict(self) -> Dict:
+        return {
+            'counts': {str(k): v for k, v in self.counts.items()},
+            'count': self.count,
+            'total_us': self.total_us,
+            'min_us': self.min_us,
+            'max_us': self.max_us
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(k): v for k, v in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total_us = data['total_us']
+        histogram.min_us = data['min_us']
+        histogram.max_us = data['max_us']
+        return histogram
+
+
+class Span:
+    """One timed operation and its children."""
+    
+    __slots__ = ("name", "trace_id", "span_id", "parent", "attributes", "children",
+                 "start_ns", "_started", "duration", "error")
+    
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+    
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the span started, e.g. to mark a point within it."""
+        return (time.perf_counter() - self._started) * 1000
+    
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'start_ns': self.start_ns,
+            'duration_ms': (self.duration or 0) * 1000,
+            'attributes': self.attributes,
+            'error': self.error,
+            'children': [child.to_dict() for child in self.children]
+        }
+    
+    def render(self, depth: int = 0) -> Iterator[str]:
+        """Indented text lines of this span tree."""
+        suffix = f"  ✗ {self.error}" if self.error else ""
+        attrs = " ".join(f"{k}={v}" for k, v in self.attributes.items())
+        yield f"{'  ' * depth}{self.name:<{max(1, 32 - 2 * depth)}} {(self.duration or 0) * 1000:>9.1f}ms  {attrs}{suffix}"
+        for child in self.children:
+            yield from child.render(depth + 1)
+
+
+class FileExporter:
+    """Append each finished trace as one JSON line."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def export(self, traces: List[Span]):
+        lines = "".join(json.dumps(trace.to_dict(), default=str) + "\n" for trace in traces)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+
+class OtlpExporter:
+    """POST traces to an OTLP/HTTP collector as JSON (``/v1/traces``)."""
+    
+    def __init__(self, endpoint: str, service_name: str = settings.APP_NAME):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._session = None
+    
+    @staticmethod
+    def _attributes(attributes: Dict) -> List[Dict]:
+        return [{'key': k, 'value': {'stringValue': str(v)}} for k, v in attributes.items()]
+    
+    def _spans(self, span: Span) -> Iterator[Dict]:
+        yield {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'parentSpanId': span.parent.span_id if span.parent else "",
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.start_ns + int((span.duration or 0) * 1e9)),
+            'attributes': self._attributes(span.attributes),
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+        for child in span.children:
+            yield from self._spans(child)
+    
+    def export(self, traces: List[Span]):
+        import requests
+        
+        if self._session is None:
+            self._session = requests.Session()
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': self._attributes({'service.name': self.service_name})},
+            'scopeSpans': [{
+                'scope': {'name': "boeing-chatbot"},
+                'spans': [s for trace in traces for s in self._spans(trace)]
+            }]
+        }]}
+        self._session.post(self.url, json=payload, timeout=5).raise_for_status()
+
+
+def create_exporter(kind: str):
+    """Exporter for ``TRACE_EXPORTER``: 'none', 'file' or 'otlp'."""
+    if kind == "file":
+        return FileExporter(settings.TRACE_FILE)
+    if kind == "otlp":
+        return OtlpExporter(settings.OTLP_ENDPOINT)
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown trace exporter: {kind}")
+
+
+class Tracer:
+    """Collect spans, histograms and recent traces for this process."""
+    
+    def __init__(self, exporter=None, enabled: bool = True, recent_size: int = 200):
+        self.enabled = enabled
+        self.exporter = exporter
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.recent: deque = deque(maxlen=recent_size)
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=1000)
+        if exporter is not None:
+            threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True).start()
+    
+    def current(self) -> Optional[Span]:
+        """The span new spans would nest under, if any."""
+        return _current.get()
+    
+    def start_span(self, name: str, parent: Optional[Span] = None, root: bool = False, **attributes) -> Optional[Span]:
+        """Start a span under ``parent`` (default: the current span).
+        
+        ``root=True`` always starts a new trace. The span is not made
+        current; use ``activate`` or ``span`` for that.
+        """
+        if not self.enabled:
+            return None
+        if not root and parent is None:
+            parent = _current.get()
+        span = Span(name, None if root else parent, attributes)
+        if span.parent is not None and len(span.parent.children) < MAX_CHILDREN:
+            span.parent.children.append(span)
+        return span
+    
+    def end_span(self, span: Optional[Span], error: Optional[BaseException] = None):
+        """Finish ``span``; root spans are kept and exported as traces."""
+        if span is None or span.duration is not None:
+            return
+        span.duration = time.perf_counter() - span._started
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = LatencyHistogram()
+            histogram.record(span.duration)
+            if span.parent is None:
+                self.recent.append(span)
+        
+        if span.parent is None and self.exporter is not None:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                pass
+    
+    @contextmanager
+    def activate(self, span: Optional[Span]):
+        """Make ``span`` the parent of spans started inside the block."""
+        previous = _current.get()
+        _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.set(previous)
+    
+    @contextmanager
+    def span(self, name: str, root: bool = False, **attributes):
+        """Time the block as a span nested under the current one."""
+        span = self.start_span(name, root=root, **attributes)
+        if span is None:
+            yield None
+            return
+        with self.activate(span):
+            try:
+                yield span
+            except Exception as e:
+                self.end_span(span, error=e)
+                raise
+            finally:
+                # Also covers control-flow exceptions such as st.rerun()
+                self.end_span(span)
+    
+    def traced(self, name: str, root: bool = False):
+        """Decorator form of ``span``."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, root=root):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def latency_summary(self) -> List[Dict]:
+        """Per-span-name count and p50/p95/p99/max in ms, slowest p95 first."""
+        with self._lock:
+            histograms = list(self.histograms.items())
+        return sorted(
+            (
+                {
+                    'name': name,
+                    'count': h.count,
+                    'p50_ms': h.percentile(50),
+                    'p95_ms': h.percentile(95),
+                    'p99_ms': h.percentile(99),
+                    'max_ms': h.max_us / 1000
+                }
+                for name, h in histograms
+            ),
+            key=lambda row: row['p95_ms'],
+            reverse=True
+        )
+    
+    def slowest(self, limit: int = 10, name: Optional[str] = None) -> List[Span]:
+        """Slowest recent traces, optionally only those whose root is ``name``."""
+        with self._lock:
+            traces = [t for t in self.recent if name is None or t.name == name]
+        return sorted(traces, key=lambda t: t.duration, reverse=True)[:limit]
+    
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                # Tracing must never take the app down; drop the batch
+                pass
+
+
+tracer = Tracer(
+    exporter=create_exporter(settings.TRACE_EXPORTER) if settings.TRACING_ENABLED else None,
+    enabled=settings.TRACING_ENABLED,
+    recent_size=settings.TRACE_RECENT_SIZE
+)
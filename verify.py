@@ -109,6 +109,31 @@ def test_settings():
         print(f"  ✗ Settings test failed: {e}")
         return False
 
+def test_import_time():
+    """Test that the login path imports quickly and skips heavy dependencies."""
+    print("\nTesting login path import time...")
+    
+    try:
+        from profile_startup import measure_imports, DEFAULT_BUDGET_SECONDS
+        
+        total, rows, heavy = measure_imports()
+        print(f"  ✓ Login path imported in {total:.2f}s (budget {DEFAULT_BUDGET_SECONDS:.2f}s)")
+        
+        if heavy:
+            print(f"  ✗ Heavy modules imported eagerly: {', '.join(heavy)}")
+            return False
+        
+        if total > DEFAULT_BUDGET_SECONDS:
+            slowest = ", ".join(f"{r['module'].strip()} {r['cumulative']:.2f}s" for r in rows[:5])
+            print(f"  ✗ Over budget; slowest: {slowest}")
+            return False
+        
+        return True
+        
+    except Exception as e:
+        print(f"  ✗ Import time test failed: {e}")
+        return False
+
 def main():
     """Run all verification tests."""
     print("=" * 60)
@@ -120,6 +145,7 @@ def main():
     results.append(("Imports", test_imports()))
     results.append(("Settings", test_settings()))
     results.append(("Database", test_database()))
+    results.append(("Import time", test_import_time()))
     
     print("\n" + "=" * 60)
     print("Verification Summary")